@@ -6,6 +6,9 @@ namespace Api.Endpoints;
 
 public static class OrderEndpoints
 {
+    private const int DefaultListLimit = 100;
+    private const int MaxListLimit = 1000;
+
     public static void MapOrderEndpoints(this WebApplication app)
     {
         var group = app.MapGroup("/orders");
@@ -14,11 +17,13 @@ public static class OrderEndpoints
             CreateOrderRequest request,
             OrderRepository repo,
             EnrichmentClient enrichment,
+            EnrichmentOptions enrichmentOptions,
             MessagePublisher publisher,
             OrderMetrics metrics) =>
         {
             Activity.Current?.SetTag("order.product", request.Product);
             Activity.Current?.SetTag("order.quantity", request.Quantity);
+            Activity.Current?.SetTag("order.enrichment.mode", enrichmentOptions.Mode);
 
             if (string.IsNullOrWhiteSpace(request.CustomerName) || string.IsNullOrWhiteSpace(request.Product) || request.Quantity <= 0)
             {
@@ -34,21 +39,40 @@ public static class OrderEndpoints
                 throw new InvalidOperationException("Simulated error: product 'error' triggers failure");
             }
 
-            var (price, rawJson) = await enrichment.EnrichAsync(request.Product, request.Quantity);
+            // In async mode the order is stored unpriced and the worker enriches it on consume
+            decimal? price = null;
+            string? rawJson = null;
+            if (!enrichmentOptions.Async)
+            {
+                (price, rawJson) = await enrichment.EnrichAsync(request.Product, request.Quantity);
+            }
 
             var order = await repo.CreateAsync(request, price, rawJson);
 
-            await publisher.PublishOrderCreatedAsync(new { order.Id, order.Product, order.Quantity, order.Price });
+            await publisher.PublishOrderCreatedAsync(new
+            {
+                order.Id,
+                order.Product,
+                order.Quantity,
+                order.Price,
+                request.CorrelationId,
+                request.SentAtMs,
+                Enrich = enrichmentOptions.Async
+            });
 
             // Record successful order creation metric
-            metrics.RecordOrderCreated(order.Product, order.Quantity);
+            metrics.RecordOrderCreated(order.Product, order.Quantity, enrichmentOptions.Mode);
 
             return Results.Created($"/orders/{order.Id}", order);
         });
 
-        group.MapGet("/", async (OrderRepository repo) =>
+        group.MapGet("/", async (OrderRepository repo, int? limit) =>
         {
-            var orders = await repo.GetAllAsync();
+            // Newest first, bounded so the listing cost does not grow with the table
+            var pageSize = Math.Clamp(limit ?? DefaultListLimit, 1, MaxListLimit);
+            Activity.Current?.SetTag("orders.list.limit", pageSize);
+
+            var orders = await repo.GetRecentAsync(pageSize);
             return Results.Ok(orders);
         });
 
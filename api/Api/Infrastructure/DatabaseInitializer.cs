@@ -20,6 +20,10 @@ public class DatabaseInitializer(IConfiguration config, ILogger<DatabaseInitiali
                 created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
                 updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
             );
+            CREATE INDEX IF NOT EXISTS ix_orders_created_at ON orders (created_at DESC);
+            -- Written back by the worker once an order has been processed
+            ALTER TABLE orders ADD COLUMN IF NOT EXISTS processed_at TIMESTAMPTZ;
+            ALTER TABLE orders ADD COLUMN IF NOT EXISTS processing_duration_ms DOUBLE PRECISION;
             """;
 
         for (var attempt = 1; attempt <= 10; attempt++)
@@ -9,11 +9,17 @@ public record Order(
     string Status,
     string? EnrichmentData,
     DateTime CreatedAt,
-    DateTime UpdatedAt
+    DateTime UpdatedAt,
+    DateTime? ProcessedAt,
+    double? ProcessingDurationMs
 );
 
 public record CreateOrderRequest(
     string CustomerName,
     string Product,
-    int Quantity
+    int Quantity,
+    // Optional client stamps, passed through to the order.created message so
+    // the load generator can measure end-to-end latency
+    string? CorrelationId = null,
+    long? SentAtMs = null
 );
@@ -40,6 +40,8 @@ builder.Services.AddHttpClient<EnrichmentClient>(client =>
     var baseUrl = builder.Configuration["Enrichment:BaseUrl"] ?? "http://localhost:8000";
     client.BaseAddress = new Uri(baseUrl);
 });
+var enrichmentMode = builder.Configuration["Enrichment:Mode"] ?? "sync";
+builder.Services.AddSingleton(new EnrichmentOptions(enrichmentMode.Equals("async", StringComparison.OrdinalIgnoreCase)));
 builder.Services.AddHostedService<DatabaseInitializer>();
 
 builder.Services.AddCors(options =>
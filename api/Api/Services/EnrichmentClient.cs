@@ -22,3 +22,13 @@ public class EnrichmentClient(HttpClient http, ILogger<EnrichmentClient> logger)
         }
     }
 }
+
+/// <summary>
+/// Where orders are priced. Sync: the API calls the worker's /enrich before
+/// inserting. Async: the order is stored as pending and published right away,
+/// and the worker prices it on consume and writes the result back.
+/// </summary>
+public record EnrichmentOptions(bool Async)
+{
+    public string Mode => Async ? "async" : "sync";
+}
@@ -55,7 +55,14 @@ public class MessagePublisher : IAsyncDisposable
         }
 
         var body = Encoding.UTF8.GetBytes(JsonSerializer.Serialize(order));
-        var props = new BasicProperties { ContentType = "application/json" };
+        // Publish time lets the worker measure queue wait separately from processing time
+        var now = DateTimeOffset.UtcNow;
+        var props = new BasicProperties
+        {
+            ContentType = "application/json",
+            Timestamp = new AmqpTimestamp(now.ToUnixTimeSeconds()),
+            Headers = new Dictionary<string, object?> { ["x-published-at-ms"] = now.ToUnixTimeMilliseconds() }
+        };
         await channel.BasicPublishAsync("orders", "order.created", false, props, body);
         _logger.LogInformation("Published order.created event");
     }
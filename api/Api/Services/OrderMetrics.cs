@@ -22,11 +22,12 @@ public class OrderMetrics
             description: "Total number of order creation errors");
     }
 
-    public void RecordOrderCreated(string product, int quantity)
+    public void RecordOrderCreated(string product, int quantity, string enrichmentMode)
     {
         _ordersCreatedCounter.Add(1,
             new KeyValuePair<string, object?>("product", product),
-            new KeyValuePair<string, object?>("quantity", quantity));
+            new KeyValuePair<string, object?>("quantity", quantity),
+            new KeyValuePair<string, object?>("enrichment.mode", enrichmentMode));
     }
 
     public void RecordOrderError(string? product, string errorType)
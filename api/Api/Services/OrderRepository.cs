@@ -15,7 +15,9 @@ public class OrderRepository(IConfiguration config)
         status AS Status,
         enrichment_data AS EnrichmentData,
         created_at AS CreatedAt,
-        updated_at AS UpdatedAt
+        updated_at AS UpdatedAt,
+        processed_at AS ProcessedAt,
+        processing_duration_ms AS ProcessingDurationMs
         """;
 
     private NpgsqlConnection CreateConnection() =>
@@ -40,11 +42,12 @@ public class OrderRepository(IConfiguration config)
         });
     }
 
-    public async Task<IEnumerable<Order>> GetAllAsync()
+    public async Task<IEnumerable<Order>> GetRecentAsync(int limit)
     {
         await using var conn = CreateConnection();
         return await conn.QueryAsync<Order>(
-            $"SELECT {Columns} FROM orders ORDER BY created_at DESC");
+            $"SELECT {Columns} FROM orders ORDER BY created_at DESC LIMIT @Limit",
+            new { Limit = limit });
     }
 
     public async Task<Order?> GetByIdAsync(Guid id)
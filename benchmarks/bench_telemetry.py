@@ -0,0 +1,57 @@
+"""Cost of the telemetry pipeline itself, exported to memory instead of OTLP."""
+from opentelemetry import metrics
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from otel_common.export import ExportSettings
+from otel_common.sampling import ErrorKeepingSpanProcessor, SamplingEngine
+
+from app.instruments import histogram_views
+
+from harness import benchmark
+
+RESOURCE = Resource.create({"service.name": "benchmarks"})
+EXPORT = ExportSettings.from_env()
+
+
+def _tracer_provider(exporter: InMemorySpanExporter, meter: metrics.Meter = None) -> TracerProvider:
+    # Same pipeline as the services' setup_telemetry, minus the OTLP exporter
+    meter = meter or metrics.get_meter("benchmarks")
+    provider = TracerProvider(resource=RESOURCE, sampler=SamplingEngine.from_env(meter))
+    provider.add_span_processor(ErrorKeepingSpanProcessor(EXPORT.span_processor(exporter, meter)))
+    return provider
+
+
+@benchmark("telemetry.setup_and_shutdown", rounds=3)
+def bench_setup(n: int):
+    for _ in range(n):
+        # The sampler's and processor's gauges go to this iteration's provider,
+        # so shutting it down releases them instead of growing the global registry
+        meter_provider = MeterProvider(resource=RESOURCE, metric_readers=[InMemoryMetricReader()], views=histogram_views())
+        tracer_provider = _tracer_provider(InMemorySpanExporter(), meter_provider.get_meter("benchmarks"))
+        tracer_provider.get_tracer("benchmarks")
+        tracer_provider.shutdown()
+        meter_provider.shutdown()
+
+
+_pipeline = None
+
+
+@benchmark("telemetry.span_export")
+def bench_span_export(n: int):
+    # Start, end and batch-export one span with three attributes
+    global _pipeline
+    if _pipeline is None:
+        exporter = InMemorySpanExporter()
+        provider = _tracer_provider(exporter)
+        _pipeline = (provider, provider.get_tracer("benchmarks"), exporter)
+    provider, tracer, exporter = _pipeline
+    for i in range(n):
+        with tracer.start_as_current_span("process_order") as span:
+            span.set_attribute("order.id", i)
+            span.set_attribute("order.product", "widget")
+            span.set_attribute("status", "success")
+    provider.force_flush()
+    exporter.clear()
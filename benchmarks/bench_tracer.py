@@ -0,0 +1,84 @@
+"""RabbitMQ tracer hot paths: event decoding, span conversion, aggregation and sessions."""
+import datetime
+import json
+
+from opentelemetry import trace
+
+import main as tracer_main
+from aggregation import ChurnAggregator
+from events import CONVERTERS
+from sessions import SessionTracker
+
+from harness import benchmark
+
+SAMPLE_VALUES = {"string": "demo", "int": 7, "float": 1.5, "bool": True}
+_SAMPLES_BY_CONVERTER = {convert: SAMPLE_VALUES[name] for name, convert in CONVERTERS.items()}
+
+
+def _sample_body(mapping) -> dict:
+    """An event body with every field the mapping reads, as the broker would send it."""
+    return {source: _SAMPLES_BY_CONVERTER[convert] for source, _, convert, _ in mapping.fields}
+
+
+EVENTS = [(_sample_body(tracer_main.event_table.get(key)), key) for key in tracer_main.event_table]
+
+tracer = trace.get_tracer("benchmarks")
+
+
+class FakeEventMessage:
+    __slots__ = ("body", "headers", "routing_key", "timestamp")
+
+    def __init__(self, body: dict, routing_key: str):
+        self.body = json.dumps(body).encode()
+        self.headers = {}
+        self.routing_key = routing_key
+        self.timestamp = datetime.datetime.now(datetime.timezone.utc)
+
+
+@benchmark("tracer.process_event.all_types")
+async def bench_process_event(n: int):
+    # One operation is one event; event types are cycled so every mapping is hit
+    count = len(EVENTS)
+    for i in range(n):
+        body, routing_key = EVENTS[i % count]
+        await tracer_main.process_event(body, routing_key, tracer)
+
+
+@benchmark("tracer.decode_event")
+def bench_decode_event(n: int):
+    messages = [FakeEventMessage(body, routing_key) for body, routing_key in EVENTS]
+    count = len(messages)
+    for i in range(n):
+        tracer_main.decode_event(messages[i % count])
+
+
+_aggregator = None
+
+
+@benchmark("tracer.aggregate_event")
+def bench_aggregate_event(n: int):
+    global _aggregator
+    if _aggregator is None:
+        churn = {"channel.created", "channel.closed", "connection.created", "connection.closed"}
+        _aggregator = ChurnAggregator(tracer, churn)
+    body = {"vhost": "/", "user": "demo", "peer_host": "10.0.0.1"}
+    for i in range(n):
+        _aggregator.record(body, "channel.created" if i & 1 else "channel.closed")
+    # Window close is part of the steady-state cost, once per window in production
+    _aggregator.close_window()
+
+
+_sessions = None
+
+
+@benchmark("tracer.session_open_close")
+def bench_session_open_close(n: int):
+    # One operation is a channel.created + channel.closed pair
+    global _sessions
+    if _sessions is None:
+        _sessions = SessionTracker(tracer, tracer_main.event_table)
+    for i in range(n):
+        pid = f"<rabbit@bench.1.{i}.0>"
+        created = {"pid": pid, "connection": "<rabbit@bench.1.1.0>", "number": i, "timestamp": 1000.0}
+        _sessions.handle(created, "channel.created")
+        _sessions.handle({"pid": pid, "timestamp": 1001.0}, "channel.closed")
@@ -0,0 +1,109 @@
+"""Worker hot paths: pricing, the /enrich endpoints and the per-message consumer path."""
+import contextlib
+import time
+import uuid
+
+import httpx
+
+from app import codec
+from app.catalog import catalog
+from app.concurrency import ConcurrencyController
+from app.consumer import make_message_handler
+from app.enrich import enrich_product, enrich_products
+from app.main import app
+
+from harness import benchmark
+
+PRODUCTS = ["widget", "gadget", "gizmo", "doohickey"]
+BATCH = [(PRODUCTS[i % len(PRODUCTS)], i % 10 + 1) for i in range(100)]
+
+
+class FakeMessage:
+    """The parts of aio_pika.IncomingMessage the consumer touches."""
+
+    __slots__ = ("body", "headers", "timestamp")
+
+    def __init__(self, body: bytes, published_at_ms: int):
+        self.body = body
+        self.headers = {"x-published-at-ms": published_at_ms}
+        self.timestamp = None
+
+    @contextlib.asynccontextmanager
+    async def process(self):
+        yield
+
+
+def _order_body() -> bytes:
+    return codec.dumps({
+        "Id": str(uuid.uuid4()),
+        "Product": "widget",
+        "Quantity": 3,
+        "Price": 29.97,
+        "CorrelationId": str(uuid.uuid4()),
+        "SentAtMs": int(time.time() * 1000),
+    })
+
+
+@benchmark("worker.enrich_product")
+def bench_enrich_product(n: int):
+    for i in range(n):
+        enrich_product(PRODUCTS[i & 3], 3)
+
+
+@benchmark("worker.enrich_product.dynamic_price")
+def bench_enrich_product_dynamic(n: int):
+    # Products missing from the catalog hit the price cache after the first call
+    for i in range(n):
+        enrich_product(f"product-{i & 255}", 2)
+
+
+@benchmark("worker.enrich_products.batch_100")
+def bench_enrich_products(n: int):
+    for _ in range(n):
+        enrich_products(BATCH)
+
+
+_client = None
+
+
+def _asgi_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        catalog.refresh()
+        _client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://worker")
+    return _client
+
+
+@benchmark("worker.enrich_endpoint")
+async def bench_enrich_endpoint(n: int):
+    client = _asgi_client()
+    for i in range(n):
+        response = await client.post("/enrich", json={"product": PRODUCTS[i & 3], "quantity": 3})
+        response.raise_for_status()
+
+
+@benchmark("worker.enrich_batch_endpoint.batch_100")
+async def bench_enrich_batch_endpoint(n: int):
+    client = _asgi_client()
+    payload = [{"product": product, "quantity": quantity} for product, quantity in BATCH]
+    for _ in range(n):
+        response = await client.post("/enrich/batch", json=payload)
+        response.raise_for_status()
+
+
+@benchmark("worker.on_message")
+async def bench_on_message(n: int):
+    # No simulated work (min_wait = max_wait = 0): decode, span, metrics, settle
+    controller = ConcurrencyController(prefetch_count=n, max_in_flight=n)
+    on_message = make_message_handler(controller, 0.0, 0.0)
+    now_ms = int(time.time() * 1000)
+    messages = [FakeMessage(_order_body(), now_ms) for _ in range(min(n, 1000))]
+    for i in range(n):
+        await on_message(messages[i % len(messages)])
+
+
+@benchmark("worker.codec.loads")
+def bench_codec_loads(n: int):
+    body = _order_body()
+    for _ in range(n):
+        codec.loads(body)
@@ -0,0 +1,105 @@
+"""
+Minimal benchmark harness: registration, calibration, timing and baselines.
+
+A benchmark is a function taking an iteration count `n` and performing the
+measured operation `n` times (sync or async). The harness calibrates `n` so
+one round takes at least `min_time` seconds, runs `rounds` timed rounds
+after a warm-up, and reports the median throughput in operations/second.
+"""
+import asyncio
+import inspect
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str, rounds: int = 5, min_time: float = 0.2):
+    """Register `fn(n)` under `name`, e.g. `worker.enrich_product`."""
+
+    def decorator(fn):
+        BENCHMARKS[name] = (fn, rounds, min_time)
+        return fn
+
+    return decorator
+
+
+class Runner:
+    def __init__(self):
+        # One loop for every async benchmark, so module-level asyncio state
+        # created by the code under test stays valid between rounds
+        self.loop = asyncio.new_event_loop()
+
+    def _call(self, fn, n: int) -> float:
+        start = time.perf_counter()
+        if inspect.iscoroutinefunction(fn):
+            self.loop.run_until_complete(fn(n))
+        else:
+            fn(n)
+        return time.perf_counter() - start
+
+    def _calibrate(self, fn, min_time: float) -> int:
+        n = 1
+        while True:
+            elapsed = self._call(fn, n)
+            if elapsed >= min_time or n >= 1 << 24:
+                return n
+            # Aim a little past min_time from the observed rate
+            n = max(n * 2, int(n * min_time * 1.2 / max(elapsed, 1e-9)))
+
+    def run(self, name: str) -> dict:
+        fn, rounds, min_time = BENCHMARKS[name]
+        n = self._calibrate(fn, min_time)
+        rates = [n / self._call(fn, n) for _ in range(rounds)]
+        return {
+            "ops_per_sec": statistics.median(rates),
+            "min_ops_per_sec": min(rates),
+            "max_ops_per_sec": max(rates),
+            "iterations": n,
+            "rounds": rounds,
+        }
+
+    def close(self):
+        self.loop.close()
+
+
+def environment() -> dict:
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def save(path: str, results: dict):
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Rows of (name, baseline ops/s, current ops/s, change, regressed) for
+    every benchmark present in both. A benchmark regresses when its
+    throughput fell by more than `threshold` (0.15 = 15%).
+    """
+    rows = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        before = baseline[name]["ops_per_sec"]
+        after = result["ops_per_sec"]
+        change = after / before - 1 if before else 0.0
+        rows.append((name, before, after, change, change < -threshold))
+    return rows
@@ -0,0 +1,114 @@
+"""
+Offline benchmarks for the worker and tracer hot paths.
+
+    python benchmarks/run.py                         # run everything, print a table
+    python benchmarks/run.py -k enrich               # only benchmarks whose name contains "enrich"
+    python benchmarks/run.py --save baseline.json    # record a baseline
+    python benchmarks/run.py --compare baseline.json # exit 1 if any benchmark regressed
+
+No Docker, broker or collector is needed: spans and metrics go to in-memory
+providers and the worker app is called through an in-process ASGI client.
+"""
+import argparse
+import logging
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    os.path.join(ROOT, "benchmarks"),
+    os.path.join(ROOT, "worker"),
+    os.path.join(ROOT, "rabbitmq-tracer"),
+    os.path.join(ROOT, "common"),
+]
+
+from opentelemetry import metrics, trace
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+
+
+class NullSpanExporter(SpanExporter):
+    """Accepts and discards spans, so long runs do not accumulate them in memory."""
+
+    def export(self, spans):
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+def install_telemetry():
+    """
+    Global providers for the code under test. They must be installed before
+    the services' own setup_telemetry() runs on import: providers can only be
+    set once, so the services' OTLP pipelines are left unused.
+    """
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(BatchSpanProcessor(NullSpanExporter()))
+    trace.set_tracer_provider(tracer_provider)
+    metrics.set_meter_provider(MeterProvider(metric_readers=[InMemoryMetricReader()]))
+
+    # Log records are still created, filtered and formatted, but not printed
+    logging.basicConfig(level=logging.INFO, stream=open(os.devnull, "w"))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--save", metavar="PATH", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a JSON baseline")
+    parser.add_argument(
+        "--threshold", type=float, default=0.15,
+        help="throughput drop counted as a regression (default 0.15 = 15%%)",
+    )
+    args = parser.parse_args()
+
+    install_telemetry()
+    # Registration happens on import
+    import bench_telemetry  # noqa: F401
+    import bench_tracer  # noqa: F401
+    import bench_worker  # noqa: F401
+    from harness import BENCHMARKS, Runner, compare, load, save
+
+    names = [name for name in sorted(BENCHMARKS) if args.filter in name]
+    runner = Runner()
+    results = {}
+    print(f"{'benchmark':<45} {'ops/s':>14} {'min':>14} {'max':>14}")
+    for name in names:
+        result = runner.run(name)
+        results[name] = result
+        print(
+            f"{name:<45} {result['ops_per_sec']:>14,.0f} "
+            f"{result['min_ops_per_sec']:>14,.0f} {result['max_ops_per_sec']:>14,.0f}",
+            flush=True,
+        )
+    runner.close()
+
+    if args.save:
+        save(args.save, results)
+        print(f"\nSaved {len(results)} results to {args.save}")
+
+    if not args.compare:
+        return 0
+
+    rows = compare(results, load(args.compare), args.threshold)
+    print(f"\n{'benchmark':<45} {'baseline':>14} {'current':>14} {'change':>8}")
+    for name, before, after, change, regressed in rows:
+        flag = "  REGRESSED" if regressed else ""
+        print(f"{name:<45} {before:>14,.0f} {after:>14,.0f} {change:>+8.1%}{flag}")
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than baseline by more than {args.threshold:.0%}")
+        return 1
+    print(f"\nNo regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    code = main()
+    sys.stdout.flush()
+    # The services' own OTLP exporters (created on import, never used) would
+    # try a final export to an absent collector at interpreter exit
+    os._exit(code)
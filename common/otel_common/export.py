@@ -0,0 +1,264 @@
+"""
+OTLP export pipeline shared by the worker and the RabbitMQ tracer.
+
+Configured with the standard OpenTelemetry environment variables:
+
+- OTEL_EXPORTER_OTLP_ENDPOINT / OTEL_EXPORTER_OTLP_HEADERS: collector and
+  `key=value,key=value` headers
+- OTEL_EXPORTER_OTLP_PROTOCOL: `grpc` (default) or `http/protobuf`; for HTTP
+  the endpoint is the base URL and `/v1/traces` / `/v1/metrics` are appended
+- OTEL_EXPORTER_OTLP_COMPRESSION: `none` (default) or `gzip`
+- OTEL_BSP_MAX_QUEUE_SIZE, OTEL_BSP_MAX_EXPORT_BATCH_SIZE,
+  OTEL_BSP_SCHEDULE_DELAY, OTEL_BSP_EXPORT_TIMEOUT: span queue bound, batch
+  size, batch delay and export timeout (milliseconds)
+- OTEL_METRIC_EXPORT_INTERVAL / OTEL_METRIC_EXPORT_TIMEOUT: metric export
+  interval and timeout (milliseconds)
+
+The span queue is the only place spans wait for the exporter, so its size
+bounds exporter memory: when the backend is slow the queue fills and spans
+are dropped instead of buffered. Drops, queue depth and export latency are
+exported as metrics, so backpressure shows up as measured loss.
+"""
+import logging
+import os
+import time
+
+from opentelemetry import metrics
+from opentelemetry.metrics import CallbackOptions, Observation
+from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+from opentelemetry.sdk.metrics.view import ExplicitBucketHistogramAggregation, View
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+
+logger = logging.getLogger(__name__)
+meter = metrics.get_meter(__name__)
+
+PROTOCOLS = ("grpc", "http/protobuf")
+COMPRESSIONS = ("none", "gzip")
+EXPORT_DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+dropped_counter = meter.create_counter(
+    name="otel.exporter.spans.dropped",
+    description=(
+        "Spans dropped before reaching the collector, by reason (queue_full, export_failed, shutdown); "
+        "queue_full is an estimate"
+    ),
+    unit="{span}",
+)
+exported_counter = meter.create_counter(
+    name="otel.exporter.spans.exported",
+    description="Spans successfully exported to the collector",
+    unit="{span}",
+)
+export_duration_histogram = meter.create_histogram(
+    name="otel.exporter.export.duration",
+    description="Time taken by one span export call, by outcome (success or failure)",
+    unit="s",
+)
+
+
+def export_view() -> View:
+    """Bucket boundaries for `otel.exporter.export.duration`, from 5 ms to 30 s."""
+    return View(
+        instrument_name="otel.exporter.export.duration",
+        aggregation=ExplicitBucketHistogramAggregation(boundaries=EXPORT_DURATION_BUCKETS),
+    )
+
+
+def parse_headers(value: str) -> dict:
+    """Parse `key=value,key=value` into a dict."""
+    headers = {}
+    for header in value.split(","):
+        if "=" in header:
+            key, val = header.split("=", 1)
+            headers[key.strip()] = val.strip()
+    return headers
+
+
+class MeteredSpanExporter(SpanExporter):
+    """Wraps an exporter to time each export and count exported and failed spans."""
+
+    def __init__(self, exporter: SpanExporter):
+        self.exporter = exporter
+
+    def export(self, spans) -> SpanExportResult:
+        start = time.perf_counter()
+        try:
+            result = self.exporter.export(spans)
+        except Exception:
+            logger.warning("Span export raised, dropping %d spans", len(spans), exc_info=True)
+            result = SpanExportResult.FAILURE
+        success = result == SpanExportResult.SUCCESS
+        export_duration_histogram.record(
+            time.perf_counter() - start, attributes={"outcome": "success" if success else "failure"}
+        )
+        if success:
+            exported_counter.add(len(spans))
+        else:
+            # The batch processor does not retry; a failed batch is lost
+            dropped_counter.add(len(spans), attributes={"reason": "export_failed"})
+        return result
+
+    def shutdown(self):
+        self.exporter.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.exporter.force_flush(timeout_millis)
+
+
+class MeteredBatchSpanProcessor(BatchSpanProcessor):
+    """
+    BatchSpanProcessor that counts the spans it drops and reports its queue
+    depth. When the queue is full the SDK evicts the oldest queued span to
+    make room, so each span ended on a full queue is one span lost.
+
+    The queue_full count is an estimate: the export thread drains the queue
+    without holding the processor's lock, so a drain racing with an append
+    can hide or, rarely, invent an eviction.
+    """
+
+    def __init__(self, span_exporter: SpanExporter, meter: metrics.Meter = meter, **kwargs):
+        super().__init__(span_exporter, **kwargs)
+        # The gauge holds the processor for as long as the meter's provider lives
+        meter.create_observable_gauge(
+            name="otel.exporter.queue.size",
+            callbacks=[self.observe_queue],
+            description="Spans waiting in the batch processor queue",
+            unit="{span}",
+        )
+
+    def observe_queue(self, options: CallbackOptions):
+        yield Observation(len(self.queue))
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if not span.context.trace_flags.sampled:
+            return
+        if self.done:
+            dropped_counter.add(1, attributes={"reason": "shutdown"})
+            return
+        full = len(self.queue) >= self.max_queue_size
+        super().on_end(span)
+        # Still full after the append: the export thread did not drain the
+        # queue in between, so the append evicted a span
+        if full and len(self.queue) >= self.max_queue_size:
+            dropped_counter.add(1, attributes={"reason": "queue_full"})
+
+
+class ExportSettings:
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:4317",
+        headers: dict = None,
+        protocol: str = "grpc",
+        compression: str = "none",
+        max_queue_size: int = 2048,
+        max_export_batch_size: int = 512,
+        schedule_delay_millis: float = 5000,
+        export_timeout_millis: float = 10000,
+        metric_export_interval_millis: float = 10000,
+        metric_export_timeout_millis: float = 30000,
+    ):
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Unsupported OTLP protocol {protocol!r}, expected one of {', '.join(PROTOCOLS)}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unsupported OTLP compression {compression!r}, expected one of {', '.join(COMPRESSIONS)}")
+        self.endpoint = endpoint.rstrip("/")
+        self.headers = headers or {}
+        self.protocol = protocol
+        self.compression = compression
+        self.max_queue_size = max_queue_size
+        # A batch larger than the queue could never fill
+        self.max_export_batch_size = min(max_export_batch_size, max_queue_size)
+        self.schedule_delay_millis = schedule_delay_millis
+        self.export_timeout_millis = export_timeout_millis
+        self.metric_export_interval_millis = metric_export_interval_millis
+        self.metric_export_timeout_millis = metric_export_timeout_millis
+
+    @classmethod
+    def from_env(cls) -> "ExportSettings":
+        return cls(
+            endpoint=os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4317"),
+            headers=parse_headers(os.getenv("OTEL_EXPORTER_OTLP_HEADERS", "")),
+            protocol=os.getenv("OTEL_EXPORTER_OTLP_PROTOCOL", "grpc").lower(),
+            compression=os.getenv("OTEL_EXPORTER_OTLP_COMPRESSION", "none").lower() or "none",
+            max_queue_size=int(os.getenv("OTEL_BSP_MAX_QUEUE_SIZE", "2048")),
+            max_export_batch_size=int(os.getenv("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", "512")),
+            schedule_delay_millis=float(os.getenv("OTEL_BSP_SCHEDULE_DELAY", "5000")),
+            export_timeout_millis=float(os.getenv("OTEL_BSP_EXPORT_TIMEOUT", "10000")),
+            metric_export_interval_millis=float(os.getenv("OTEL_METRIC_EXPORT_INTERVAL", "10000")),
+            metric_export_timeout_millis=float(os.getenv("OTEL_METRIC_EXPORT_TIMEOUT", "30000")),
+        )
+
+    def describe(self) -> str:
+        return (
+            f"endpoint={self.endpoint}, protocol={self.protocol}, compression={self.compression}, "
+            f"queue={self.max_queue_size}, batch={self.max_export_batch_size}, "
+            f"delay={self.schedule_delay_millis:g}ms, timeout={self.export_timeout_millis:g}ms"
+        )
+
+    def _exporter_args(self) -> dict:
+        # Exporters take whole seconds
+        return {"headers": self.headers, "timeout": max(1, round(self.export_timeout_millis / 1000))}
+
+    def span_exporter(self) -> SpanExporter:
+        if self.protocol == "grpc":
+            import grpc
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+
+            return OTLPSpanExporter(
+                endpoint=self.endpoint,
+                insecure=not self.endpoint.startswith("https://"),
+                compression=grpc.Compression.Gzip if self.compression == "gzip" else grpc.Compression.NoCompression,
+                **self._exporter_args(),
+            )
+
+        from opentelemetry.exporter.otlp.proto.http import Compression
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter(
+            endpoint=f"{self.endpoint}/v1/traces",
+            compression=Compression.Gzip if self.compression == "gzip" else Compression.NoCompression,
+            **self._exporter_args(),
+        )
+
+    def metric_exporter(self):
+        if self.protocol == "grpc":
+            import grpc
+            from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+
+            return OTLPMetricExporter(
+                endpoint=self.endpoint,
+                insecure=not self.endpoint.startswith("https://"),
+                compression=grpc.Compression.Gzip if self.compression == "gzip" else grpc.Compression.NoCompression,
+                **self._exporter_args(),
+            )
+
+        from opentelemetry.exporter.otlp.proto.http import Compression
+        from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+
+        return OTLPMetricExporter(
+            endpoint=f"{self.endpoint}/v1/metrics",
+            compression=Compression.Gzip if self.compression == "gzip" else Compression.NoCompression,
+            **self._exporter_args(),
+        )
+
+    def span_processor(self, exporter: SpanExporter = None, meter: metrics.Meter = meter) -> MeteredBatchSpanProcessor:
+        """
+        A bounded, metered batch processor around `exporter` (default: the
+        configured OTLP exporter), reporting its queue depth through `meter`.
+        """
+        return MeteredBatchSpanProcessor(
+            MeteredSpanExporter(exporter or self.span_exporter()),
+            meter=meter,
+            max_queue_size=self.max_queue_size,
+            schedule_delay_millis=self.schedule_delay_millis,
+            max_export_batch_size=self.max_export_batch_size,
+            export_timeout_millis=self.export_timeout_millis,
+        )
+
+    def metric_reader(self, exporter=None) -> PeriodicExportingMetricReader:
+        return PeriodicExportingMetricReader(
+            exporter or self.metric_exporter(),
+            export_interval_millis=self.metric_export_interval_millis,
+            export_timeout_millis=self.metric_export_timeout_millis,
+        )
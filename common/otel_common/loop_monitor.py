@@ -0,0 +1,196 @@
+"""
+Event-loop health monitor shared by the worker and the RabbitMQ tracer.
+
+- A probe task sleeps `interval` seconds in a loop and records how late it
+  wakes up as `asyncio.loop.lag`: the time the loop spent busy with other
+  callbacks when it should have been running the probe.
+- The number of pending tasks is sampled by the same probe and exported as
+  the `asyncio.loop.tasks` gauge.
+- A watchdog thread notices when the probe is overdue by more than
+  `slow_callback` seconds, captures the loop thread's stack while the
+  offending callback is still running, and once the loop recovers records an
+  `asyncio.slow_callback` span covering the stall, with the callback's name
+  and stack. Because the stack is taken from another thread, this works
+  without asyncio debug mode and costs nothing while the loop is healthy.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+from opentelemetry import metrics, trace
+from opentelemetry.context import Context
+from opentelemetry.metrics import CallbackOptions, Observation
+from opentelemetry.sdk.metrics.view import ExplicitBucketHistogramAggregation, View
+
+logger = logging.getLogger(__name__)
+meter = metrics.get_meter(__name__)
+tracer = trace.get_tracer(__name__)
+
+LAG_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+MAX_STACK_DEPTH = 64
+
+lag_histogram = meter.create_histogram(
+    name="asyncio.loop.lag",
+    description="How late the event loop ran a timer scheduled by the loop monitor",
+    unit="s",
+)
+slow_callback_counter = meter.create_counter(
+    name="asyncio.loop.slow_callbacks",
+    description="Callbacks that blocked the event loop for longer than the slow-callback threshold",
+    unit="{callback}",
+)
+
+
+def lag_view() -> View:
+    """Bucket boundaries for `asyncio.loop.lag`, from 1 ms to 10 s."""
+    return View(
+        instrument_name="asyncio.loop.lag",
+        aggregation=ExplicitBucketHistogramAggregation(boundaries=LAG_BUCKETS),
+    )
+
+
+def callback_frame(frame):
+    """
+    The outermost frame the loop called into: the one directly below
+    asyncio's Handle._run, i.e. the coroutine or callback that is blocking.
+    Falls back to the innermost frame.
+    """
+    callback = None
+    current = frame
+    while current is not None:
+        caller = current.f_back
+        if caller is not None and caller.f_code.co_name == "_run" and caller.f_code.co_filename.endswith("events.py"):
+            callback = current
+        current = caller
+    return callback or frame
+
+
+def frame_name(frame) -> str:
+    return getattr(frame.f_code, "co_qualname", frame.f_code.co_name)
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = 0.1, slow_callback: float = 0.1):
+        self.interval = interval
+        self.slow_callback = slow_callback
+        self.pending_tasks = 0
+        self._loop = None
+        self._loop_thread = None
+        self._probe_task = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+        # Written by the probe, read by the watchdog: when the probe is due
+        # to wake, and (due, woke) of its last wake-up and its last late one
+        self._due = 0.0
+        self._last = (0.0, 0.0)
+        self._late = (0.0, 0.0)
+
+    @classmethod
+    def from_env(cls):
+        """A monitor configured by LOOP_LAG_INTERVAL_MS / LOOP_SLOW_CALLBACK_MS, or None if LOOP_MONITOR=false."""
+        if os.getenv("LOOP_MONITOR", "true").lower() != "true":
+            return None
+        return cls(
+            interval=float(os.getenv("LOOP_LAG_INTERVAL_MS", "100")) / 1000,
+            slow_callback=float(os.getenv("LOOP_SLOW_CALLBACK_MS", "100")) / 1000,
+        )
+
+    def start(self):
+        """Start monitoring the running event loop. Must be called from the loop's thread."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._due = time.monotonic() + self.interval
+        self._last = (self._due, self._due)
+        meter.create_observable_gauge(
+            name="asyncio.loop.tasks",
+            callbacks=[self.observe_tasks],
+            description="Tasks pending on the event loop",
+            unit="{task}",
+        )
+        self._probe_task = self._loop.create_task(self._probe())
+        if self.slow_callback > 0:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+            self._watchdog.start()
+        logger.info(
+            "Event-loop monitor started (interval=%.0fms, slow callback=%.0fms)",
+            self.interval * 1000, self.slow_callback * 1000,
+        )
+
+    def stop(self):
+        self._stopped.set()
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+
+    def observe_tasks(self, options: CallbackOptions):
+        yield Observation(self.pending_tasks)
+
+    async def _probe(self):
+        while True:
+            due = time.monotonic() + self.interval
+            self._due = due
+            await asyncio.sleep(self.interval)
+            woke = time.monotonic()
+            self._last = (due, woke)
+            if woke - due > self.slow_callback:
+                self._late = (due, woke)
+            lag_histogram.record(max(0.0, woke - due))
+            # Sampled here rather than in the gauge callback, which runs on
+            # the metric reader's thread
+            self.pending_tasks = len(asyncio.all_tasks())
+
+    def _watch(self):
+        check = max(self.slow_callback / 4, 0.005)
+        stall = None
+        while not self._stopped.wait(check):
+            due = self._due
+            last_due, woke = self._last
+            if stall is None:
+                if last_due != due and time.monotonic() - due > self.slow_callback:
+                    stall = (due, self._capture())
+            elif last_due >= stall[0]:
+                # The probe finally ran: the stall lasted from `due` until it
+                # woke. With a short interval it may have woken again since
+                # this thread last looked, so take the late wake-up it kept
+                late_due, late_woke = self._late
+                self._record(stall[0], late_woke if late_due == stall[0] else woke, stall[1])
+                stall = None
+
+    def _capture(self):
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return None
+        callback = callback_frame(frame)
+        task = asyncio.current_task(self._loop)
+        return {
+            "asyncio.callback": frame_name(callback),
+            "asyncio.task": task.get_name() if task is not None else "",
+            "code.function": frame_name(frame),
+            "code.filepath": frame.f_code.co_filename,
+            "code.lineno": frame.f_lineno,
+            "code.stacktrace": "".join(traceback.format_stack(frame, limit=MAX_STACK_DEPTH)),
+        }
+
+    def _record(self, due: float, woke: float, details: dict):
+        blocked = woke - due
+        attributes = dict(details or {"asyncio.callback": "<unknown>"})
+        attributes["asyncio.blocked_seconds"] = round(blocked, 6)
+        slow_callback_counter.add(1, attributes={"asyncio.callback": attributes["asyncio.callback"]})
+
+        # Convert the probe's monotonic timestamps to wall-clock span times
+        offset = time.time() - time.monotonic()
+        span = tracer.start_span(
+            "asyncio.slow_callback",
+            context=Context(),
+            start_time=int((due + offset) * 1e9),
+            attributes=attributes,
+        )
+        span.end(end_time=int((woke + offset) * 1e9))
+        logger.warning(
+            "Event loop blocked for %.0fms by %s, in %s (%s:%s)",
+            blocked * 1000, attributes["asyncio.callback"], attributes.get("code.function", "?"),
+            attributes.get("code.filepath", "?"), attributes.get("code.lineno", "?"),
+        )
@@ -0,0 +1,207 @@
+"""
+Trace sampling engine shared by the worker and the RabbitMQ tracer.
+
+- Root spans are sampled by trace-ID ratio, so every service that sees the
+  same trace makes the same decision.
+- Per-span-name rules replace that ratio for root spans with those names.
+- Spans with a parent always follow the parent's decision, so a trace is
+  never left with orphaned children or holes.
+- Span names listed in `keep_errors` are recorded even when not sampled;
+  `ErrorKeepingSpanProcessor` exports them anyway if they end with an error.
+- With a spans/sec budget the root ratio is adjusted continuously so the
+  number of sampled spans stays around that budget.
+"""
+import os
+import logging
+import threading
+import time
+
+from opentelemetry import metrics, trace
+from opentelemetry.context import Context
+from opentelemetry.metrics import CallbackOptions, Observation
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor
+from opentelemetry.sdk.trace.sampling import Decision, Sampler, SamplingResult
+from opentelemetry.trace import SpanContext, StatusCode, TraceFlags
+
+logger = logging.getLogger(__name__)
+meter = metrics.get_meter(__name__)
+
+sampling_counter = meter.create_counter(
+    name="otel.sampler.spans",
+    description="Sampling decisions by span name and decision (sampled, dropped, recorded, kept_error)",
+    unit="{span}",
+)
+
+TRACE_ID_LIMIT = (1 << 64) - 1
+
+
+def _bound(ratio: float) -> int:
+    return round(min(1.0, max(0.0, ratio)) * (TRACE_ID_LIMIT + 1))
+
+
+def parse_rules(value: str) -> dict:
+    """Parse `span_name=ratio,span_name=ratio` into a dict."""
+    rules = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, ratio = item.split("=", 1)
+            rules[name.strip()] = float(ratio)
+    return rules
+
+
+class SamplingEngine(Sampler):
+    def __init__(
+        self,
+        ratio: float = 1.0,
+        rules: dict = None,
+        keep_errors: set = None,
+        spans_per_second: float = 0.0,
+        adjust_interval: float = 10.0,
+        min_ratio: float = 0.0001,
+        meter: metrics.Meter = meter,
+    ):
+        self.ratio = ratio
+        self.rules = {name: _bound(rate) for name, rate in (rules or {}).items()}
+        self.keep_errors = keep_errors or set()
+        self.spans_per_second = spans_per_second
+        self.adjust_interval = adjust_interval
+        self.min_ratio = min_ratio
+        self._root_bound = _bound(ratio)
+        self._window_start = time.monotonic()
+        self._window_sampled = 0
+        self._lock = threading.Lock()
+
+        # The gauge holds the engine for as long as the meter's provider lives
+        meter.create_observable_gauge(
+            name="otel.sampler.ratio",
+            callbacks=[self.observe_ratio],
+            description="Current root span sampling ratio",
+        )
+
+    @classmethod
+    def from_env(cls, meter: metrics.Meter = meter) -> "SamplingEngine":
+        keep_errors = os.getenv("TRACE_KEEP_ERRORS", "")
+        return cls(
+            ratio=float(os.getenv("TRACE_SAMPLE_RATIO", "1.0")),
+            rules=parse_rules(os.getenv("TRACE_SAMPLE_RULES", "")),
+            keep_errors={name.strip() for name in keep_errors.split(",") if name.strip()},
+            spans_per_second=float(os.getenv("TRACE_SPANS_PER_SECOND", "0")),
+            adjust_interval=float(os.getenv("TRACE_SAMPLER_INTERVAL", "10")),
+            meter=meter,
+        )
+
+    def should_sample(
+        self,
+        parent_context: Context = None,
+        trace_id: int = 0,
+        name: str = "",
+        kind=None,
+        attributes=None,
+        links=None,
+        trace_state=None,
+    ) -> SamplingResult:
+        parent = trace.get_current_span(parent_context).get_span_context()
+
+        if parent.is_valid:
+            sampled = parent.trace_flags.sampled
+        else:
+            sampled = trace_id & TRACE_ID_LIMIT < self.rules.get(name, self._root_bound)
+
+        if sampled:
+            decision = Decision.RECORD_AND_SAMPLE
+            outcome = "sampled"
+            self._count_sampled()
+        elif name in self.keep_errors or "*" in self.keep_errors:
+            decision = Decision.RECORD_ONLY
+            outcome = "recorded"
+        else:
+            decision = Decision.DROP
+            outcome = "dropped"
+            attributes = None
+
+        sampling_counter.add(1, attributes={"span.name": name, "decision": outcome})
+        return SamplingResult(
+            decision,
+            attributes,
+            parent.trace_state if parent.is_valid else trace_state,
+        )
+
+    def _count_sampled(self):
+        if not self.spans_per_second:
+            return
+        with self._lock:
+            self._window_sampled += 1
+            elapsed = time.monotonic() - self._window_start
+            if elapsed < self.adjust_interval:
+                return
+            rate = self._window_sampled / elapsed
+            self._window_start = time.monotonic()
+            self._window_sampled = 0
+
+            # Scale towards the budget, at most 2x per step in either direction
+            factor = min(2.0, max(0.5, self.spans_per_second / rate)) if rate else 2.0
+            ratio = min(1.0, max(self.min_ratio, self.ratio * factor))
+            if ratio != self.ratio:
+                logger.debug(
+                    "Sampling ratio %.4f -> %.4f (%.1f spans/s, budget %.1f)",
+                    self.ratio, ratio, rate, self.spans_per_second,
+                )
+                self.ratio = ratio
+                self._root_bound = _bound(ratio)
+
+    def observe_ratio(self, options: CallbackOptions):
+        yield Observation(self.ratio)
+
+    def get_description(self) -> str:
+        mode = f"budget={self.spans_per_second}/s" if self.spans_per_second else "fixed"
+        return f"SamplingEngine{{ratio={self.ratio}, rules={len(self.rules)}, {mode}}}"
+
+
+class ErrorKeepingSpanProcessor(SpanProcessor):
+    """
+    Wraps an exporting span processor. Sampled spans pass through unchanged;
+    recorded-but-unsampled spans (see `SamplingEngine.keep_errors`) are passed
+    on as sampled only when they ended with an error status.
+    """
+
+    def __init__(self, delegate: SpanProcessor):
+        self.delegate = delegate
+
+    def on_start(self, span, parent_context=None):
+        self.delegate.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan):
+        if span.context.trace_flags.sampled:
+            self.delegate.on_end(span)
+            return
+        if span.status.status_code is not StatusCode.ERROR:
+            return
+
+        sampling_counter.add(1, attributes={"span.name": span.name, "decision": "kept_error"})
+        context = SpanContext(
+            span.context.trace_id,
+            span.context.span_id,
+            span.context.is_remote,
+            TraceFlags(TraceFlags.SAMPLED),
+            span.context.trace_state,
+        )
+        self.delegate.on_end(ReadableSpan(
+            name=span.name,
+            context=context,
+            parent=span.parent,
+            resource=span.resource,
+            attributes=span.attributes,
+            events=span.events,
+            links=span.links,
+            kind=span.kind,
+            status=span.status,
+            start_time=span.start_time,
+            end_time=span.end_time,
+            instrumentation_scope=span.instrumentation_scope,
+        ))
+
+    def shutdown(self):
+        self.delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.delegate.force_flush(timeout_millis)
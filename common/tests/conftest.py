@@ -0,0 +1,8 @@
+import os
+import sys
+
+# otel_common is copied into each service image; from a checkout it is
+# imported from common/
+COMMON = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if COMMON not in sys.path:
+    sys.path.insert(0, COMMON)
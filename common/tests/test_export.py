@@ -0,0 +1,163 @@
+import threading
+from collections import Counter
+
+import pytest
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.trace import SpanContext, TraceFlags
+
+from otel_common import export
+from otel_common.export import ExportSettings, MeteredBatchSpanProcessor, MeteredSpanExporter
+
+
+class RecordingCounter:
+    def __init__(self):
+        self.counts = Counter()
+
+    def add(self, amount, attributes=None):
+        self.counts[(attributes or {}).get("reason")] += amount
+
+
+class BlockingExporter(SpanExporter):
+    """Holds the export thread inside export() until released."""
+
+    def __init__(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def export(self, spans):
+        self.entered.set()
+        self.release.wait(5)
+        return SpanExportResult.SUCCESS
+
+
+@pytest.fixture
+def dropped(monkeypatch):
+    counter = RecordingCounter()
+    monkeypatch.setattr(export, "dropped_counter", counter)
+    return counter.counts
+
+
+def span(sampled: bool = True) -> ReadableSpan:
+    flags = TraceFlags(TraceFlags.SAMPLED if sampled else TraceFlags.DEFAULT)
+    return ReadableSpan(name="s", context=SpanContext(trace_id=1, span_id=1, is_remote=False, trace_flags=flags))
+
+
+def test_span_after_shutdown_counted_once(dropped):
+    processor = MeteredBatchSpanProcessor(BlockingExporter(), max_queue_size=4, max_export_batch_size=4)
+    processor.shutdown()
+    processor.on_end(span())
+    assert dropped == {"shutdown": 1}
+
+
+def test_shutdown_drop_on_full_queue_not_counted_as_queue_full(dropped):
+    exporter = BlockingExporter()
+    processor = MeteredBatchSpanProcessor(
+        exporter, max_queue_size=4, max_export_batch_size=4, schedule_delay_millis=60000
+    )
+    try:
+        for _ in range(4):
+            processor.on_end(span())
+        assert exporter.entered.wait(5)
+        for _ in range(4):
+            processor.on_end(span())
+        # Shutdown begun while the queue is full and the export thread is busy
+        processor.done = True
+        processor.on_end(span())
+        assert dropped == {"shutdown": 1}
+    finally:
+        exporter.release.set()
+        processor.shutdown()
+
+
+def test_unsampled_spans_not_counted(dropped):
+    processor = MeteredBatchSpanProcessor(BlockingExporter(), max_queue_size=2, max_export_batch_size=2)
+    processor.shutdown()
+    processor.on_end(span(sampled=False))
+    assert not dropped
+
+
+def test_full_queue_counts_evictions(dropped):
+    exporter = BlockingExporter()
+    processor = MeteredBatchSpanProcessor(
+        exporter, max_queue_size=4, max_export_batch_size=4, schedule_delay_millis=60000
+    )
+    try:
+        # The first batch holds the export thread, so the queue can only fill
+        for _ in range(4):
+            processor.on_end(span())
+        assert exporter.entered.wait(5)
+        for _ in range(4):
+            processor.on_end(span())
+        assert not dropped
+        for _ in range(2):
+            processor.on_end(span())
+        assert dropped == {"queue_full": 2}
+        assert len(processor.queue) == 4
+    finally:
+        exporter.release.set()
+        processor.shutdown()
+
+
+class FixedExporter(SpanExporter):
+    def __init__(self, outcome):
+        self.outcome = outcome
+
+    def export(self, spans):
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+def test_metered_exporter_counts_outcomes(monkeypatch, dropped):
+    exported = RecordingCounter()
+    monkeypatch.setattr(export, "exported_counter", exported)
+    spans = [span(), span()]
+
+    assert MeteredSpanExporter(FixedExporter(SpanExportResult.SUCCESS)).export(spans) == SpanExportResult.SUCCESS
+    assert MeteredSpanExporter(FixedExporter(SpanExportResult.FAILURE)).export(spans) == SpanExportResult.FAILURE
+    assert MeteredSpanExporter(FixedExporter(RuntimeError("down"))).export(spans) == SpanExportResult.FAILURE
+    assert exported.counts == {None: 2}
+    assert dropped == {"export_failed": 4}
+
+
+@pytest.mark.parametrize("field,value", [("protocol", "http/json"), ("compression", "zstd")])
+def test_settings_reject_unsupported_values(field, value):
+    with pytest.raises(ValueError, match=value):
+        ExportSettings(**{field: value})
+
+
+def test_batch_size_capped_at_queue_size():
+    settings = ExportSettings(max_queue_size=100, max_export_batch_size=512)
+    assert settings.max_export_batch_size == 100
+
+
+def test_settings_from_env(monkeypatch):
+    monkeypatch.setenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://collector:4318/")
+    monkeypatch.setenv("OTEL_EXPORTER_OTLP_HEADERS", "authorization=abc, x-team = obs")
+    monkeypatch.setenv("OTEL_EXPORTER_OTLP_PROTOCOL", "HTTP/PROTOBUF")
+    monkeypatch.setenv("OTEL_EXPORTER_OTLP_COMPRESSION", "gzip")
+    monkeypatch.setenv("OTEL_BSP_MAX_QUEUE_SIZE", "8192")
+    monkeypatch.setenv("OTEL_BSP_SCHEDULE_DELAY", "250")
+    settings = ExportSettings.from_env()
+    assert settings.endpoint == "http://collector:4318"
+    assert settings.headers == {"authorization": "abc", "x-team": "obs"}
+    assert (settings.protocol, settings.compression) == ("http/protobuf", "gzip")
+    assert (settings.max_queue_size, settings.max_export_batch_size) == (8192, 512)
+    assert settings.schedule_delay_millis == 250
+
+
+def test_queue_gauge_registered_on_given_meter():
+    reader = InMemoryMetricReader()
+    provider = MeterProvider(metric_readers=[reader])
+    ExportSettings().span_processor(BlockingExporter(), provider.get_meter("test")).shutdown()
+    names = [
+        metric.name
+        for resource in reader.get_metrics_data().resource_metrics
+        for scope in resource.scope_metrics
+        for metric in scope.metrics
+    ]
+    assert names == ["otel.exporter.queue.size"]
+    provider.shutdown()
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from otel_common import loop_monitor
+from otel_common.loop_monitor import LoopMonitor
+
+
+class Recorder:
+    def __init__(self):
+        self.values = []
+
+    def record(self, value, attributes=None):
+        self.values.append(value)
+
+    def add(self, amount, attributes=None):
+        self.values.append((amount, attributes))
+
+
+@pytest.fixture
+def telemetry(monkeypatch):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    lag, slow = Recorder(), Recorder()
+    monkeypatch.setattr(loop_monitor, "tracer", provider.get_tracer(__name__))
+    monkeypatch.setattr(loop_monitor, "lag_histogram", lag)
+    monkeypatch.setattr(loop_monitor, "slow_callback_counter", slow)
+    return exporter, lag.values, slow.values
+
+
+def blocking_handler():
+    time.sleep(0.3)
+
+
+async def stall_loop():
+    await asyncio.sleep(0.05)
+    blocking_handler()
+    await asyncio.sleep(0.2)
+
+
+def monitored(coroutine_fn, **kwargs):
+    async def run():
+        monitor = LoopMonitor(**kwargs)
+        monitor.start()
+        try:
+            # In a task of its own, so it is the callback the loop ran
+            await asyncio.create_task(coroutine_fn())
+        finally:
+            monitor.stop()
+        return monitor
+
+    return asyncio.run(run())
+
+
+def test_stall_recorded_as_slow_callback_span(telemetry):
+    exporter, lag, slow = telemetry
+    monitored(stall_loop, interval=0.01, slow_callback=0.1)
+
+    (span,) = exporter.get_finished_spans()
+    assert span.name == "asyncio.slow_callback"
+    assert span.parent is None
+    attributes = span.attributes
+    assert attributes["asyncio.callback"] == "stall_loop"
+    assert attributes["code.function"] == "blocking_handler"
+    assert attributes["code.filepath"] == __file__
+    assert "blocking_handler" in attributes["code.stacktrace"]
+    assert attributes["asyncio.blocked_seconds"] >= 0.25
+    assert (span.end_time - span.start_time) / 1e9 == pytest.approx(attributes["asyncio.blocked_seconds"], abs=0.001)
+    assert slow == [(1, {"asyncio.callback": "stall_loop"})]
+
+
+def test_lag_histogram_records_the_stall(telemetry):
+    exporter, lag, slow = telemetry
+    monitored(stall_loop, interval=0.01, slow_callback=0.1)
+    assert max(lag) >= 0.25
+    # Outside the stall the probe wakes close to on time
+    assert sorted(lag)[len(lag) // 2] < 0.05
+
+
+def test_healthy_loop_records_no_slow_callbacks(telemetry):
+    exporter, lag, slow = telemetry
+
+    async def healthy():
+        for _ in range(20):
+            await asyncio.sleep(0.01)
+
+    monitor = monitored(healthy, interval=0.01, slow_callback=0.1)
+    assert not exporter.get_finished_spans()
+    assert not slow
+    assert lag
+    assert monitor.pending_tasks >= 1
+
+
+def test_watchdog_disabled_without_threshold(telemetry):
+    exporter, lag, slow = telemetry
+    monitor = monitored(stall_loop, interval=0.01, slow_callback=0)
+    assert monitor._watchdog is None
+    assert not exporter.get_finished_spans()
+    assert max(lag) >= 0.25
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("LOOP_LAG_INTERVAL_MS", "250")
+    monkeypatch.setenv("LOOP_SLOW_CALLBACK_MS", "40")
+    monitor = LoopMonitor.from_env()
+    assert (monitor.interval, monitor.slow_callback) == (0.25, 0.04)
+    monkeypatch.setenv("LOOP_MONITOR", "false")
+    assert LoopMonitor.from_env() is None
@@ -0,0 +1,127 @@
+import gc
+import types
+import weakref
+
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.sampling import Decision
+from opentelemetry.trace import NonRecordingSpan, SpanContext, Status, StatusCode, TraceFlags
+
+from otel_common import sampling
+from otel_common.sampling import TRACE_ID_LIMIT, ErrorKeepingSpanProcessor, SamplingEngine, parse_rules
+
+# Trace IDs whose low 64 bits sit at 10% and 90% of the ratio range
+LOW = int(TRACE_ID_LIMIT * 0.1)
+HIGH = int(TRACE_ID_LIMIT * 0.9)
+
+
+def parent(sampled: bool):
+    context = SpanContext(
+        trace_id=1,
+        span_id=2,
+        is_remote=True,
+        trace_flags=TraceFlags(TraceFlags.SAMPLED if sampled else TraceFlags.DEFAULT),
+    )
+    return trace.set_span_in_context(NonRecordingSpan(context))
+
+
+def decide(engine: SamplingEngine, trace_id: int, name: str = "span", context=None) -> Decision:
+    return engine.should_sample(context, trace_id, name).decision
+
+
+def test_parse_rules():
+    assert parse_rules("a=0.5, b = 1,junk") == {"a": 0.5, "b": 1.0}
+
+
+def test_root_ratio():
+    engine = SamplingEngine(ratio=0.5)
+    assert decide(engine, LOW) is Decision.RECORD_AND_SAMPLE
+    assert decide(engine, HIGH) is Decision.DROP
+
+
+def test_children_follow_parent():
+    engine = SamplingEngine(ratio=0.0)
+    assert decide(engine, HIGH, context=parent(True)) is Decision.RECORD_AND_SAMPLE
+    assert decide(SamplingEngine(ratio=1.0), LOW, context=parent(False)) is Decision.DROP
+
+
+def test_rules_replace_root_ratio():
+    engine = SamplingEngine(ratio=1.0, rules={"noisy": 0.5, "rare": 1.0})
+    assert decide(engine, HIGH, "noisy") is Decision.DROP
+    assert decide(engine, LOW, "noisy") is Decision.RECORD_AND_SAMPLE
+    assert decide(SamplingEngine(ratio=0.0, rules={"rare": 1.0}), HIGH, "rare") is Decision.RECORD_AND_SAMPLE
+
+
+@pytest.mark.parametrize("sampled", [True, False])
+def test_parent_wins_over_rules(sampled):
+    engine = SamplingEngine(ratio=0.5, rules={"child": 0.0 if sampled else 1.0})
+    expected = Decision.RECORD_AND_SAMPLE if sampled else Decision.DROP
+    assert decide(engine, LOW, "child", parent(sampled)) is expected
+
+
+def test_keep_errors_records_unsampled():
+    engine = SamplingEngine(ratio=0.0, keep_errors={"process_order"})
+    assert decide(engine, LOW, "process_order") is Decision.RECORD_ONLY
+    assert decide(engine, LOW, "other") is Decision.DROP
+    assert decide(SamplingEngine(ratio=0.0, keep_errors={"*"}), LOW, "other") is Decision.RECORD_ONLY
+
+
+def test_budget_adjusts_ratio(monkeypatch):
+    clock = types.SimpleNamespace(now=0.0)
+    clock.monotonic = lambda: clock.now
+    monkeypatch.setattr(sampling, "time", clock)
+    engine = SamplingEngine(ratio=1.0, spans_per_second=10, adjust_interval=1.0)
+
+    # 100 sampled spans in one second against a budget of 10: halve (the max step)
+    for _ in range(99):
+        decide(engine, LOW)
+    clock.now = 1.0
+    decide(engine, LOW)
+    assert engine.ratio == 0.5
+
+    # Under budget: double, capped at 1.0
+    clock.now = 2.0
+    decide(engine, LOW)
+    assert engine.ratio == 1.0
+
+
+class Recorder:
+    def __init__(self):
+        self.ended = []
+
+    def on_end(self, span):
+        self.ended.append(span)
+
+
+def span(sampled: bool, status: StatusCode) -> ReadableSpan:
+    context = SpanContext(1, 2, False, TraceFlags(TraceFlags.SAMPLED if sampled else TraceFlags.DEFAULT))
+    return ReadableSpan(name="process_order", context=context, status=Status(status))
+
+
+def test_error_keeping_processor():
+    recorder = Recorder()
+    processor = ErrorKeepingSpanProcessor(recorder)
+    processor.on_end(span(True, StatusCode.OK))
+    processor.on_end(span(False, StatusCode.OK))
+    processor.on_end(span(False, StatusCode.ERROR))
+    assert len(recorder.ended) == 2
+    assert recorder.ended[1].context.trace_flags.sampled
+    assert recorder.ended[1].status.status_code is StatusCode.ERROR
+
+
+def test_ratio_gauge_released_with_its_meter_provider():
+    reader = InMemoryMetricReader()
+    provider = MeterProvider(metric_readers=[reader])
+    engine = SamplingEngine(ratio=0.25, meter=provider.get_meter("test"))
+    (metric,) = reader.get_metrics_data().resource_metrics[0].scope_metrics[0].metrics
+    assert metric.name == "otel.sampler.ratio"
+    assert metric.data.data_points[0].value == 0.25
+
+    provider.shutdown()
+    ref = weakref.ref(engine)
+    del engine, provider, reader, metric
+    gc.collect()
+    assert ref() is None
@@ -0,0 +1,103 @@
+"""
+Open-model (arrival-rate) users for Locust.
+
+A regular Locust user is a closed loop: it waits for each response before
+sleeping and sending the next request, so when the API slows down the
+offered load drops with it and saturation is hidden (coordinated omission).
+
+An ArrivalRateUser instead schedules requests as a Poisson process at
+`arrival_rate` per second and fires each one in its own greenlet without
+waiting for earlier responses. N users therefore offer N * arrival_rate
+requests/sec no matter how slow the system under test gets. Outstanding
+requests per user are capped; arrivals past the cap are counted as missed
+rather than queued, so a saturated run shows up as missed arrivals.
+"""
+import logging
+import os
+import random
+import time
+
+import gevent
+from gevent.pool import Group
+from locust import HttpUser, constant, events, task
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+LOAD_MODEL = os.getenv("LOADGEN_MODEL", "closed").lower()
+USER_ARRIVAL_RATE = float(os.getenv("LOADGEN_USER_RATE", "1"))
+MAX_OUTSTANDING = int(os.getenv("LOADGEN_MAX_OUTSTANDING", "50"))
+
+
+class ArrivalCounters:
+    """Arrivals offered and missed, summed across workers on the master"""
+
+    def __init__(self):
+        self.offered = 0
+        self.missed = 0
+
+    def take(self) -> tuple:
+        counts = (self.offered, self.missed)
+        self.offered = 0
+        self.missed = 0
+        return counts
+
+
+arrival_counters = ArrivalCounters()
+
+
+@events.report_to_master.add_listener
+def _report_arrivals(client_id, data, **kwargs):
+    data["arrivals"] = arrival_counters.take()
+
+
+@events.worker_report.add_listener
+def _collect_arrivals(client_id, data, **kwargs):
+    offered, missed = data.get("arrivals", (0, 0))
+    arrival_counters.offered += offered
+    arrival_counters.missed += missed
+
+
+class ArrivalRateUser(HttpUser):
+    """
+    Runs `arrival_tasks` (a weighted task list, as built by Locust for a
+    closed-model user) at `arrival_rate` per second, open loop.
+    """
+
+    abstract = True
+    wait_time = constant(0)
+
+    arrival_rate = USER_ARRIVAL_RATE
+    max_outstanding = MAX_OUTSTANDING
+    arrival_tasks = []
+
+    def on_start(self):
+        self._outstanding = Group()
+        # Concurrent requests from one user need more than the default 10
+        # pooled connections, or urllib3 discards and reopens them
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_outstanding)
+        self.client.mount("http://", adapter)
+        self.client.mount("https://", adapter)
+
+    def on_stop(self):
+        self._outstanding.kill(block=False)
+
+    @task
+    def _arrive(self):
+        next_arrival = time.monotonic()
+        while True:
+            next_arrival += random.expovariate(self.arrival_rate)
+            # Always yield, even when behind schedule, so responses get handled
+            gevent.sleep(max(0.0, next_arrival - time.monotonic()))
+
+            arrival_counters.offered += 1
+            if len(self._outstanding) >= self.max_outstanding:
+                arrival_counters.missed += 1
+                continue
+            self._outstanding.spawn(self._run_arrival, random.choice(self.arrival_tasks))
+
+    def _run_arrival(self, arrival_task):
+        try:
+            arrival_task(self)
+        except Exception as e:
+            logger.error(f"Arrival task {arrival_task.__name__} failed: {e}", exc_info=True)
@@ -0,0 +1,161 @@
+"""
+End-to-end latency of the asynchronous order pipeline.
+
+With LOADGEN_E2E=true, create_order stamps each order with a correlation ID
+and send time. A completion listener consumes the worker's `order.processed`
+events (from the `orders.processed` fan-out exchange, through an exclusive
+queue per Locust process) and reports the time from send to processed as a
+Locust request of type `E2E`, so it gets the same percentiles and charts as
+the HTTP requests. Orders the worker failed are reported as failures, and
+orders with no completion within LOADGEN_E2E_TIMEOUT seconds as timeouts.
+
+In distributed mode every worker process runs its own listener; the
+fan-out delivers all events to each, and each only reports the orders it
+sent.
+"""
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+import gevent
+import pika
+from locust import events
+from locust.runners import MasterRunner
+
+logger = logging.getLogger(__name__)
+# pika logs every failed connection attempt at ERROR; the retry loop below
+# reports disconnects itself
+logging.getLogger("pika").setLevel(logging.CRITICAL)
+
+E2E_ENABLED = os.getenv("LOADGEN_E2E", "false").lower() == "true"
+E2E_TIMEOUT = float(os.getenv("LOADGEN_E2E_TIMEOUT", "60"))
+MAX_PENDING = int(os.getenv("LOADGEN_E2E_MAX_PENDING", "100000"))
+PROCESSED_EXCHANGE = "orders.processed"
+
+REQUEST_TYPE = "E2E"
+
+
+class CompletionTracker:
+    def __init__(self, environment, timeout: float = E2E_TIMEOUT, max_pending: int = MAX_PENDING):
+        self.environment = environment
+        self.timeout = timeout
+        self.max_pending = max_pending
+        # correlation id -> (send time ms, product); insertion order is send order
+        self._pending = OrderedDict()
+        self._running = False
+
+    def stamp(self, order: dict) -> str:
+        """Add a correlation ID and send time to an order payload and start tracking it"""
+        correlation_id = str(uuid.uuid4())
+        sent_at_ms = int(time.time() * 1000)
+        order["correlationId"] = correlation_id
+        order["sentAtMs"] = sent_at_ms
+        self._pending[correlation_id] = (sent_at_ms, order.get("product", ""))
+        while len(self._pending) > self.max_pending:
+            self._expire_oldest("evicted")
+        return correlation_id
+
+    def discard(self, correlation_id: str):
+        """The order was never accepted (non-201), so no completion will come"""
+        self._pending.pop(correlation_id, None)
+
+    def complete(self, event: dict):
+        pending = self._pending.pop(event.get("CorrelationId"), None)
+        if pending is None:
+            # Another process's order, or one we already timed out
+            return
+        sent_at_ms, product = pending
+        latency_ms = max(0, int(time.time() * 1000) - sent_at_ms)
+        exception = None
+        if event.get("Status") != "success":
+            exception = Exception(f"Order processing {event.get('Status')}")
+        self._fire(product, latency_ms, exception)
+
+    def _fire(self, product: str, latency_ms: float, exception=None):
+        self.environment.events.request.fire(
+            request_type=REQUEST_TYPE,
+            name="order.processed",
+            response_time=latency_ms,
+            response_length=0,
+            exception=exception,
+            context={"product": product},
+        )
+
+    def _expire_oldest(self, reason: str):
+        _, (sent_at_ms, product) = self._pending.popitem(last=False)
+        latency_ms = int(time.time() * 1000) - sent_at_ms
+        self._fire(product, latency_ms, Exception(f"No order.processed event ({reason})"))
+
+    def expire(self):
+        cutoff_ms = (time.time() - self.timeout) * 1000
+        while self._pending:
+            sent_at_ms, _ = next(iter(self._pending.values()))
+            if sent_at_ms > cutoff_ms:
+                break
+            self._expire_oldest("timeout")
+
+    def start(self):
+        self._running = True
+        gevent.spawn(self._listen)
+
+    def stop(self):
+        self._running = False
+
+    def _listen(self):
+        host = os.getenv("RABBITMQ_HOST", "localhost")
+        credentials = pika.PlainCredentials(
+            os.getenv("RABBITMQ_USERNAME", "demo"), os.getenv("RABBITMQ_PASSWORD", "demo")
+        )
+        params = pika.ConnectionParameters(host=host, credentials=credentials, heartbeat=30)
+
+        while self._running:
+            try:
+                connection = pika.BlockingConnection(params)
+                channel = connection.channel()
+                channel.exchange_declare(PROCESSED_EXCHANGE, exchange_type="fanout", durable=True)
+                queue = channel.queue_declare("", exclusive=True, auto_delete=True).method.queue
+                channel.queue_bind(queue, PROCESSED_EXCHANGE)
+                logger.info(f"Listening for order.processed events on {host}")
+
+                # inactivity_timeout yields (None, None, None) once a second so
+                # timeouts are checked and stop() is noticed while idle
+                last_expire = time.monotonic()
+                for method, _, body in channel.consume(queue, auto_ack=True, inactivity_timeout=1):
+                    if not self._running:
+                        break
+                    if time.monotonic() - last_expire >= 1:
+                        self.expire()
+                        last_expire = time.monotonic()
+                    if method is None:
+                        continue
+                    try:
+                        self.complete(json.loads(body))
+                    except (ValueError, AttributeError):
+                        logger.debug(f"Ignoring malformed order.processed event: {body[:200]!r}")
+                connection.close()
+            except pika.exceptions.AMQPError as e:
+                logger.warning(f"Completion listener disconnected: {e!r}, retrying...")
+                self.expire()
+                gevent.sleep(2)
+
+
+completion_tracker = None
+
+
+@events.init.add_listener
+def _start_completion_tracker(environment, **kwargs):
+    global completion_tracker
+    # The master only aggregates stats; listeners run where orders are sent
+    if not E2E_ENABLED or isinstance(environment.runner, MasterRunner):
+        return
+    completion_tracker = CompletionTracker(environment)
+    completion_tracker.start()
+
+
+@events.quitting.add_listener
+def _stop_completion_tracker(environment, **kwargs):
+    if completion_tracker is not None:
+        completion_tracker.stop()
@@ -1,6 +1,22 @@
+import os
 import random
 from locust import HttpUser, task, between
 
+import completions
+from arrivals import LOAD_MODEL, ArrivalRateUser
+from orderpool import order_pool, random_order_id
+from shapes import select_shape
+
+# Share of requests that are reads, and of those the share that list orders
+# rather than fetch one. The defaults keep the original 10:3:1 task mix.
+READ_RATIO = float(os.getenv("LOADGEN_READ_RATIO", str(4 / 14)))
+LIST_SHARE = float(os.getenv("LOADGEN_LIST_SHARE", "0.75"))
+LIST_LIMIT = int(os.getenv("LOADGEN_LIST_LIMIT", "50"))
+
+WRITE_WEIGHT = round(100 * (1 - READ_RATIO))
+LIST_WEIGHT = round(100 * READ_RATIO * LIST_SHARE)
+DETAIL_WEIGHT = round(100 * READ_RATIO * (1 - LIST_SHARE))
+
 
 class OrderUser(HttpUser):
     """
@@ -10,15 +26,21 @@ class OrderUser(HttpUser):
     different traffic patterns.
     """
 
+    # Closed model (default); replaced by OpenOrderUser when LOADGEN_MODEL=open
+    abstract = LOAD_MODEL == "open"
+
     # Wait between 1 and 3 seconds between tasks
     wait_time = between(1, 3)
 
-    @task(10)
+    @task(WRITE_WEIGHT)
     def create_order(self):
         """
         Creates a new order via POST /orders.
 
-        Weight: 10 (most common operation)
+        Weight: 1 - LOADGEN_READ_RATIO (most common operation by default)
+        Created order IDs go into the shared pool used by get_order_detail.
+        With LOADGEN_E2E=true the time until the worker has processed the
+        order is also recorded (see completions.py).
         Occasionally triggers errors to demonstrate error tracking:
         - 90% normal products
         - 5% "error" (triggers API error)
@@ -54,6 +76,11 @@ class OrderUser(HttpUser):
             "customerName": f"LoadTest-User-{random.randint(1000, 9999)}",
         }
 
+        # With LOADGEN_E2E=true the order carries a correlation ID and send
+        # time, and its completion is reported as an E2E request
+        tracker = completions.completion_tracker
+        correlation_id = tracker.stamp(order) if tracker is not None else None
+
         with self.client.post(
             "/orders",
             json=order,
@@ -63,21 +90,26 @@ class OrderUser(HttpUser):
             # For "error" product, we expect 500 and that's OK for our demo
             if response.status_code == expected_status:
                 response.success()
+                if response.status_code == 201:
+                    order_pool.add(response.json()["id"])
             elif product == "error" and response.status_code == 500:
                 # Mark as success since this is expected behavior for demo
                 response.success()
             else:
                 response.failure(f"Got status {response.status_code}")
 
-    @task(3)
+            if correlation_id is not None and response.status_code != 201:
+                tracker.discard(correlation_id)
+
+    @task(LIST_WEIGHT)
     def list_orders(self):
         """
-        Lists all orders via GET /orders.
+        Lists the most recent orders via GET /orders?limit=N.
 
-        Weight: 3 (less common than creating)
+        Weight: LOADGEN_READ_RATIO * LOADGEN_LIST_SHARE
         """
         with self.client.get(
-            "/orders",
+            f"/orders?limit={LIST_LIMIT}",
             catch_response=True,
             name="GET /orders"
         ) as response:
@@ -86,24 +118,43 @@ class OrderUser(HttpUser):
             else:
                 response.failure(f"Got status {response.status_code}")
 
-    @task(1)
+    @task(DETAIL_WEIGHT)
     def get_order_detail(self):
         """
         Gets a specific order detail via GET /orders/{id}.
 
-        Weight: 1 (least common operation)
-        Note: This may fail if the order doesn't exist, which is expected in load testing.
+        Weight: LOADGEN_READ_RATIO * (1 - LOADGEN_LIST_SHARE)
+        The ID is drawn from the pool of created orders (Zipf or uniform, see
+        orderpool.py). Until the pool has any IDs a random GUID is used,
+        which is an expected 404.
         """
-        # Try a random order ID (some will fail with 404, which is fine)
-        order_id = random.randint(1, 100)
+        order_id = order_pool.sample()
+        pooled = order_id is not None
+        if not pooled:
+            order_id = random_order_id()
 
         with self.client.get(
             f"/orders/{order_id}",
             catch_response=True,
             name="GET /orders/{id}"
         ) as response:
-            if response.status_code in (200, 404):
-                # Both success and not found are acceptable
+            if response.status_code == 200 or (response.status_code == 404 and not pooled):
                 response.success()
             else:
                 response.failure(f"Got status {response.status_code}")
+
+class OpenOrderUser(ArrivalRateUser):
+    """
+    Open-model variant of OrderUser: the same weighted tasks, fired at
+    LOADGEN_USER_RATE arrivals/sec per user without waiting for responses.
+    """
+
+    abstract = LOAD_MODEL != "open"
+    arrival_tasks = OrderUser.tasks
+
+
+# Locust picks up a LoadTestShape defined in the locustfile; only bind one
+# when a profile is selected, otherwise users are driven from the UI/CLI
+LoadShape = select_shape(os.getenv("LOADGEN_SHAPE", ""))
+if LoadShape is None:
+    del LoadShape
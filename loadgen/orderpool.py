@@ -0,0 +1,115 @@
+"""
+Bounded pool of order IDs returned by POST /orders, for detail reads.
+
+IDs are kept newest first, and reads draw from the pool either uniformly or
+with a Zipf distribution over recency rank (rank 1 = newest order), so a
+small set of recent orders is hot the way it is in production.
+
+In distributed mode each worker sends the IDs it created to the master,
+which rebroadcasts them, so every worker reads orders created by all of
+them.
+"""
+import bisect
+import logging
+import os
+import random
+import uuid
+from collections import deque
+
+import gevent
+from locust import events
+from locust.runners import MasterRunner, WorkerRunner
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("LOADGEN_POOL_SIZE", "10000"))
+READ_DISTRIBUTION = os.getenv("LOADGEN_READ_DISTRIBUTION", "zipf").lower()
+ZIPF_EXPONENT = float(os.getenv("LOADGEN_ZIPF_EXPONENT", "1.1"))
+SYNC_INTERVAL = float(os.getenv("LOADGEN_POOL_SYNC_INTERVAL", "1"))
+
+DISTRIBUTIONS = ("uniform", "zipf")
+
+
+class OrderIdPool:
+    def __init__(self, capacity: int = POOL_SIZE, distribution: str = READ_DISTRIBUTION, exponent: float = ZIPF_EXPONENT):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown read distribution {distribution!r}, expected one of {DISTRIBUTIONS}")
+        self.capacity = max(1, capacity)
+        self.distribution = distribution
+        self._ids = deque(maxlen=self.capacity)
+        # Only collected for sharing when running as a distributed worker
+        self.sharing = False
+        self._pending = []
+
+        # Cumulative Zipf weights by rank, computed once for the full pool;
+        # a partially filled pool samples from the first len(pool) ranks
+        self._cumulative = []
+        total = 0.0
+        for rank in range(1, self.capacity + 1):
+            total += 1.0 / rank ** exponent
+            self._cumulative.append(total)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, order_id: str, share: bool = True):
+        self._ids.appendleft(order_id)
+        if share and self.sharing:
+            self._pending.append(order_id)
+
+    def extend(self, order_ids: list):
+        for order_id in order_ids:
+            self.add(order_id, share=False)
+
+    def take_pending(self) -> list:
+        pending, self._pending = self._pending, []
+        return pending
+
+    def sample(self) -> str:
+        """An order ID to read, or None while the pool is empty"""
+        size = len(self._ids)
+        if not size:
+            return None
+        if self.distribution == "uniform":
+            return self._ids[random.randrange(size)]
+        point = random.random() * self._cumulative[size - 1]
+        return self._ids[bisect.bisect_left(self._cumulative, point, 0, size - 1)]
+
+
+order_pool = OrderIdPool()
+
+
+def random_order_id() -> str:
+    """An ID that almost certainly does not exist, for reads before the pool fills"""
+    return str(uuid.uuid4())
+
+
+def _share_created_ids(runner: WorkerRunner):
+    while True:
+        gevent.sleep(SYNC_INTERVAL)
+        pending = order_pool.take_pending()
+        if pending:
+            runner.send_message("order_ids", {"origin": runner.client_id, "ids": pending})
+
+
+@events.init.add_listener
+def _setup_pool_sharing(environment, **kwargs):
+    runner = environment.runner
+    if isinstance(runner, MasterRunner):
+        def relay(environment, msg, **kwargs):
+            order_pool.extend(msg.data["ids"])
+            runner.send_message("order_ids", msg.data)
+
+        runner.register_message("order_ids", relay)
+    elif isinstance(runner, WorkerRunner):
+        def receive(environment, msg, **kwargs):
+            # Our own IDs come back in the broadcast; they are already pooled
+            if msg.data["origin"] != runner.client_id:
+                order_pool.extend(msg.data["ids"])
+
+        runner.register_message("order_ids", receive)
+        order_pool.sharing = True
+        gevent.spawn(_share_created_ids, runner)
+    else:
+        return
+    logger.info(f"Sharing order IDs across workers (pool size {order_pool.capacity})")
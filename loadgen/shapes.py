@@ -0,0 +1,203 @@
+"""
+Built-in load profiles, selected with LOADGEN_SHAPE.
+
+Profiles are expressed in users; in the open model (LOADGEN_MODEL=open)
+each user offers LOADGEN_USER_RATE requests/sec, so users map directly to
+a target arrival rate. Every profile is split into steps, and at the end of
+each step the achieved request rate is logged next to the target (and, in
+the open model, offered and missed arrivals), which is how to find the
+throughput knee of the API -> worker pipeline.
+
+    step     ramp from LOADGEN_SHAPE_BASE to LOADGEN_SHAPE_PEAK in LOADGEN_STEP_USERS increments
+    spike    hold BASE, jump to PEAK for LOADGEN_SPIKE_DURATION in the middle of the run
+    soak     hold PEAK for LOADGEN_SHAPE_DURATION
+    diurnal  sine wave between BASE and PEAK over LOADGEN_SHAPE_PERIOD
+"""
+import logging
+import math
+import os
+
+from locust import LoadTestShape, events
+
+from arrivals import LOAD_MODEL, USER_ARRIVAL_RATE, arrival_counters
+from completions import REQUEST_TYPE as E2E_REQUEST_TYPE
+
+logger = logging.getLogger(__name__)
+
+SHAPE_BASE = int(os.getenv("LOADGEN_SHAPE_BASE", "10"))
+SHAPE_PEAK = int(os.getenv("LOADGEN_SHAPE_PEAK", "100"))
+SHAPE_DURATION = float(os.getenv("LOADGEN_SHAPE_DURATION", "600"))
+SHAPE_PERIOD = float(os.getenv("LOADGEN_SHAPE_PERIOD", "300"))
+STEP_USERS = int(os.getenv("LOADGEN_STEP_USERS", "10"))
+STEP_DURATION = float(os.getenv("LOADGEN_STEP_DURATION", "60"))
+SPIKE_DURATION = float(os.getenv("LOADGEN_SPIKE_DURATION", "60"))
+SPAWN_RATE = float(os.getenv("LOADGEN_SHAPE_SPAWN_RATE", "10"))
+
+
+class StepReport:
+    __slots__ = ("step", "users", "duration", "target_rate", "achieved_rate", "offered_rate", "missed")
+
+    def __init__(self, step, users, duration, target_rate, achieved_rate, offered_rate, missed):
+        self.step = step
+        self.users = users
+        self.duration = duration
+        self.target_rate = target_rate
+        self.achieved_rate = achieved_rate
+        self.offered_rate = offered_rate
+        self.missed = missed
+
+    def describe(self) -> str:
+        text = f"step {self.step}: users={self.users:.0f} achieved={self.achieved_rate:.1f} req/s"
+        if self.target_rate is not None:
+            ratio = self.achieved_rate / self.target_rate if self.target_rate else 0.0
+            text += (
+                f" target={self.target_rate:.1f} req/s ({ratio:.0%})"
+                f" offered={self.offered_rate:.1f} arrivals/s missed={self.missed}"
+            )
+        return text
+
+
+class ProfileShape(LoadTestShape):
+    """
+    Base for the built-in profiles: subclasses implement users_at() and
+    step_at(); tick() drives the runner and reports each finished step.
+    """
+
+    abstract = True
+    duration = SHAPE_DURATION
+
+    def __init__(self):
+        super().__init__()
+        self._reset_steps()
+
+    def _reset_steps(self):
+        self.reports = []
+        self._step = None
+        self._step_start = 0.0
+        self._step_requests = 0
+        self._user_samples = []
+        self._finished = False
+
+    def reset_time(self):
+        # Called when a new test is started from the UI
+        super().reset_time()
+        self._reset_steps()
+
+    def users_at(self, run_time: float) -> int:
+        raise NotImplementedError
+
+    def step_at(self, run_time: float) -> int:
+        return int(run_time // STEP_DURATION)
+
+    def tick(self):
+        run_time = self.get_run_time()
+        if run_time >= self.duration:
+            self.finish()
+            return None
+
+        step = self.step_at(run_time)
+        if step != self._step:
+            self._close_step(run_time)
+            self._step = step
+            self._step_start = run_time
+            self._step_requests = self._request_count()
+            self._user_samples = []
+            arrival_counters.take()
+
+        users = self.users_at(run_time)
+        self._user_samples.append(users)
+        return users, SPAWN_RATE
+
+    def _request_count(self) -> int:
+        # HTTP requests only: E2E completions are reported as requests too
+        stats = self.runner.stats
+        e2e = stats.entries.get(("order.processed", E2E_REQUEST_TYPE))
+        return stats.total.num_requests - (e2e.num_requests if e2e else 0)
+
+    def _close_step(self, run_time: float):
+        if self._step is None or not self._user_samples:
+            return
+        elapsed = max(run_time - self._step_start, 1e-9)
+        users = sum(self._user_samples) / len(self._user_samples)
+        achieved = (self._request_count() - self._step_requests) / elapsed
+        offered, missed = arrival_counters.take()
+        target = users * USER_ARRIVAL_RATE if LOAD_MODEL == "open" else None
+
+        report = StepReport(self._step, users, elapsed, target, achieved, offered / elapsed, missed)
+        self.reports.append(report)
+        logger.info(f"{type(self).__name__} {report.describe()}")
+
+    def finish(self):
+        """Report the last step and a summary; safe to call more than once"""
+        if self._finished:
+            return
+        self._finished = True
+        self._close_step(self.get_run_time())
+        if self.reports:
+            logger.info(
+                f"{type(self).__name__} summary:\n" + "\n".join(report.describe() for report in self.reports)
+            )
+
+
+class StepShape(ProfileShape):
+    def __init__(self):
+        super().__init__()
+        steps = max(1, math.ceil((SHAPE_PEAK - SHAPE_BASE) / max(STEP_USERS, 1)) + 1)
+        self.duration = steps * STEP_DURATION
+
+    def users_at(self, run_time: float) -> int:
+        return min(SHAPE_BASE + self.step_at(run_time) * STEP_USERS, SHAPE_PEAK)
+
+
+class SpikeShape(ProfileShape):
+    def _spike_window(self) -> tuple:
+        start = (self.duration - SPIKE_DURATION) / 2
+        return start, start + SPIKE_DURATION
+
+    def users_at(self, run_time: float) -> int:
+        start, end = self._spike_window()
+        return SHAPE_PEAK if start <= run_time < end else SHAPE_BASE
+
+    def step_at(self, run_time: float) -> int:
+        # before, during and after the spike
+        start, end = self._spike_window()
+        if run_time < start:
+            return 0
+        return 1 if run_time < end else 2
+
+
+class SoakShape(ProfileShape):
+    def users_at(self, run_time: float) -> int:
+        return SHAPE_PEAK
+
+
+class DiurnalShape(ProfileShape):
+    def users_at(self, run_time: float) -> int:
+        phase = (1 - math.cos(2 * math.pi * run_time / SHAPE_PERIOD)) / 2
+        return round(SHAPE_BASE + (SHAPE_PEAK - SHAPE_BASE) * phase)
+
+
+SHAPES = {
+    "step": StepShape,
+    "spike": SpikeShape,
+    "soak": SoakShape,
+    "diurnal": DiurnalShape,
+}
+
+
+def select_shape(name: str):
+    """The profile class for LOADGEN_SHAPE, or None to drive users from the UI/CLI"""
+    if not name:
+        return None
+    try:
+        return SHAPES[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown LOADGEN_SHAPE {name!r}, expected one of {sorted(SHAPES)}") from None
+
+
+@events.test_stop.add_listener
+def _report_on_stop(environment, **kwargs):
+    # Stopped from the UI before the profile ran out
+    shape = environment.shape_class
+    if isinstance(shape, ProfileShape):
+        shape.finish()
@@ -0,0 +1,174 @@
+"""
+Windowed aggregation of high-churn broker events.
+
+Instead of one span per `channel.created` / `connection.closed` event, the
+aggregator counts events by (event type, vhost, user, peer host). Counts go
+to an OTel counter as they arrive, and each window's per-key rate is
+exported as a gauge. Only rate spikes produce spans: when a key's rate in a
+window exceeds `spike_factor` times its moving average, one exemplar span
+is emitted carrying the window statistics and a few sample events.
+"""
+import asyncio
+import logging
+import time
+
+from opentelemetry import metrics, trace
+from opentelemetry.metrics import CallbackOptions, Observation
+
+logger = logging.getLogger(__name__)
+meter = metrics.get_meter(__name__)
+
+events_counter = meter.create_counter(
+    name="rabbitmq.events",
+    description="Aggregated broker events by type, vhost, user and peer host",
+    unit="{event}",
+)
+
+OVERFLOW_KEY = ("other", "other", "other")
+
+
+def _text(value) -> str:
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return str(value)
+
+
+class KeyWindow:
+    __slots__ = ("count", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.samples = []
+
+
+class ChurnAggregator:
+    def __init__(
+        self,
+        tracer: trace.Tracer,
+        event_types: set,
+        window: float = 10.0,
+        spike_factor: float = 5.0,
+        min_spike_count: int = 50,
+        samples_per_key: int = 3,
+        max_keys: int = 1000,
+        smoothing: float = 0.3,
+    ):
+        self.tracer = tracer
+        self.event_types = event_types
+        self.window = window
+        self.spike_factor = spike_factor
+        self.min_spike_count = min_spike_count
+        self.samples_per_key = samples_per_key
+        self.max_keys = max_keys
+        self.smoothing = smoothing
+
+        self._current = {}
+        # Every (event type, group) ever given its own series. The counter's
+        # attribute sets live as long as the MeterProvider, so the cap has to
+        # hold across windows, not just within one
+        self._admitted = set()
+        self._window_start = time.monotonic()
+        self._baselines = {}
+        self._rates = {}
+
+        meter.create_observable_gauge(
+            name="rabbitmq.events.rate",
+            callbacks=[self.observe_rates],
+            description="Broker event rate over the last aggregation window",
+            unit="{event}/s",
+        )
+
+    def handles(self, routing_key: str) -> bool:
+        return routing_key in self.event_types
+
+    def record(self, event_body: dict, routing_key: str):
+        vhost = _text(event_body.get("vhost", ""))
+        user = _text(event_body.get("user", ""))
+        peer_host = _text(event_body.get("peer_host", ""))
+        group = (vhost, user, peer_host)
+
+        windows = self._current.get(routing_key)
+        if windows is None:
+            windows = self._current[routing_key] = {}
+        key_window = windows.get(group)
+        if key_window is None:
+            key = (routing_key, group)
+            if key not in self._admitted:
+                # Bound label cardinality: new keys past the limit share one bucket
+                if len(self._admitted) >= self.max_keys:
+                    group = OVERFLOW_KEY
+                else:
+                    self._admitted.add(key)
+            key_window = windows.get(group)
+            if key_window is None:
+                key_window = windows[group] = KeyWindow()
+
+        key_window.count += 1
+        if len(key_window.samples) < self.samples_per_key:
+            key_window.samples.append(event_body)
+
+        events_counter.add(1, attributes=self._attributes(routing_key, group))
+
+    @staticmethod
+    def _attributes(event_type: str, group: tuple) -> dict:
+        vhost, user, peer_host = group
+        return {
+            "rabbitmq.event.type": event_type,
+            "rabbitmq.vhost": vhost,
+            "rabbitmq.user": user,
+            "rabbitmq.peer_host": peer_host,
+        }
+
+    def observe_rates(self, options: CallbackOptions):
+        for (event_type, group), rate in self._rates.items():
+            yield Observation(rate, self._attributes(event_type, group))
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.window)
+            self.close_window()
+
+    def close_window(self):
+        now = time.monotonic()
+        elapsed = max(now - self._window_start, 1e-9)
+        current, self._current = self._current, {}
+        self._window_start = now
+
+        rates = {}
+        for event_type, windows in current.items():
+            for group, key_window in windows.items():
+                key = (event_type, group)
+                rate = key_window.count / elapsed
+                rates[key] = rate
+
+                # A key with no history has a baseline of zero, so a client that
+                # shows up already churning is reported as a spike too
+                baseline = self._baselines.get(key, 0.0)
+                if key_window.count >= self.min_spike_count and rate > baseline * self.spike_factor:
+                    self._emit_spike(event_type, group, key_window, rate, baseline, elapsed)
+                self._baselines[key] = baseline + self.smoothing * (rate - baseline)
+
+        # Keys that went quiet decay towards zero and are forgotten once idle
+        for key in list(self._baselines):
+            if key not in rates:
+                self._baselines[key] *= 1 - self.smoothing
+                if self._baselines[key] < 0.001:
+                    del self._baselines[key]
+        self._rates = rates
+
+    def _emit_spike(self, event_type: str, group: tuple, key_window: KeyWindow, rate: float, baseline: float, elapsed: float):
+        attributes = self._attributes(event_type, group)
+        attributes.update({
+            "rabbitmq.churn.count": key_window.count,
+            "rabbitmq.churn.rate": rate,
+            "rabbitmq.churn.baseline_rate": baseline,
+            "rabbitmq.churn.window_seconds": elapsed,
+        })
+        logger.warning(
+            f"Event rate spike: {event_type} {group} at {rate:.1f}/s (baseline {baseline:.1f}/s)"
+        )
+        with self.tracer.start_as_current_span("rabbitmq.churn.spike", attributes=attributes) as span:
+            for sample in key_window.samples:
+                span.add_event(event_type, attributes={
+                    f"rabbitmq.event.{field}": _text(value) for field, value in sample.items()
+                })
@@ -0,0 +1,111 @@
+"""
+Declarative mapping from RabbitMQ events to span attributes.
+
+`event_mappings.json` lists event families (connection, channel, user, ...),
+the events in each family and, per attribute, the source field in the event,
+the target attribute name, its type and an optional default. It is compiled
+once at startup into a dispatch table keyed by routing key, so handling an
+event is a dict lookup plus one pass over that event's fields.
+"""
+import json
+import os
+
+from opentelemetry.trace import SpanKind
+
+DEFAULT_MAPPINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "event_mappings.json")
+
+_MISSING = object()
+
+
+def _to_str(value) -> str:
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return str(value)
+
+
+def _to_bool(value) -> bool:
+    if isinstance(value, (bytes, str)):
+        return _to_str(value).lower() in ("true", "1", "yes")
+    return bool(value)
+
+
+CONVERTERS = {
+    "string": _to_str,
+    "int": int,
+    "float": float,
+    "bool": _to_bool,
+}
+
+
+class EventMapping:
+    __slots__ = ("event_type", "span_name", "kind", "fields")
+
+    def __init__(self, event_type: str, kind: SpanKind, fields: tuple):
+        self.event_type = event_type
+        self.span_name = f"rabbitmq.{event_type}"
+        self.kind = kind
+        self.fields = fields
+
+    def attributes(self, event_body: dict) -> dict:
+        """Build every attribute for an event in one pass."""
+        attributes = {"rabbitmq.event.type": self.event_type}
+        for source, target, convert, default in self.fields:
+            value = event_body.get(source, _MISSING)
+            if value is _MISSING or value is None:
+                if default is _MISSING:
+                    continue
+                attributes[target] = default
+                continue
+            try:
+                attributes[target] = convert(value)
+            except (TypeError, ValueError):
+                if default is not _MISSING:
+                    attributes[target] = default
+        return attributes
+
+
+def _compile_fields(specs: list) -> tuple:
+    fields = []
+    for spec in specs:
+        convert = CONVERTERS[spec.get("type", "string")]
+        fields.append((spec["source"], spec["target"], convert, spec.get("default", _MISSING)))
+    return tuple(fields)
+
+
+class EventTable:
+    """Dispatch table of {routing_key: EventMapping} compiled from the mapping file."""
+
+    def __init__(self, mappings: dict, common: tuple):
+        self.mappings = mappings
+        self.common = common
+
+    def __iter__(self):
+        return iter(self.mappings)
+
+    def __len__(self) -> int:
+        return len(self.mappings)
+
+    def get(self, routing_key: str) -> EventMapping:
+        mapping = self.mappings.get(routing_key)
+        if mapping is None:
+            # Unmapped routing keys keep the common attributes; cache them so
+            # repeats are a plain lookup too
+            mapping = EventMapping(routing_key, SpanKind.INTERNAL, self.common)
+            self.mappings[routing_key] = mapping
+        return mapping
+
+
+def load_event_table(path: str = DEFAULT_MAPPINGS_PATH) -> EventTable:
+    """Compile the mapping file into an EventTable."""
+    with open(path) as f:
+        config = json.load(f)
+
+    common = _compile_fields(config.get("common", []))
+    mappings = {}
+    for family, spec in config["families"].items():
+        kind = SpanKind[spec.get("kind", "INTERNAL")]
+        fields = common + _compile_fields(spec.get("attributes", []))
+        for event in spec["events"]:
+            event_type = f"{family}.{event}"
+            mappings[event_type] = EventMapping(event_type, kind, fields)
+    return EventTable(mappings, common)
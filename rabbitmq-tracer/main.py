@@ -8,15 +8,22 @@ import os
 import json
 import asyncio
 import logging
+import signal
 from datetime import datetime
 
 import aio_pika
-from opentelemetry import trace
+from opentelemetry import trace, metrics
 from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+from opentelemetry.sdk.metrics import MeterProvider
 from opentelemetry.sdk.resources import Resource
-from opentelemetry.trace import SpanKind
+from otel_common.export import ExportSettings, export_view
+from otel_common.loop_monitor import LoopMonitor, lag_view
+from otel_common.sampling import ErrorKeepingSpanProcessor, SamplingEngine
+
+from aggregation import ChurnAggregator
+from events import DEFAULT_MAPPINGS_PATH, load_event_table
+from pipeline import EventPipeline
+from sessions import SessionTracker
 
 # Set log level from environment variable (default INFO, use DEBUG for troubleshooting)
 log_level = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -26,113 +33,112 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Dispatch table built from the declarative event mapping file
+event_table = load_event_table(os.getenv("TRACER_EVENT_MAPPINGS", DEFAULT_MAPPINGS_PATH))
+
 
 def setup_telemetry():
-    """Setup OpenTelemetry tracing"""
+    """Setup OpenTelemetry tracing and metrics"""
     service_name = os.getenv("OTEL_SERVICE_NAME", "rabbitmq-events")
-    otlp_endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4317")
-    otlp_headers_str = os.getenv("OTEL_EXPORTER_OTLP_HEADERS", "")
+    export = ExportSettings.from_env()
 
     resource = Resource.create({"service.name": service_name})
 
-    # Parse headers
-    headers = {}
-    if otlp_headers_str:
-        for header in otlp_headers_str.split(","):
-            if "=" in header:
-                key, value = header.split("=", 1)
-                headers[key.strip()] = value.strip()
-
-    provider = TracerProvider(resource=resource)
-    exporter = OTLPSpanExporter(endpoint=otlp_endpoint, insecure=True, headers=headers)
-    provider.add_span_processor(BatchSpanProcessor(exporter))
+    # Metrics first, so the sampler's decision counters have somewhere to go
+    metrics.set_meter_provider(MeterProvider(
+        resource=resource,
+        metric_readers=[export.metric_reader()],
+        views=[lag_view(), export_view()],
+    ))
+
+    sampler = SamplingEngine.from_env()
+    provider = TracerProvider(resource=resource, sampler=sampler)
+    provider.add_span_processor(ErrorKeepingSpanProcessor(export.span_processor()))
     trace.set_tracer_provider(provider)
 
-    logger.info(f"Telemetry configured: service={service_name}, endpoint={otlp_endpoint}")
+    logger.info(f"Telemetry configured: service={service_name}, {export.describe()}, sampler={sampler.get_description()}")
     return trace.get_tracer(__name__)
 
 
 async def process_event(event_body: dict, routing_key: str, tracer: trace.Tracer):
     """Convert RabbitMQ event to OpenTelemetry span"""
 
-    # Extract event type from routing key (e.g., "connection.created")
-    event_type = routing_key
-
-    # Determine span name and kind
-    span_name = f"rabbitmq.{event_type}"
-
-    # Map event types to span kinds
-    if "created" in event_type or "declared" in event_type:
-        kind = SpanKind.INTERNAL
-    elif "closed" in event_type or "deleted" in event_type:
-        kind = SpanKind.INTERNAL
-    else:
-        kind = SpanKind.INTERNAL
+    # Routing key is the event type (e.g., "connection.created"); one lookup
+    # gives span name, kind and attribute mapping
+    mapping = event_table.get(routing_key)
 
     # Log event for debugging
-    logger.debug(f"Processing event: {event_type}, body keys: {list(event_body.keys())}")
-
-    # Create span
-    with tracer.start_as_current_span(span_name, kind=kind) as span:
-        # Add common attributes
-        span.set_attribute("rabbitmq.event.type", event_type)
-
-        # Only add attributes if they exist in the event body
-        if "node" in event_body:
-            span.set_attribute("rabbitmq.node", event_body.get("node", "unknown"))
+    logger.debug(f"Processing event: {routing_key}, body keys: {list(event_body.keys())}")
 
+    attributes = mapping.attributes(event_body) if event_body else {"rabbitmq.event.type": routing_key}
+    if not event_body:
         # If event body is empty or minimal, still create a span with routing key
-        if not event_body or len(event_body) == 0:
-            logger.debug(f"Empty event body for {event_type}, creating minimal span")
-            span.set_attribute("rabbitmq.event.minimal", True)
+        logger.debug(f"Empty event body for {routing_key}, creating minimal span")
+        attributes["rabbitmq.event.minimal"] = True
+
+    # Create span with all attributes at once
+    with tracer.start_as_current_span(mapping.span_name, kind=mapping.kind, attributes=attributes):
+        logger.debug(f"Created span for event: {routing_key}")
+
+
+def make_event_handler(tracer: trace.Tracer, sessions: SessionTracker = None):
+    """
+    Route each event to the churn aggregator (event types listed in
+    TRACER_AGGREGATE_EVENTS), to the session tracker (lifecycle events, when
+    enabled) or to process_event for a span of its own.
+    """
+    aggregate_events = {
+        name.strip() for name in os.getenv("TRACER_AGGREGATE_EVENTS", "").split(",") if name.strip()
+    }
+    aggregator = None
+    if aggregate_events:
+        aggregator = ChurnAggregator(
+            tracer,
+            aggregate_events,
+            window=float(os.getenv("TRACER_AGGREGATE_WINDOW", "10")),
+            spike_factor=float(os.getenv("TRACER_SPIKE_FACTOR", "5")),
+            min_spike_count=int(os.getenv("TRACER_SPIKE_MIN_COUNT", "50")),
+        )
+        asyncio.create_task(aggregator.run())
+        logger.info(f"Aggregating events over {aggregator.window}s windows: {sorted(aggregate_events)}")
+
+    if aggregator is None and sessions is None:
+        async def handle_event(body: dict, routing_key: str):
+            await process_event(body, routing_key, tracer)
+        return handle_event
+
+    async def handle_event(body: dict, routing_key: str):
+        if aggregator is not None and aggregator.handles(routing_key):
+            aggregator.record(body, routing_key)
+        elif sessions is not None and sessions.handles(routing_key) and sessions.handle(body, routing_key):
             return
-
-        # Add event-specific attributes
-        if "connection" in event_type:
-            span.set_attribute("rabbitmq.connection.name", event_body.get("name", ""))
-            span.set_attribute("rabbitmq.connection.peer_host", event_body.get("peer_host", ""))
-            span.set_attribute("rabbitmq.connection.peer_port", event_body.get("peer_port", 0))
-            span.set_attribute("rabbitmq.connection.user", event_body.get("user", ""))
-            span.set_attribute("rabbitmq.connection.vhost", event_body.get("vhost", ""))
-
-        elif "channel" in event_type:
-            span.set_attribute("rabbitmq.channel.number", event_body.get("number", 0))
-            span.set_attribute("rabbitmq.channel.user", event_body.get("user", ""))
-            span.set_attribute("rabbitmq.channel.vhost", event_body.get("vhost", ""))
-            span.set_attribute("rabbitmq.channel.connection", event_body.get("connection_name", ""))
-
-        elif "queue" in event_type:
-            span.set_attribute("rabbitmq.queue.name", event_body.get("name", ""))
-            span.set_attribute("rabbitmq.queue.vhost", event_body.get("vhost", ""))
-            span.set_attribute("rabbitmq.queue.durable", event_body.get("durable", False))
-            span.set_attribute("rabbitmq.queue.auto_delete", event_body.get("auto_delete", False))
-
-        elif "consumer" in event_type:
-            span.set_attribute("rabbitmq.consumer.tag", event_body.get("consumer_tag", ""))
-            span.set_attribute("rabbitmq.consumer.queue", event_body.get("queue_name", ""))
-            span.set_attribute("rabbitmq.consumer.channel", event_body.get("channel", ""))
-
-        elif "exchange" in event_type:
-            span.set_attribute("rabbitmq.exchange.name", event_body.get("name", ""))
-            span.set_attribute("rabbitmq.exchange.type", event_body.get("type", ""))
-            span.set_attribute("rabbitmq.exchange.vhost", event_body.get("vhost", ""))
-            span.set_attribute("rabbitmq.exchange.durable", event_body.get("durable", False))
-
-        elif "binding" in event_type:
-            span.set_attribute("rabbitmq.binding.source", event_body.get("source_name", ""))
-            span.set_attribute("rabbitmq.binding.destination", event_body.get("destination_name", ""))
-            span.set_attribute("rabbitmq.binding.routing_key", event_body.get("routing_key", ""))
-            span.set_attribute("rabbitmq.binding.vhost", event_body.get("vhost", ""))
-
-        # Add timestamp if available
-        if "timestamp" in event_body:
-            span.set_attribute("rabbitmq.event.timestamp", event_body["timestamp"])
-
-        logger.debug(f"Created span for event: {event_type}")
-
-
-async def start_event_consumer():
-    """Start consuming from RabbitMQ event exchange"""
+        else:
+            # Includes closes whose create we never saw (e.g. opened before
+            # the tracer started): they still get a point-in-time span
+            await process_event(body, routing_key, tracer)
+    return handle_event
+
+
+def make_session_tracker(tracer: trace.Tracer) -> SessionTracker:
+    """Session tracker for lifecycle spans, or None unless TRACER_SESSIONS=true"""
+    if os.getenv("TRACER_SESSIONS", "false").lower() != "true":
+        return None
+    sessions = SessionTracker(
+        tracer,
+        event_table,
+        max_sessions=int(os.getenv("TRACER_SESSION_MAX", "10000")),
+        ttl=float(os.getenv("TRACER_SESSION_TTL", "86400")),
+    )
+    asyncio.create_task(sessions.run())
+    logger.info(f"Tracking lifecycle sessions (max={sessions.max_sessions}, ttl={sessions.ttl}s)")
+    return sessions
+
+
+async def start_event_consumer() -> tuple:
+    """
+    Start consuming from RabbitMQ event exchange; returns the session tracker
+    and the high-volume pipeline, each None when not enabled
+    """
     host = os.getenv("RABBITMQ_HOST", "localhost")
     username = os.getenv("RABBITMQ_USERNAME", "demo")
     password = os.getenv("RABBITMQ_PASSWORD", "demo")
@@ -153,7 +159,7 @@ async def start_event_consumer():
 
     if connection is None:
         logger.error("Could not connect to RabbitMQ after retries")
-        return
+        return None, None
 
     channel = await connection.channel()
 
@@ -163,77 +169,131 @@ async def start_event_consumer():
     # Bind to the RabbitMQ event exchange for various event types
     event_exchange = "amq.rabbitmq.event"
 
-    event_patterns = [
-        "connection.created",
-        "connection.closed",
-        "channel.created",
-        "channel.closed",
-        "queue.created",
-        "queue.deleted",
-        "queue.declared",
-        "consumer.created",
-        "consumer.deleted",
-        "exchange.created",
-        "exchange.deleted",
-        "binding.created",
-        "binding.deleted",
-    ]
+    # Every event type in the mapping file gets a binding
+    event_patterns = list(event_table)
 
     for pattern in event_patterns:
         await queue.bind(event_exchange, routing_key=pattern)
         logger.info(f"Bound to event: {pattern}")
 
+    sessions = make_session_tracker(tracer)
+    handle_event = make_event_handler(tracer, sessions)
+
+    if os.getenv("TRACER_HIGH_VOLUME", "false").lower() == "true":
+        pipeline = await consume_high_volume(channel, queue, handle_event)
+        return sessions, pipeline
+
     async def on_event(message: aio_pika.IncomingMessage):
         async with message.process():
+            routing_key = message.routing_key or "unknown"
             try:
-                routing_key = message.routing_key or "unknown"
-
-                # Try to decode message body
-                body_raw = message.body.decode('utf-8', errors='replace')
-
-                # RabbitMQ events might be in different formats
-                # Try JSON first
-                try:
-                    body = json.loads(body_raw)
-                except json.JSONDecodeError:
-                    # If not JSON, create a minimal event from available data
-                    logger.debug(f"Non-JSON event body for {routing_key}, using headers")
-                    body = {}
-
-                    # Extract what we can from message properties and headers
-                    if message.headers:
-                        body = dict(message.headers)
-
-                # Add metadata from message properties
-                if not body:
-                    body = {}
-
-                # Add timestamp from message
-                if message.timestamp and 'timestamp' not in body:
-                    body['timestamp'] = message.timestamp.timestamp()
+                body = decode_event(message)
 
                 logger.info(f"Received event: {routing_key}")
                 logger.debug(f"Event body: {body}")
 
                 # Convert to trace
-                await process_event(body, routing_key, tracer)
+                await handle_event(body, routing_key)
 
             except Exception as e:
                 logger.error(f"Error processing event {routing_key}: {e}", exc_info=True)
-                logger.error(f"Raw message body (first 200 chars): {body_raw[:200] if 'body_raw' in locals() else 'N/A'}")
+                logger.error(f"Raw message body (first 200 chars): {message.body[:200]!r}")
 
     await queue.consume(on_event)
     logger.info("RabbitMQ event tracer started, waiting for events...")
+    return sessions, None
+
+
+def decode_event(message: aio_pika.IncomingMessage) -> dict:
+    """Turn an event message into a dict, falling back to its headers for non-JSON bodies"""
+    routing_key = message.routing_key or "unknown"
+
+    # RabbitMQ events might be in different formats
+    # Try JSON first
+    try:
+        body = json.loads(message.body) if message.body else {}
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        # If not JSON, create a minimal event from available data
+        logger.debug(f"Non-JSON event body for {routing_key}, using headers")
+        body = {}
+
+    if not isinstance(body, dict) or not body:
+        # Extract what we can from message properties and headers
+        body = dict(message.headers) if message.headers else {}
+
+    # Add timestamp from message
+    if message.timestamp and 'timestamp' not in body:
+        body['timestamp'] = message.timestamp.timestamp()
+
+    return body
+
+
+async def consume_high_volume(
+    channel: aio_pika.abc.AbstractChannel, queue: aio_pika.abc.AbstractQueue, handle_event
+) -> EventPipeline:
+    """
+    Consume with prefetch, batched multi-ack and a bounded buffer in front of
+    span export (see pipeline.EventPipeline). Per-event logging is DEBUG only.
+    Returns the started pipeline, which must be stopped on shutdown.
+    """
+    prefetch_count = int(os.getenv("TRACER_PREFETCH_COUNT", "500"))
+    await channel.set_qos(prefetch_count=prefetch_count)
+
+    pipeline = EventPipeline(
+        handle_event,
+        buffer_size=int(os.getenv("TRACER_BUFFER_SIZE", "10000")),
+        drop_policy=os.getenv("TRACER_DROP_POLICY", "drop_oldest"),
+        # Acks must be flushed before prefetch runs out
+        ack_batch_size=min(int(os.getenv("TRACER_ACK_BATCH_SIZE", "100")), prefetch_count),
+        ack_interval=float(os.getenv("TRACER_ACK_INTERVAL_MS", "500")) / 1000,
+    )
+    pipeline.start()
+
+    async def on_event(message: aio_pika.IncomingMessage):
+        routing_key = message.routing_key or "unknown"
+        try:
+            body = decode_event(message)
+        except Exception as e:
+            logger.error(f"Error decoding event {routing_key}: {e}", exc_info=True)
+            body = {}
+        logger.debug(f"Received event: {routing_key}")
+        await pipeline.submit(message, (body, routing_key))
+
+    await queue.consume(on_event)
+    logger.info(
+        f"RabbitMQ event tracer started in high-volume mode (prefetch={prefetch_count}, "
+        f"buffer={pipeline.buffer.maxsize}, policy={pipeline.drop_policy}), waiting for events..."
+    )
+    return pipeline
 
 
 async def main():
     """Main entry point"""
     logger.info("Starting RabbitMQ Event Tracer")
-    await start_event_consumer()
-
-    # Keep running
-    while True:
-        await asyncio.sleep(60)
+    sessions, pipeline = await start_event_consumer()
+    monitor = LoopMonitor.from_env()
+    if monitor is not None:
+        monitor.start()
+
+    # Keep running until SIGTERM/SIGINT, then end open sessions before exit
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    logger.info("Shutting down...")
+    if monitor is not None:
+        monitor.stop()
+    # Export buffered events and flush pending acks while spans can still be sent
+    if pipeline is not None:
+        await pipeline.stop()
+    if sessions is not None:
+        sessions.flush()
+    # Traces first, so the final metric export includes their drop counters
+    for provider in (trace.get_tracer_provider(), metrics.get_meter_provider()):
+        if hasattr(provider, "shutdown"):
+            provider.shutdown()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,143 @@
+"""
+High-volume event pipeline for the RabbitMQ tracer.
+
+Consumption and span export are decoupled by a bounded buffer: the consumer
+callback only decodes, enqueues and acks (in batches, with multiple=True),
+while an export task drains the buffer into spans. When export falls behind,
+the buffer applies its drop policy instead of letting the broker queue grow.
+"""
+import asyncio
+import logging
+import time
+
+import aio_pika
+from opentelemetry import metrics
+from opentelemetry.metrics import CallbackOptions, Observation
+
+logger = logging.getLogger(__name__)
+meter = metrics.get_meter(__name__)
+
+dropped_counter = meter.create_counter(
+    name="rabbitmq.tracer.events.dropped",
+    description="Broker events dropped because the export buffer was full",
+    unit="{event}",
+)
+received_counter = meter.create_counter(
+    name="rabbitmq.tracer.events.received",
+    description="Broker events received from amq.rabbitmq.event",
+    unit="{event}",
+)
+
+DROP_POLICIES = ("drop_newest", "drop_oldest")
+
+
+class EventPipeline:
+    def __init__(
+        self,
+        handler,
+        buffer_size: int = 10000,
+        drop_policy: str = "drop_oldest",
+        ack_batch_size: int = 100,
+        ack_interval: float = 0.5,
+    ):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy {drop_policy!r}, expected one of {DROP_POLICIES}")
+        self.handler = handler
+        self.drop_policy = drop_policy
+        self.ack_batch_size = max(1, ack_batch_size)
+        self.ack_interval = ack_interval
+        self.buffer: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+
+        self._unacked = 0
+        self._last_message = None
+        self._last_ack = time.monotonic()
+        self._tasks = []
+        self._stopping = False
+
+        meter.create_observable_gauge(
+            name="rabbitmq.tracer.buffer.size",
+            callbacks=[self.observe_buffer],
+            description="Events waiting in the export buffer",
+            unit="{event}",
+        )
+
+    def observe_buffer(self, options: CallbackOptions):
+        yield Observation(self.buffer.qsize())
+
+    def start(self):
+        self._tasks.append(asyncio.create_task(self._ack_timer()))
+        self._tasks.append(asyncio.create_task(self._export()))
+
+    async def stop(self, timeout: float = 5.0):
+        """
+        Stop taking events, export what is already buffered (for at most
+        `timeout` seconds) and ack everything handled so far. Events that
+        arrive meanwhile are left unacked for the broker to redeliver.
+        """
+        self._stopping = True
+        try:
+            await asyncio.wait_for(self.buffer.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.buffer.qsize()} buffered events were not exported before shutdown")
+        await self._flush_acks()
+        for task in self._tasks:
+            task.cancel()
+
+    async def submit(self, message: aio_pika.IncomingMessage, event: tuple):
+        """Buffer a decoded (body, routing_key) event and ack the message in a batch."""
+        if self._stopping:
+            return
+        received_counter.add(1, attributes={"rabbitmq.event.type": event[1]})
+        try:
+            self.buffer.put_nowait(event)
+        except asyncio.QueueFull:
+            if self.drop_policy == "drop_oldest":
+                dropped = self.buffer.get_nowait()
+                self.buffer.task_done()
+                self.buffer.put_nowait(event)
+            else:
+                dropped = event
+            dropped_counter.add(1, attributes={
+                "rabbitmq.event.type": dropped[1],
+                "policy": self.drop_policy,
+            })
+
+        # Events are acked once buffered (or dropped): the broker-side queue
+        # should never grow because the exporter is slow.
+        self._last_message = message
+        self._unacked += 1
+        if self._unacked >= self.ack_batch_size:
+            await self._flush_acks()
+
+    async def _flush_acks(self):
+        message = self._last_message
+        if message is None:
+            return
+        self._last_message = None
+        self._unacked = 0
+        self._last_ack = time.monotonic()
+        await message.ack(multiple=True)
+
+    async def _ack_timer(self):
+        # Acks a partial batch during quiet periods so prefetch never stalls
+        while True:
+            await asyncio.sleep(self.ack_interval)
+            if self._unacked and time.monotonic() - self._last_ack >= self.ack_interval:
+                await self._flush_acks()
+
+    async def _export(self):
+        exported = 0
+        while True:
+            body, routing_key = await self.buffer.get()
+            try:
+                await self.handler(body, routing_key)
+            except Exception as e:
+                logger.error(f"Error exporting event {routing_key}: {e}", exc_info=True)
+            finally:
+                self.buffer.task_done()
+
+            # Queue.get() does not yield while items are available; yield
+            # periodically so deliveries keep flowing during a backlog.
+            exported += 1
+            if exported % 64 == 0:
+                await asyncio.sleep(0)
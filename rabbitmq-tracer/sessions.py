@@ -0,0 +1,181 @@
+"""
+Lifecycle correlation for broker objects.
+
+Instead of separate point-in-time spans for `*.created` and `*.closed`
+events, the tracker opens one span when a connection, channel, consumer or
+queue is created and ends it when the matching close/delete event arrives,
+so the span duration is the object's lifetime. Channels are parented to
+their connection's span when it is known.
+
+Connections and channels are keyed by their Erlang pid: `channel.closed`
+carries nothing else, and `channel.created` names its connection only by
+the connection's pid.
+
+Open sessions are bounded: the least recently opened are ended when
+`max_sessions` is exceeded, and sessions older than `ttl` are ended as
+orphans (their close event was missed). On shutdown all open sessions are
+ended and flushed.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from opentelemetry import metrics, trace
+from opentelemetry.metrics import CallbackOptions, Observation
+
+logger = logging.getLogger(__name__)
+meter = metrics.get_meter(__name__)
+
+ended_counter = meter.create_counter(
+    name="rabbitmq.sessions.ended",
+    description="Lifecycle spans ended, by object type and reason (closed, evicted, expired, shutdown)",
+    unit="{session}",
+)
+
+
+def _text(value) -> str:
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return str(value)
+
+
+def _connection_key(body: dict) -> tuple:
+    return ("connection", _text(body.get("pid", body.get("name", ""))))
+
+
+def _channel_key(body: dict) -> tuple:
+    return ("channel", _text(body.get("pid", "")))
+
+
+def _consumer_key(body: dict) -> tuple:
+    return ("consumer", _text(body.get("channel", "")), _text(body.get("consumer_tag", "")))
+
+
+def _queue_key(body: dict) -> tuple:
+    return ("queue", _text(body.get("vhost", "")), _text(body.get("name", "")))
+
+
+# routing key -> (object type, key function, opens the session?)
+LIFECYCLE_EVENTS = {
+    "connection.created": ("connection", _connection_key, True),
+    "connection.closed": ("connection", _connection_key, False),
+    "channel.created": ("channel", _channel_key, True),
+    "channel.closed": ("channel", _channel_key, False),
+    "consumer.created": ("consumer", _consumer_key, True),
+    "consumer.deleted": ("consumer", _consumer_key, False),
+    "queue.created": ("queue", _queue_key, True),
+    "queue.deleted": ("queue", _queue_key, False),
+}
+
+
+def event_time_ns(body: dict) -> int:
+    if "timestamp_in_ms" in body:
+        return int(body["timestamp_in_ms"]) * 1_000_000
+    if "timestamp" in body:
+        return int(float(body["timestamp"]) * 1e9)
+    return time.time_ns()
+
+
+class Session:
+    __slots__ = ("span", "opened_at")
+
+    def __init__(self, span: trace.Span):
+        self.span = span
+        self.opened_at = time.monotonic()
+
+
+class SessionTracker:
+    def __init__(self, tracer: trace.Tracer, event_table, max_sessions: int = 10000, ttl: float = 86400.0):
+        self.tracer = tracer
+        self.event_table = event_table
+        self.max_sessions = max(1, max_sessions)
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+
+        meter.create_observable_gauge(
+            name="rabbitmq.sessions.open",
+            callbacks=[self.observe_open],
+            description="Lifecycle spans currently open",
+            unit="{session}",
+        )
+
+    def observe_open(self, options: CallbackOptions):
+        yield Observation(len(self._sessions))
+
+    def handles(self, routing_key: str) -> bool:
+        return routing_key in LIFECYCLE_EVENTS
+
+    def handle(self, body: dict, routing_key: str) -> bool:
+        """Open or close a session. Returns False for a close with no open session."""
+        object_type, key_fn, opens = LIFECYCLE_EVENTS[routing_key]
+        key = key_fn(body)
+        if opens:
+            self._open(key, object_type, body, routing_key)
+            return True
+        return self._close(key, body)
+
+    def _open(self, key: tuple, object_type: str, body: dict, routing_key: str):
+        previous = self._sessions.pop(key, None)
+        if previous is not None:
+            # Re-created before we saw the close, e.g. a reused consumer tag
+            self._end(key, previous, "evicted")
+
+        context = None
+        if object_type == "channel":
+            # `connection` is the owning connection's pid
+            connection = self._sessions.get(("connection", _text(body.get("connection", ""))))
+            if connection is not None:
+                context = trace.set_span_in_context(connection.span)
+
+        # The create event's attributes are attached once, when the span starts
+        attributes = self.event_table.get(routing_key).attributes(body)
+        attributes["rabbitmq.event.type"] = f"{object_type}.lifetime"
+        span = self.tracer.start_span(
+            f"rabbitmq.{object_type}",
+            context=context,
+            attributes=attributes,
+            start_time=event_time_ns(body),
+        )
+        self._sessions[key] = Session(span)
+
+        while len(self._sessions) > self.max_sessions:
+            old_key, old_session = self._sessions.popitem(last=False)
+            self._end(old_key, old_session, "evicted")
+
+    def _close(self, key: tuple, body: dict) -> bool:
+        session = self._sessions.pop(key, None)
+        if session is None:
+            return False
+        self._end(key, session, "closed", end_time=event_time_ns(body))
+        return True
+
+    def _end(self, key: tuple, session: Session, reason: str, end_time: int = None):
+        session.span.set_attribute("rabbitmq.session.end_reason", reason)
+        session.span.end(end_time=end_time)
+        ended_counter.add(1, attributes={"rabbitmq.object.type": key[0], "reason": reason})
+
+    def expire(self):
+        """End sessions older than the TTL; their close event was presumably lost."""
+        cutoff = time.monotonic() - self.ttl
+        # Sessions are kept in open order, so expired ones are at the front
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if session.opened_at > cutoff:
+                break
+            del self._sessions[key]
+            self._end(key, session, "expired")
+
+    async def run(self, interval: float = 60.0):
+        while True:
+            await asyncio.sleep(interval)
+            self.expire()
+
+    def flush(self):
+        """End every open session, e.g. on shutdown, so no lifetime is lost."""
+        count = len(self._sessions)
+        while self._sessions:
+            key, session = self._sessions.popitem(last=False)
+            self._end(key, session, "shutdown")
+        if count:
+            logger.info(f"Flushed {count} open lifecycle sessions")
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The tracer's modules sit at the top of rabbitmq-tracer/ and the shared
+# otel_common package under common/ (the image copies both into /app)
+TRACER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (TRACER, os.path.join(os.path.dirname(TRACER), "common")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,104 @@
+import types
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+import aggregation
+from aggregation import OVERFLOW_KEY, ChurnAggregator
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1000.0)
+    clock.monotonic = lambda: clock.now
+    monkeypatch.setattr(aggregation, "time", clock)
+    return clock
+
+
+def aggregator(**kwargs):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    options = dict(event_types={"channel.created"}, min_spike_count=5, spike_factor=5.0)
+    options.update(kwargs)
+    return ChurnAggregator(provider.get_tracer(__name__), **options), exporter
+
+
+def channel(peer_host: str) -> dict:
+    return {"vhost": "/", "user": b"demo", "peer_host": peer_host}
+
+
+def counted_groups(monkeypatch) -> list:
+    groups = []
+
+    class Counter:
+        def add(self, amount, attributes):
+            groups.append(attributes["rabbitmq.peer_host"])
+
+    monkeypatch.setattr(aggregation, "events_counter", Counter())
+    return groups
+
+
+def test_overflow_bounded_within_window(monkeypatch):
+    groups = counted_groups(monkeypatch)
+    churn, _ = aggregator(max_keys=2)
+    for host in ("a", "b", "c", "d", "a"):
+        churn.record(channel(host), "channel.created")
+    assert groups == ["a", "b", "other", "other", "a"]
+
+
+def test_overflow_bounded_across_windows(monkeypatch):
+    groups = counted_groups(monkeypatch)
+    churn, _ = aggregator(max_keys=2)
+    for window in range(5):
+        for host in (f"new-{window}-1", f"new-{window}-2"):
+            churn.record(channel(host), "channel.created")
+        churn.close_window()
+    # Only the first window's keys were admitted; all later ones overflow
+    assert set(groups) == {"new-0-1", "new-0-2", "other"}
+    assert {group for _, group in churn._rates} == {OVERFLOW_KEY}
+
+
+def test_admitted_keys_keep_their_series(monkeypatch):
+    groups = counted_groups(monkeypatch)
+    churn, _ = aggregator(max_keys=1)
+    churn.record(channel("a"), "channel.created")
+    churn.close_window()
+    churn.record(channel("b"), "channel.created")
+    churn.record(channel("a"), "channel.created")
+    assert groups == ["a", "other", "a"]
+
+
+def test_spike_emits_one_span_with_samples():
+    churn, exporter = aggregator(samples_per_key=2)
+    for _ in range(10):
+        churn.record(channel("a"), "channel.created")
+    churn.close_window()
+
+    spans = exporter.get_finished_spans()
+    assert len(spans) == 1
+    assert spans[0].name == "rabbitmq.churn.spike"
+    assert spans[0].attributes["rabbitmq.churn.count"] == 10
+    assert spans[0].attributes["rabbitmq.user"] == "demo"
+    assert len(spans[0].events) == 2
+
+
+def test_steady_rate_is_not_a_spike(clock):
+    churn, exporter = aggregator()
+    for _ in range(3):
+        for _ in range(10):
+            churn.record(channel("a"), "channel.created")
+        clock.now += 10
+        churn.close_window()
+    # Only the first window, with no history, counts as a spike
+    assert len(exporter.get_finished_spans()) == 1
+
+
+def test_below_min_count_is_not_a_spike():
+    churn, exporter = aggregator(min_spike_count=50)
+    for _ in range(10):
+        churn.record(channel("a"), "channel.created")
+    churn.close_window()
+    assert not exporter.get_finished_spans()
@@ -0,0 +1,67 @@
+import json
+
+from opentelemetry.trace import SpanKind
+
+from events import load_event_table
+
+
+def test_every_family_event_is_mapped():
+    table = load_event_table()
+    for routing_key in ("connection.created", "user.authentication.failure", "policy.set", "queue.deleted"):
+        assert table.get(routing_key).span_name == f"rabbitmq.{routing_key}"
+
+
+def test_queue_stats_attributes():
+    attributes = load_event_table().get("queue.deleted").attributes({
+        "name": b"orders",
+        "vhost": "/",
+        "durable": "true",
+        "messages": "12",
+        "messages_ready": 10,
+        "messages_unacknowledged": 2,
+        "consumer_utilisation": "0.5",
+        "state": b"running",
+    })
+    assert attributes["rabbitmq.queue.name"] == "orders"
+    assert attributes["rabbitmq.queue.durable"] is True
+    assert attributes["rabbitmq.queue.messages"] == 12
+    assert attributes["rabbitmq.queue.messages_ready"] == 10
+    assert attributes["rabbitmq.queue.messages_unacknowledged"] == 2
+    assert attributes["rabbitmq.queue.consumer_utilisation"] == 0.5
+    assert attributes["rabbitmq.queue.state"] == "running"
+    # Stats without a default are only set when present
+    assert "rabbitmq.queue.memory" not in attributes
+
+
+def test_defaults_and_bad_values():
+    attributes = load_event_table().get("connection.created").attributes({"peer_port": "not a port"})
+    assert attributes["rabbitmq.connection.peer_port"] == 0
+    assert attributes["rabbitmq.connection.name"] == ""
+    assert attributes["rabbitmq.event.type"] == "connection.created"
+
+
+def test_unmapped_routing_key_keeps_common_attributes():
+    table = load_event_table()
+    mapping = table.get("shovel.worker.status")
+    assert mapping.kind is SpanKind.INTERNAL
+    assert mapping.attributes({"node": "rabbit@a", "other": 1}) == {
+        "rabbitmq.event.type": "shovel.worker.status",
+        "rabbitmq.node": "rabbit@a",
+    }
+    assert table.get("shovel.worker.status") is mapping
+
+
+def test_new_family_from_config_only(tmp_path):
+    path = tmp_path / "mappings.json"
+    path.write_text(json.dumps({
+        "families": {
+            "federation": {
+                "kind": "CLIENT",
+                "events": ["link.status"],
+                "attributes": [{"source": "upstream", "target": "rabbitmq.federation.upstream"}],
+            }
+        }
+    }))
+    mapping = load_event_table(str(path)).get("federation.link.status")
+    assert mapping.kind is SpanKind.CLIENT
+    assert mapping.attributes({"upstream": "east"})["rabbitmq.federation.upstream"] == "east"
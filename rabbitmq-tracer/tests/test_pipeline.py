@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from pipeline import EventPipeline
+
+
+class FakeMessage:
+    def __init__(self, tag: int, acks: list):
+        self.tag = tag
+        self.acks = acks
+
+    async def ack(self, multiple: bool = False):
+        self.acks.append((self.tag, multiple))
+
+
+def event(n: int) -> tuple:
+    return ({"n": n}, "queue.created")
+
+
+def buffered(pipeline: EventPipeline) -> list:
+    return [body["n"] for body, _ in pipeline.buffer._queue]
+
+
+@pytest.mark.parametrize("policy, expected", [("drop_oldest", [2, 3, 4]), ("drop_newest", [0, 1, 2])])
+def test_drop_policy(policy, expected):
+    async def run():
+        acks = []
+        pipeline = EventPipeline(None, buffer_size=3, drop_policy=policy, ack_batch_size=100)
+        for n in range(5):
+            await pipeline.submit(FakeMessage(n, acks), event(n))
+        return buffered(pipeline)
+
+    assert asyncio.run(run()) == expected
+
+
+def test_unknown_drop_policy():
+    with pytest.raises(ValueError):
+        EventPipeline(None, drop_policy="drop_random")
+
+
+def test_acks_in_batches_with_multiple():
+    async def run():
+        acks = []
+        pipeline = EventPipeline(None, buffer_size=100, ack_batch_size=3)
+        for n in range(7):
+            await pipeline.submit(FakeMessage(n, acks), event(n))
+        return acks
+
+    assert asyncio.run(run()) == [(2, True), (5, True)]
+
+
+def test_ack_timer_flushes_partial_batch():
+    async def run():
+        acks = []
+        pipeline = EventPipeline(None, buffer_size=100, ack_batch_size=100, ack_interval=0.01)
+        pipeline.start()
+        await pipeline.submit(FakeMessage(0, acks), event(0))
+        await asyncio.sleep(0.05)
+        await pipeline.stop()
+        return acks
+
+    assert asyncio.run(run()) == [(0, True)]
+
+
+def test_stop_exports_buffer_and_flushes_acks():
+    async def run():
+        acks = []
+        exported = []
+
+        async def handler(body, routing_key):
+            await asyncio.sleep(0)
+            exported.append(body["n"])
+
+        pipeline = EventPipeline(handler, buffer_size=100, ack_batch_size=100, ack_interval=60)
+        for n in range(10):
+            await pipeline.submit(FakeMessage(n, acks), event(n))
+        pipeline.start()
+        await pipeline.stop()
+        # Events arriving after stop are neither buffered nor acked
+        await pipeline.submit(FakeMessage(10, acks), event(10))
+        return exported, acks, pipeline.buffer.qsize()
+
+    exported, acks, remaining = asyncio.run(run())
+    assert exported == list(range(10))
+    assert acks == [(9, True)]
+    assert remaining == 0
+
+
+def test_stop_gives_up_after_timeout():
+    async def run():
+        acks = []
+
+        async def handler(body, routing_key):
+            await asyncio.sleep(60)
+
+        pipeline = EventPipeline(handler, buffer_size=100, ack_batch_size=100, ack_interval=60)
+        for n in range(3):
+            await pipeline.submit(FakeMessage(n, acks), event(n))
+        pipeline.start()
+        await pipeline.stop(timeout=0.05)
+        return acks
+
+    assert asyncio.run(run()) == [(2, True)]
+
+
+def test_handler_errors_do_not_stop_export():
+    async def run():
+        exported = []
+
+        async def handler(body, routing_key):
+            if body["n"] == 1:
+                raise RuntimeError("boom")
+            exported.append(body["n"])
+
+        pipeline = EventPipeline(handler, buffer_size=100, ack_batch_size=100)
+        pipeline.start()
+        for n in range(3):
+            await pipeline.submit(FakeMessage(n, []), event(n))
+        await pipeline.stop()
+        return exported
+
+    assert asyncio.run(run()) == [0, 2]
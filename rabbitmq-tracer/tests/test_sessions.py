@@ -0,0 +1,153 @@
+import types
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+import sessions as sessions_module
+from events import load_event_table
+from sessions import SessionTracker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1000.0)
+    clock.monotonic = lambda: clock.now
+    clock.time_ns = lambda: int(clock.now * 1e9)
+    monkeypatch.setattr(sessions_module, "time", clock)
+    return clock
+
+
+def tracker(**kwargs):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    return SessionTracker(provider.get_tracer(__name__), load_event_table(), **kwargs), exporter
+
+
+def ended(exporter) -> list:
+    return [
+        (span.name, span.attributes["rabbitmq.session.end_reason"])
+        for span in exporter.get_finished_spans()
+    ]
+
+
+def test_close_ends_span_with_event_times():
+    sessions, exporter = tracker()
+    assert sessions.handle({"name": "c1", "timestamp_in_ms": 1000}, "connection.created")
+    assert sessions.handle({"name": "c1", "timestamp_in_ms": 3500}, "connection.closed")
+
+    (span,) = exporter.get_finished_spans()
+    assert span.name == "rabbitmq.connection"
+    assert span.attributes["rabbitmq.event.type"] == "connection.lifetime"
+    assert span.attributes["rabbitmq.session.end_reason"] == "closed"
+    assert span.end_time - span.start_time == 2_500_000_000
+
+
+def test_close_without_open_session_is_not_handled():
+    sessions, exporter = tracker()
+    assert not sessions.handle({"name": "c1"}, "connection.closed")
+    assert not exporter.get_finished_spans()
+
+
+# Event bodies as the event exchange publishes them: channels are identified
+# by pid only, and refer to their connection by the connection's pid
+CONNECTION_PID = "<rabbit@broker.1.812.0>"
+CONNECTION_CREATED = {
+    "pid": CONNECTION_PID,
+    "name": "172.18.0.5:40312 -> 172.18.0.2:5672",
+    "user": "guest",
+    "vhost": "/",
+}
+CONNECTION_CLOSED = {"pid": CONNECTION_PID, "name": "172.18.0.5:40312 -> 172.18.0.2:5672", "node": "rabbit@broker"}
+
+
+def channel_created(pid: str, number: int) -> dict:
+    return {
+        "pid": pid,
+        "name": f"172.18.0.5:40312 -> 172.18.0.2:5672 ({number})",
+        "connection": CONNECTION_PID,
+        "number": number,
+        "user": "guest",
+        "vhost": "/",
+        "user_who_performed_action": "guest",
+    }
+
+
+def channel_closed(pid: str) -> dict:
+    return {"pid": pid, "user_who_performed_action": "guest"}
+
+
+def test_channel_is_parented_to_its_connection():
+    sessions, exporter = tracker()
+    sessions.handle(CONNECTION_CREATED, "connection.created")
+    sessions.handle(channel_created("<rabbit@broker.1.820.0>", 1), "channel.created")
+    assert sessions.handle(channel_closed("<rabbit@broker.1.820.0>"), "channel.closed")
+    assert sessions.handle(CONNECTION_CLOSED, "connection.closed")
+
+    channel, connection = exporter.get_finished_spans()
+    assert channel.name == "rabbitmq.channel"
+    assert channel.attributes["rabbitmq.session.end_reason"] == "closed"
+    assert channel.attributes["rabbitmq.channel.number"] == 1
+    assert channel.parent.span_id == connection.context.span_id
+    assert channel.context.trace_id == connection.context.trace_id
+
+
+def test_channels_of_one_connection_close_independently():
+    sessions, exporter = tracker()
+    sessions.handle(CONNECTION_CREATED, "connection.created")
+    sessions.handle(channel_created("<rabbit@broker.1.820.0>", 1), "channel.created")
+    sessions.handle(channel_created("<rabbit@broker.1.821.0>", 2), "channel.created")
+    assert sessions.handle(channel_closed("<rabbit@broker.1.821.0>"), "channel.closed")
+
+    (span,) = exporter.get_finished_spans()
+    assert span.attributes["rabbitmq.channel.number"] == 2
+    assert list(sessions.observe_open(None))[0].value == 2
+
+
+def test_channel_without_known_connection_is_a_root_span():
+    sessions, exporter = tracker()
+    sessions.handle(channel_created("<rabbit@broker.1.820.0>", 1), "channel.created")
+    sessions.handle(channel_closed("<rabbit@broker.1.820.0>"), "channel.closed")
+    (span,) = exporter.get_finished_spans()
+    assert span.parent is None
+
+
+def test_least_recently_opened_evicted_over_limit():
+    sessions, exporter = tracker(max_sessions=2)
+    for name in ("a", "b", "c"):
+        sessions.handle({"vhost": "/", "name": name}, "queue.created")
+    assert ended(exporter) == [("rabbitmq.queue", "evicted")]
+    assert exporter.get_finished_spans()[0].attributes["rabbitmq.queue.name"] == "a"
+    assert not sessions.handle({"vhost": "/", "name": "a"}, "queue.deleted")
+    assert sessions.handle({"vhost": "/", "name": "b"}, "queue.deleted")
+
+
+def test_recreate_evicts_previous_session():
+    sessions, exporter = tracker()
+    body = {"channel": "ch", "consumer_tag": "tag"}
+    sessions.handle(body, "consumer.created")
+    sessions.handle(body, "consumer.created")
+    assert ended(exporter) == [("rabbitmq.consumer", "evicted")]
+
+
+def test_expire_ends_sessions_older_than_ttl(clock):
+    sessions, exporter = tracker(ttl=60)
+    sessions.handle({"name": "old"}, "connection.created")
+    clock.now += 30
+    sessions.handle({"name": "new"}, "connection.created")
+    clock.now += 40
+    sessions.expire()
+
+    assert ended(exporter) == [("rabbitmq.connection", "expired")]
+    assert sessions.handle({"name": "new"}, "connection.closed")
+
+
+def test_flush_ends_everything():
+    sessions, exporter = tracker()
+    sessions.handle({"name": "c1"}, "connection.created")
+    sessions.handle({"vhost": "/", "name": "q"}, "queue.created")
+    sessions.flush()
+    assert sorted(ended(exporter)) == [("rabbitmq.connection", "shutdown"), ("rabbitmq.queue", "shutdown")]
+    assert list(sessions.observe_open(None))[0].value == 0
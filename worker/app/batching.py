@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import time
+
+import aio_pika
+from opentelemetry import trace
+
+from app.instruments import count_settled
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+
+class MessageBatcher:
+    """
+    Collects deliveries into micro-batches of up to `max_size` messages or
+    `max_wait` seconds, hands each batch to `handler` and settles it with a
+    single multi-ack.
+
+    `handler` receives the list of messages and returns the subset that
+    failed. Failures are rejected individually first, then the last message
+    of the batch is acked with `multiple=True`, which settles everything else
+    up to its delivery tag. This is only correct because batches are formed
+    in delivery order and flushed one at a time on a single channel.
+    """
+
+    def __init__(self, handler, max_size: int, max_wait: float):
+        self.handler = handler
+        self.max_size = max(1, max_size)
+        self.max_wait = max_wait
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = None
+
+    async def add(self, message: aio_pika.IncomingMessage):
+        await self._queue.put(message)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def run(self):
+        while True:
+            batch = await self._collect()
+            await self._flush(batch)
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _flush(self, batch: list):
+        with tracer.start_as_current_span("process_order_batch") as span:
+            span.set_attribute("batch.size", len(batch))
+            try:
+                failed = await self.handler(batch)
+            except Exception:
+                logger.exception("Batch handler failed, rejecting %d messages", len(batch))
+                failed = batch
+
+            span.set_attribute("batch.failed", len(failed))
+            failed_ids = {id(message) for message in failed}
+            for message in failed:
+                await message.reject(requeue=False)
+            if failed:
+                count_settled(len(failed), "nack")
+
+            succeeded = [message for message in batch if id(message) not in failed_ids]
+            if succeeded:
+                await succeeded[-1].ack(multiple=True)
+                count_settled(len(succeeded), "ack")
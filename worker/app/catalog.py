@@ -0,0 +1,217 @@
+import os
+import csv
+import random
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from opentelemetry import metrics
+from opentelemetry.metrics import CallbackOptions, Observation
+
+logger = logging.getLogger(__name__)
+meter = metrics.get_meter(__name__)
+
+cache_hits = meter.create_counter(
+    name="catalog.price_cache.hits",
+    description="Dynamic price lookups served from the cache",
+    unit="{lookup}",
+)
+cache_misses = meter.create_counter(
+    name="catalog.price_cache.misses",
+    description="Dynamic price lookups that had to generate a new price",
+    unit="{lookup}",
+)
+cache_evictions = meter.create_counter(
+    name="catalog.price_cache.evictions",
+    description="Dynamic prices evicted from the cache, by reason (ttl or capacity)",
+    unit="{entry}",
+)
+
+# Used when no catalog file is configured
+DEFAULT_CATALOG = {
+    "widget": 9.99,
+    "gadget": 24.99,
+    "gizmo": 14.50,
+    "doohickey": 7.25,
+}
+
+
+def normalize(product: str) -> str:
+    """Catalog keys are case- and whitespace-insensitive."""
+    return " ".join(product.lower().split())
+
+
+class CatalogIndex:
+    """
+    Immutable, array-backed catalog: keys are UTF-8 encoded into one sorted
+    fixed-width bytes array and looked up with a binary search, prices live
+    in a parallel float64 array. Hundreds of thousands of SKUs cost a few
+    bytes each instead of a dict entry plus two Python objects.
+    """
+
+    def __init__(self, prices_by_key: dict):
+        keys = sorted(key.encode() for key in prices_by_key)
+        self.keys = np.array(keys, dtype=bytes) if keys else np.array([], dtype="S1")
+        self.prices = np.array([prices_by_key[key.decode()] for key in keys], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def get(self, key: str):
+        encoded = key.encode()
+        # Longer keys would be truncated to the array width and could false-match
+        if not len(self.keys) or len(encoded) > self.keys.dtype.itemsize:
+            return None
+        i = int(np.searchsorted(self.keys, encoded))
+        if i < len(self.keys) and self.keys[i] == encoded:
+            return float(self.prices[i])
+        return None
+
+
+def load_catalog_file(path: str) -> dict:
+    """Read a `product,price` CSV (header row optional) into normalized keys."""
+    prices = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or not row[0].strip():
+                continue
+            try:
+                price = float(row[1])
+            except ValueError:
+                continue  # header or malformed row
+            prices[normalize(row[0])] = price
+    return prices
+
+
+class PriceCache:
+    """Bounded LRU of generated prices with TTL expiry, so dynamic products get stable prices."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_create(self, key: str, factory) -> float:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                price, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    cache_hits.add(1)
+                    return price
+                del self._entries[key]
+                cache_evictions.add(1, attributes={"reason": "ttl"})
+
+            cache_misses.add(1)
+            price = factory()
+            self._entries[key] = (price, now + self.ttl)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                cache_evictions.add(1, attributes={"reason": "capacity"})
+            return price
+
+
+class ProductCatalog:
+    """
+    Catalog lookups for enrichment. Known products come from the file at
+    WORKER_CATALOG_PATH (or the built-in default); unknown products get a
+    random price that is cached.
+
+    Once started, a background thread reloads the file when its mtime
+    changes and swaps in the new index, so lookups only ever read the
+    current one and never wait for a parse.
+    """
+
+    def __init__(self, path: str = "", reload_interval: float = 30.0, cache_size: int = 10000, cache_ttl: float = 3600.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.cache = PriceCache(cache_size, cache_ttl)
+        self._index = CatalogIndex(DEFAULT_CATALOG)
+        self._mtime = None
+        self._reload_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._watcher = None
+
+    @classmethod
+    def from_env(cls) -> "ProductCatalog":
+        return cls(
+            path=os.getenv("WORKER_CATALOG_PATH", ""),
+            reload_interval=float(os.getenv("WORKER_CATALOG_RELOAD_INTERVAL", "30")),
+            cache_size=int(os.getenv("WORKER_PRICE_CACHE_SIZE", "10000")),
+            cache_ttl=float(os.getenv("WORKER_PRICE_CACHE_TTL", "3600")),
+        )
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def lookup(self, product: str) -> tuple[float, bool]:
+        """Return (unit price, known) for a product."""
+        key = normalize(product)
+        price = self._index.get(key)
+        if price is not None:
+            return price, True
+        return self.cache.get_or_create(key, lambda: round(random.uniform(5.0, 50.0), 2)), False
+
+    def start(self):
+        """Check the catalog file for changes every reload_interval from a daemon thread."""
+        if not self.path or self._watcher is not None:
+            return
+        self._stopped.clear()
+        self._watcher = threading.Thread(target=self._watch, name="catalog-reload", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self):
+        while not self._stopped.wait(self.reload_interval):
+            self.refresh()
+
+    def refresh(self):
+        """Reload the catalog file if it changed. Blocks for the whole parse; call it off the event loop."""
+        if not self.path:
+            return
+        with self._reload_lock:
+            self._reload()
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if mtime == self._mtime:
+                return
+            start = time.monotonic()
+            index = CatalogIndex(load_catalog_file(self.path))
+            # A single attribute store: lookups see the old index or the new one
+            self._index = index
+            self._mtime = mtime
+            logger.info(
+                "Loaded catalog %s: %d products in %.2fs",
+                self.path, len(index), time.monotonic() - start,
+            )
+        except (OSError, UnicodeDecodeError, csv.Error):
+            logger.warning("Could not load catalog file %s, keeping current catalog", self.path, exc_info=True)
+
+    def observe_size(self, options: CallbackOptions):
+        yield Observation(len(self._index), {"catalog.source": "known"})
+        yield Observation(len(self.cache), {"catalog.source": "dynamic"})
+
+
+catalog = ProductCatalog.from_env()
+
+meter.create_observable_gauge(
+    name="catalog.products",
+    callbacks=[catalog.observe_size],
+    description="Products in the catalog index (known) and the dynamic price cache",
+    unit="{product}",
+)
@@ -0,0 +1,40 @@
+"""
+JSON codec shared by the consumer and the HTTP endpoints.
+
+Uses orjson when it is installed: it parses `bytes` directly (no decoded
+`str` copy of the message body) and serializes straight to `bytes`. Falls
+back to the stdlib `json` module otherwise, with the same interface.
+"""
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+if orjson is not None:
+    def loads(data: bytes | str) -> Any:
+        return orjson.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+else:
+    def loads(data: bytes | str) -> Any:
+        # json.loads accepts UTF-8 bytes directly, skipping the explicit decode
+        return json.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the shared codec instead of the stdlib encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,167 @@
+import os
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from opentelemetry import metrics
+from opentelemetry.metrics import CallbackOptions, Observation
+
+logger = logging.getLogger(__name__)
+meter = metrics.get_meter(__name__)
+
+# Unless WORKER_MAX_IN_FLIGHT is set, adaptive mode may grow the limit up to
+# this multiple of the prefetch count it starts from
+ADAPTIVE_HEADROOM = 4
+
+
+class ConcurrencyController:
+    """
+    Bounds how many orders the worker processes at once and, in adaptive
+    mode, tunes that bound (and the channel prefetch) with AIMD:
+
+    - additive increase while latency stays within the target
+    - multiplicative decrease as soon as it does not
+
+    The latency target is either fixed (WORKER_TARGET_LATENCY) or derived
+    from the best window average seen so far times WORKER_LATENCY_TOLERANCE.
+    """
+
+    def __init__(
+        self,
+        prefetch_count: int,
+        max_in_flight: int,
+        adaptive: bool = False,
+        min_limit: int = 1,
+        target_latency: float = 0.0,
+        latency_tolerance: float = 2.0,
+        increase_step: int = 1,
+        decrease_factor: float = 0.7,
+        adjust_interval: float = 5.0,
+    ):
+        self.prefetch_count = prefetch_count
+        self.max_limit = max(1, max_in_flight)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.adaptive = adaptive
+        self.target_latency = target_latency
+        self.latency_tolerance = latency_tolerance
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.adjust_interval = adjust_interval
+
+        # Static mode runs at the configured ceiling; adaptive mode starts at
+        # the configured prefetch and discovers the right value from there.
+        start = prefetch_count if adaptive else self.max_limit
+        self.limit = max(self.min_limit, min(start, self.max_limit))
+        self.in_flight = 0
+
+        self._condition = asyncio.Condition()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._window_latency = 0.0
+        self._baseline_latency = None
+        self._last_throughput = 0.0
+        self._on_limit_change = None
+
+    @classmethod
+    def from_env(cls) -> "ConcurrencyController":
+        prefetch_count = int(os.getenv("WORKER_PREFETCH_COUNT", "32"))
+        adaptive = os.getenv("WORKER_ADAPTIVE_CONCURRENCY", "false").lower() == "true"
+        max_in_flight = os.getenv("WORKER_MAX_IN_FLIGHT")
+        if not max_in_flight:
+            # Static mode runs at the prefetch count; adaptive mode needs room
+            # above its starting point or AIMD could only ever shrink the limit
+            max_in_flight = prefetch_count * ADAPTIVE_HEADROOM if adaptive else prefetch_count
+        return cls(
+            prefetch_count=prefetch_count,
+            max_in_flight=int(max_in_flight),
+            adaptive=adaptive,
+            min_limit=int(os.getenv("WORKER_MIN_IN_FLIGHT", "1")),
+            target_latency=float(os.getenv("WORKER_TARGET_LATENCY", "0")),
+            latency_tolerance=float(os.getenv("WORKER_LATENCY_TOLERANCE", "2.0")),
+            adjust_interval=float(os.getenv("WORKER_ADAPTIVE_INTERVAL", "5.0")),
+        )
+
+    def on_limit_change(self, callback):
+        """Register an async callback invoked with the new limit (used to re-apply QoS)."""
+        self._on_limit_change = callback
+
+    @asynccontextmanager
+    async def slot(self):
+        """Wait for a free processing slot and record how long the work inside took."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            latency = time.monotonic() - start
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+            await self._record(latency)
+
+    async def _record(self, latency: float):
+        self._window_count += 1
+        self._window_latency += latency
+
+        if not self.adaptive:
+            return
+
+        elapsed = time.monotonic() - self._window_start
+        if elapsed < self.adjust_interval:
+            return
+
+        avg_latency = self._window_latency / self._window_count
+        throughput = self._window_count / elapsed
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._window_latency = 0.0
+
+        if self._baseline_latency is None or avg_latency < self._baseline_latency:
+            self._baseline_latency = avg_latency
+        target = self.target_latency or self._baseline_latency * self.latency_tolerance
+
+        if avg_latency > target:
+            new_limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+        elif throughput >= self._last_throughput * 0.95:
+            new_limit = min(self.max_limit, self.limit + self.increase_step)
+        else:
+            new_limit = self.limit
+        self._last_throughput = throughput
+
+        if new_limit != self.limit:
+            logger.info(
+                "Adjusting concurrency limit %d -> %d (avg latency %.3fs, target %.3fs, throughput %.1f/s)",
+                self.limit, new_limit, avg_latency, target, throughput,
+            )
+            await self._set_limit(new_limit)
+
+    async def _set_limit(self, limit: int):
+        async with self._condition:
+            self.limit = limit
+            self._condition.notify_all()
+        if self._on_limit_change is not None:
+            await self._on_limit_change(limit)
+
+    def observe_limit(self, options: CallbackOptions):
+        yield Observation(self.limit)
+
+    def observe_in_flight(self, options: CallbackOptions):
+        yield Observation(self.in_flight)
+
+    def register_metrics(self):
+        meter.create_observable_gauge(
+            name="worker.concurrency.limit",
+            callbacks=[self.observe_limit],
+            description="Current maximum number of orders processed concurrently",
+            unit="{message}",
+        )
+        meter.create_observable_gauge(
+            name="worker.concurrency.in_flight",
+            callbacks=[self.observe_in_flight],
+            description="Number of orders currently being processed",
+            unit="{message}",
+        )
@@ -1,30 +1,59 @@
 import os
-import json
 import asyncio
 import logging
 import random
 import time
 
 import aio_pika
-from opentelemetry import trace, metrics
+from opentelemetry import trace, propagate
+
+from app import codec
+from app.batching import MessageBatcher
+from app.concurrency import ConcurrencyController
+from app.enrich import enrich_product
+from app.instruments import (
+    count_settled,
+    decode_time_histogram,
+    message_size_histogram,
+    processing_time_histogram,
+    queue_wait_histogram,
+)
+from app.notifications import ProcessedNotifier
+from app.status import StatusWriter
+from app.transport import transport_from_env
 
 logger = logging.getLogger(__name__)
 tracer = trace.get_tracer(__name__)
-meter = metrics.get_meter(__name__)
 
-# Create a histogram to track processing time
-processing_time_histogram = meter.create_histogram(
-    name="order.processing.duration",
-    description="Time taken to process an order message",
-    unit="s"
-)
+# Set once the missing status write-back has been reported for async enrichment
+_unpersisted_enrichment_warned = False
+
+
+def published_at(message: aio_pika.IncomingMessage):
+    """Wall-clock publish time: the API's millisecond header, else the AMQP timestamp (seconds)."""
+    headers = message.headers or {}
+    if "x-published-at-ms" in headers:
+        return int(headers["x-published-at-ms"]) / 1000
+    if message.timestamp is not None:
+        return message.timestamp.timestamp()
+    return None
 
 
-async def start_consumer():
-    host = os.getenv("RABBITMQ_HOST", "localhost")
-    username = os.getenv("RABBITMQ_USERNAME", "demo")
-    password = os.getenv("RABBITMQ_PASSWORD", "demo")
-    url = f"amqp://{username}:{password}@{host}/"
+async def start_consumer(batch_size: int = None, batch_timeout_ms: float = None, transport=None):
+    """
+    Consume order messages. Batch mode is opt-in: pass `batch_size` > 1 or set
+    WORKER_BATCH_SIZE to process up to N messages (or whatever arrived within
+    `batch_timeout_ms` / WORKER_BATCH_TIMEOUT_MS) together and settle them
+    with one multi-ack.
+
+    Messages come from `transport`, or the one selected by WORKER_TRANSPORT
+    (RabbitMQ by default, see app.transport).
+
+    Returns the transport once consuming has started, or None when it could
+    not be connected.
+    """
+    if transport is None:
+        transport = transport_from_env()
 
     # Configurable random wait times (in seconds)
     min_wait = float(os.getenv("WORKER_MIN_WAIT", "0.1"))
@@ -32,72 +61,206 @@ async def start_consumer():
 
     logger.info(f"Worker configured with random wait between {min_wait}s and {max_wait}s")
 
-    connection = None
-    for attempt in range(1, 21):
-        try:
-            connection = await aio_pika.connect_robust(url)
-            logger.info("Connected to RabbitMQ")
-            break
-        except Exception:
-            logger.warning("RabbitMQ connection attempt %d failed, retrying...", attempt)
-            await asyncio.sleep(2)
+    if batch_size is None:
+        batch_size = int(os.getenv("WORKER_BATCH_SIZE", "1"))
+    if batch_timeout_ms is None:
+        batch_timeout_ms = float(os.getenv("WORKER_BATCH_TIMEOUT_MS", "50"))
+
+    if not await transport.connect():
+        return None
+    logger.info("Using %s transport", transport.name)
+
+    controller = ConcurrencyController.from_env()
+    controller.register_metrics()
+
+    # A batch can only fill up if the broker may deliver at least that many
+    min_prefetch = batch_size if batch_size > 1 else 1
+
+    if controller.adaptive:
+        # Channel-wide (global) QoS is applied immediately by the broker, so the
+        # adaptive limit can be re-applied while the consumer is running.
+        # The controller's slots still bound how many orders run at once.
+        await transport.set_prefetch(max(controller.limit, min_prefetch), global_=True)
+
+        async def apply_prefetch(limit: int):
+            await transport.set_prefetch(max(limit, min_prefetch), global_=True)
+
+        controller.on_limit_change(apply_prefetch)
+    else:
+        await transport.set_prefetch(max(controller.prefetch_count, min_prefetch))
+    logger.info(
+        "Concurrency limit %d (max %d, adaptive=%s)",
+        controller.limit, controller.max_limit, controller.adaptive,
+    )
+
+    notifier = await transport.create_notifier()
+    status_writer = await StatusWriter.from_env()
+
+    if batch_size <= 1:
+        on_message = make_message_handler(controller, min_wait, max_wait, notifier, status_writer)
+        await transport.consume(on_message)
+        logger.info("Consumer started, waiting for messages...")
+        return transport
+
+    async def on_batch(messages: list) -> list:
+        batch_span = trace.get_current_span()
+        links = [trace.Link(batch_span.get_span_context())]
+
+        async def run(message: aio_pika.IncomingMessage):
+            async with controller.slot():
+                await process_order(
+                    message.body, min_wait, max_wait,
+                    context=propagate.extract(message.headers or {}),
+                    links=links,
+                    published_at=published_at(message),
+                    notifier=notifier,
+                    status_writer=status_writer,
+                )
 
-    if connection is None:
-        logger.error("Could not connect to RabbitMQ after retries")
+        results = await asyncio.gather(*(run(m) for m in messages), return_exceptions=True)
+        return failed_messages(messages, results)
+
+    batcher = MessageBatcher(on_batch, batch_size, batch_timeout_ms / 1000)
+    await transport.consume(batcher.add)
+    batcher.start()
+    logger.info(
+        "Consumer started in batch mode (size=%d, wait=%.0fms), waiting for messages...",
+        batcher.max_size, batcher.max_wait * 1000,
+    )
+    return transport
+
+
+def failed_messages(messages: list, results: list) -> list:
+    """
+    The messages whose gather() result is an exception. CancelledError is a
+    BaseException, and a cancelled order was never processed, so it must not
+    be acked with the rest of the batch.
+    """
+    return [m for m, result in zip(messages, results) if isinstance(result, BaseException)]
+
+
+def warn_unpersisted_enrichment():
+    """The price computed on consume is only stored by the status writer; say so once."""
+    global _unpersisted_enrichment_warned
+    if _unpersisted_enrichment_warned:
         return
+    _unpersisted_enrichment_warned = True
+    logger.warning(
+        "Orders arrive flagged for enrichment (API in async enrichment mode) but order status "
+        "write-back is disabled, so their prices are not saved; set WORKER_STATUS_WRITEBACK=true"
+    )
 
-    channel = await connection.channel()
-    exchange = await channel.declare_exchange("orders", aio_pika.ExchangeType.TOPIC, durable=True)
-    queue = await channel.declare_queue("order.processing", durable=True)
-    await queue.bind(exchange, routing_key="order.created")
+
+def make_message_handler(
+    controller: ConcurrencyController,
+    min_wait: float,
+    max_wait: float,
+    notifier: ProcessedNotifier = None,
+    status_writer: StatusWriter = None,
+):
+    """Per-delivery callback for single-message mode: process, settle, count."""
 
     async def on_message(message: aio_pika.IncomingMessage):
-        async with message.process():
-            # Start timing for metrics
-            start_time = time.time()
-            status = "success"
-            product = ""
-
-            with tracer.start_as_current_span("process_order") as span:
-                try:
-                    body = json.loads(message.body.decode())
-                    order_id = str(body.get("Id", ""))
-                    product = body.get("Product", "")
-
-                    span.set_attribute("order.id", order_id)
-                    span.set_attribute("order.product", product)
-                    logger.info("Processing order: %s", body)
-
-                    # Handle error/error2 triggers sent by the API
-                    if str(product).lower() == "worker error":
-                        # Log when error2 is detected for traceability
-                        if body.get("error2"):
-                            logger.warning("Detected 'worker error' trigger in message for order %s", order_id)
-                        # simulate error handling similar to existing 'error' behavior
-                        # logger.error("Simulated processing error for order %s", order_id)
-                        status = "error"
-                        raise Exception("Simulated processing error for order %s" % order_id)
-
-                    # Simulate processing with random delay
-                    processing_delay = random.uniform(min_wait, max_wait)
-                    span.set_attribute("processing.delay_seconds", processing_delay)
-                    logger.info(f"Simulating {processing_delay:.2f}s processing time for order {order_id}")
-                    await asyncio.sleep(processing_delay)
-
-                    logger.info("Order processed: %s", order_id)
-                except Exception as e:
-                    status = "error"
-                    raise
-                finally:
-                    # Record processing time metric
-                    duration = time.time() - start_time
-                    processing_time_histogram.record(
-                        duration,
-                        attributes={
-                            "order.product": product,
-                            "status": status
-                        }
-                    )
-
-    await queue.consume(on_message)
-    logger.info("Consumer started, waiting for messages...")
+        outcome = "ack"
+        try:
+            async with message.process(), controller.slot():
+                await process_order(
+                    message.body, min_wait, max_wait,
+                    published_at=published_at(message),
+                    notifier=notifier,
+                    status_writer=status_writer,
+                )
+        except Exception:
+            outcome = "nack"
+            raise
+        finally:
+            count_settled(1, outcome)
+
+    return on_message
+
+
+async def process_order(
+    message_body: bytes,
+    min_wait: float,
+    max_wait: float,
+    context=None,
+    links=None,
+    published_at: float = None,
+    notifier: ProcessedNotifier = None,
+    status_writer: StatusWriter = None,
+):
+    # Start timing for metrics
+    start_time = time.monotonic()
+    status = "success"
+    product = ""
+    body = None
+    enrichment = None
+
+    if published_at is not None:
+        queue_wait_histogram.record(max(0.0, time.time() - published_at))
+    message_size_histogram.record(len(message_body))
+
+    with tracer.start_as_current_span("process_order", context=context, links=links) as span:
+        try:
+            decode_start = time.perf_counter()
+            body = codec.loads(message_body)
+            decode_time_histogram.record(time.perf_counter() - decode_start)
+            order_id = str(body.get("Id", ""))
+            product = body.get("Product", "")
+
+            span.set_attribute("order.id", order_id)
+            span.set_attribute("order.product", product)
+            if body.get("CorrelationId"):
+                span.set_attribute("order.correlation_id", body["CorrelationId"])
+            logger.info("Processing order: %s", order_id)
+            logger.debug("Order body: %s", body)
+
+            # Handle error/error2 triggers sent by the API
+            if str(product).lower() == "worker error":
+                # Log when error2 is detected for traceability
+                if body.get("error2"):
+                    logger.warning("Detected 'worker error' trigger in message for order %s", order_id)
+                # simulate error handling similar to existing 'error' behavior
+                # logger.error("Simulated processing error for order %s", order_id)
+                status = "error"
+                raise Exception("Simulated processing error for order %s" % order_id)
+
+            # Async enrichment mode: the API published the order unpriced
+            if body.get("Enrich"):
+                enrichment = enrich_product(product, int(body.get("Quantity") or 0))
+                span.set_attribute("order.enriched", True)
+                if status_writer is None:
+                    warn_unpersisted_enrichment()
+
+            # Simulate processing with random delay
+            processing_delay = random.uniform(min_wait, max_wait)
+            span.set_attribute("processing.delay_seconds", processing_delay)
+            logger.info(f"Simulating {processing_delay:.2f}s processing time for order {order_id}")
+            await asyncio.sleep(processing_delay)
+
+            logger.info("Order processed: %s", order_id)
+        except asyncio.CancelledError:
+            # Abandoned mid-processing (shutdown); the unacked message is redelivered
+            status = "cancelled"
+            raise
+        except Exception as e:
+            status = "error"
+            raise
+        finally:
+            # Record processing time metric
+            duration = time.monotonic() - start_time
+            processing_time_histogram.record(
+                duration,
+                attributes={
+                    "order.product": product,
+                    "status": status
+                }
+            )
+            if status_writer is not None and isinstance(body, dict) and status != "cancelled":
+                status_writer.record(
+                    body.get("Id"), "processed" if status == "success" else "failed", duration, enrichment,
+                )
+            if notifier is not None and isinstance(body, dict) and status != "cancelled":
+                # Only queued here; published off the consume path. A cancelled
+                # order did not complete, so it gets no completion event
+                notifier.notify(body, status, duration)
@@ -1,27 +1,22 @@
-import random
 import logging
 
+import numpy as np
 from opentelemetry import trace
 
+from app.catalog import catalog, normalize
+
 logger = logging.getLogger(__name__)
 tracer = trace.get_tracer(__name__)
 
-CATALOG = {
-    "widget": 9.99,
-    "gadget": 24.99,
-    "gizmo": 14.50,
-    "doohickey": 7.25,
-}
-
 
 def enrich_product(product: str, quantity: int) -> dict:
     with tracer.start_as_current_span("enrich_product") as span:
         span.set_attribute("enrich.product", product)
         span.set_attribute("enrich.quantity", quantity)
 
-        base_price = CATALOG.get(product.lower(), round(random.uniform(5.0, 50.0), 2))
+        base_price, known = catalog.lookup(product)
         total_price = round(base_price * quantity, 2)
-        category = "known" if product.lower() in CATALOG else "dynamic"
+        category = "known" if known else "dynamic"
 
         result = {
             "product": product,
@@ -36,3 +31,45 @@ def enrich_product(product: str, quantity: int) -> dict:
         span.set_attribute("enrich.category", category)
         logger.info("Enriched product=%s quantity=%d price=%.2f", product, quantity, total_price)
         return result
+
+
+def enrich_products(items: list[tuple[str, int]]) -> list[dict]:
+    """Price a batch of (product, quantity) items in one vectorized pass."""
+    with tracer.start_as_current_span("enrich_product_batch") as span:
+        span.set_attribute("enrich.batch.size", len(items))
+
+        # One catalog lookup per distinct product; `inverse` maps items to them
+        distinct = {}
+        inverse = np.fromiter(
+            (distinct.setdefault(normalize(product), len(distinct)) for product, _ in items),
+            dtype=np.intp,
+            count=len(items),
+        )
+        lookups = [catalog.lookup(key) for key in distinct]
+        unit_prices = np.array([price for price, _ in lookups], dtype=np.float64)
+        known = np.array([is_known for _, is_known in lookups], dtype=bool)
+
+        quantities = np.fromiter((quantity for _, quantity in items), dtype=np.float64, count=len(items))
+        item_unit_prices = unit_prices[inverse]
+        totals = np.round(item_unit_prices * quantities, 2)
+        item_known = known[inverse]
+
+        results = [
+            {
+                "product": product,
+                "quantity": quantity,
+                "unit_price": unit_price,
+                "price": price,
+                "category": "known" if is_known else "dynamic",
+                "currency": "USD",
+            }
+            for (product, quantity), unit_price, price, is_known in zip(
+                items, item_unit_prices.tolist(), totals.tolist(), item_known.tolist()
+            )
+        ]
+
+        span.set_attribute("enrich.batch.distinct_products", len(distinct))
+        span.set_attribute("enrich.batch.dynamic_items", int(len(items) - item_known.sum()))
+        span.set_attribute("enrich.batch.total_price", float(totals.sum()))
+        logger.info("Enriched batch items=%d distinct_products=%d", len(items), len(distinct))
+        return results
@@ -0,0 +1,105 @@
+"""
+Worker metric instruments and the histogram views that give them useful
+bucket boundaries. Durations are measured with a monotonic clock; only the
+queue wait compares against the publisher's wall-clock timestamp.
+"""
+import os
+
+from opentelemetry import metrics
+from opentelemetry.sdk.metrics.view import (
+    ExplicitBucketHistogramAggregation,
+    ExponentialBucketHistogramAggregation,
+    View,
+)
+from otel_common.export import export_view
+from otel_common.loop_monitor import lag_view
+
+meter = metrics.get_meter(__name__)
+
+# Dense between 0.1 and 2 s, where order processing actually lands
+PROCESSING_BUCKETS = [
+    0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.6, 0.75, 0.9,
+    1.0, 1.2, 1.4, 1.6, 1.8, 2.0, 2.5, 3.0, 4.0, 5.0, 7.5, 10.0, 30.0,
+]
+QUEUE_WAIT_BUCKETS = [
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+    30.0, 60.0, 120.0, 300.0, 600.0,
+]
+DECODE_BUCKETS = [
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+]
+SIZE_BUCKETS = [64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536, 262144]
+
+processing_time_histogram = meter.create_histogram(
+    name="order.processing.duration",
+    description="Time taken to process an order message",
+    unit="s"
+)
+queue_wait_histogram = meter.create_histogram(
+    name="order.queue.wait",
+    description="Time between the API publishing an order and the worker starting to process it",
+    unit="s"
+)
+decode_time_histogram = meter.create_histogram(
+    name="order.decode.duration",
+    description="Time taken to decode an order message body",
+    unit="s"
+)
+message_size_histogram = meter.create_histogram(
+    name="order.message.size",
+    description="Size of order message bodies",
+    unit="By"
+)
+settled_counter = meter.create_counter(
+    name="order.messages.settled",
+    description="Order messages settled with the broker, by outcome (ack or nack)",
+    unit="{message}"
+)
+
+# Supervised consumer processes also add to shared-memory totals by outcome,
+# which the supervisor sums into one worker-wide counter
+settled_totals = {}
+
+
+def count_settled(count: int, outcome: str):
+    settled_counter.add(count, attributes={"outcome": outcome})
+    total = settled_totals.get(outcome)
+    if total is not None:
+        total.value += count
+
+
+def parse_buckets(value: str, default: list) -> list:
+    if not value:
+        return default
+    return sorted(float(bound) for bound in value.split(",") if bound.strip())
+
+
+def histogram_views() -> list:
+    """
+    Views for the worker histograms. WORKER_HISTOGRAM_AGGREGATION=exponential
+    switches all of them to base-2 exponential buckets; otherwise explicit
+    boundaries are used, overridable with WORKER_*_BUCKETS. Event-loop lag
+    and span export duration always use their shared modules' buckets.
+    """
+    if os.getenv("WORKER_HISTOGRAM_AGGREGATION", "explicit").lower() == "exponential":
+        max_size = int(os.getenv("WORKER_HISTOGRAM_MAX_BUCKETS", "160"))
+        return [
+            View(instrument_name=name, aggregation=ExponentialBucketHistogramAggregation(max_size=max_size))
+            for name in (
+                "order.processing.duration",
+                "order.queue.wait",
+                "order.decode.duration",
+                "order.message.size",
+            )
+        ] + [lag_view(), export_view()]
+
+    buckets = {
+        "order.processing.duration": parse_buckets(os.getenv("WORKER_PROCESSING_BUCKETS", ""), PROCESSING_BUCKETS),
+        "order.queue.wait": parse_buckets(os.getenv("WORKER_QUEUE_WAIT_BUCKETS", ""), QUEUE_WAIT_BUCKETS),
+        "order.decode.duration": DECODE_BUCKETS,
+        "order.message.size": SIZE_BUCKETS,
+    }
+    return [
+        View(instrument_name=name, aggregation=ExplicitBucketHistogramAggregation(boundaries=boundaries))
+        for name, boundaries in buckets.items()
+    ] + [lag_view(), export_view()]
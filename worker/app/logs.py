@@ -0,0 +1,160 @@
+"""
+Non-blocking logging for the worker.
+
+Records are filtered (per-logger sampling and rate limiting) on the calling
+thread, then handed to a bounded queue. A background QueueListener thread does
+the formatting and the actual I/O with whatever handlers were configured on
+the root logger before. WARNING and above always pass the filters, and trace
+correlation survives the hop because LoggingInstrumentor stamps the trace and
+span IDs on the record when it is created.
+"""
+import os
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import time
+
+from opentelemetry import metrics
+
+meter = metrics.get_meter(__name__)
+
+dropped_counter = meter.create_counter(
+    name="worker.logs.dropped",
+    description="Log records dropped before output, by logger and reason (sampled, rate_limited, queue_full)",
+    unit="{record}",
+)
+
+
+def parse_logger_config(value: str) -> dict:
+    """Parse `logger=value,logger=value` into a dict of floats."""
+    config = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, number = item.split("=", 1)
+            config[name.strip()] = float(number)
+    return config
+
+
+class TokenBucket:
+    def __init__(self, rate: float):
+        self.rate = rate
+        # A bucket that can never hold a whole token would drop everything
+        # for rates below 1/s
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a `sample_rates[logger]` fraction of records below WARNING and at
+    most `rate_limits[logger]` of them per second. Settings apply to the named
+    logger and its children; the most specific name wins.
+    """
+
+    def __init__(self, sample_rates: dict, rate_limits: dict):
+        super().__init__()
+        self.sample_rates = sample_rates
+        self.rate_limits = rate_limits
+        self._buckets = {}
+        self._resolved = {}
+
+    def _resolve(self, name: str):
+        rule = self._resolved.get(name)
+        if rule is None:
+            rule = (self._lookup(self.sample_rates, name), self._lookup(self.rate_limits, name))
+            self._resolved[name] = rule
+        return rule
+
+    @staticmethod
+    def _lookup(settings: dict, name: str):
+        while name:
+            if name in settings:
+                return name, settings[name]
+            name = name.rpartition(".")[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        sample, limit = self._resolve(record.name)
+        if sample is not None and random.random() >= sample[1]:
+            dropped_counter.add(1, attributes={"logger": record.name, "reason": "sampled"})
+            return False
+        if limit is not None:
+            bucket = self._buckets.get(limit[0])
+            if bucket is None:
+                bucket = self._buckets.setdefault(limit[0], TokenBucket(limit[1]))
+            if not bucket.take():
+                dropped_counter.add(1, attributes={"logger": record.name, "reason": "rate_limited"})
+                return False
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread and never
+    blocks the caller for records below WARNING: when the queue is full
+    they are dropped and counted.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock implementation formats here, on the caller's thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if record.levelno >= logging.WARNING:
+            try:
+                self.queue.put(record, timeout=1.0)
+                return
+            except queue.Full:
+                pass
+        else:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                pass
+        dropped_counter.add(1, attributes={"logger": record.name, "reason": "queue_full"})
+
+
+def setup_logging():
+    """
+    Move the root logger's current handlers behind a queue and a background
+    listener thread. Call after the handlers and format are configured.
+    """
+    root = logging.getLogger()
+    handlers = [h for h in root.handlers if not isinstance(h, logging.handlers.QueueHandler)]
+    if not handlers:
+        return None
+
+    log_queue = queue.Queue(maxsize=int(os.getenv("WORKER_LOG_QUEUE_SIZE", "10000")))
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(
+        sample_rates=parse_logger_config(os.getenv("WORKER_LOG_SAMPLING", "")),
+        rate_limits=parse_logger_config(os.getenv("WORKER_LOG_RATE_LIMIT", "")),
+    ))
+
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
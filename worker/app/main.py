@@ -1,22 +1,51 @@
+import os
 import asyncio
+import hmac
 import logging
 from contextlib import asynccontextmanager
+from typing import Literal
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from opentelemetry import trace
+from otel_common.loop_monitor import LoopMonitor
 from pydantic import BaseModel
 
 from app.telemetry import setup_telemetry
 from app.consumer import start_consumer
-from app.enrich import enrich_product
+from app.catalog import catalog
+from app.codec import FastJSONResponse
+from app.enrich import enrich_product, enrich_products
+from app.profiler import ProfilerBusy, profiler
+from app.supervisor import ConsumerSupervisor
 
 logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    task = asyncio.create_task(start_consumer())
-    logger.info("RabbitMQ consumer started as background task")
+    # Load the catalog file up front instead of on the first /enrich request,
+    # then watch it for changes off the request path
+    await asyncio.to_thread(catalog.refresh)
+    catalog.start()
+
+    monitor = LoopMonitor.from_env()
+    if monitor is not None:
+        monitor.start()
+
+    if os.getenv("WORKER_SUPERVISOR", "false").lower() == "true":
+        # Consumers run in their own processes; this one only serves HTTP
+        supervisor = ConsumerSupervisor.from_env()
+        app.state.supervisor = supervisor
+        task = asyncio.create_task(supervisor.run())
+        logger.info("Consumer supervisor started with %d processes", len(supervisor.slots))
+    else:
+        task = asyncio.create_task(start_consumer())
+        logger.info("RabbitMQ consumer started as background task")
     yield
+    if monitor is not None:
+        monitor.stop()
+    catalog.stop()
     task.cancel()
     try:
         await task
@@ -24,7 +53,7 @@ async def lifespan(app: FastAPI):
         pass
 
 
-app = FastAPI(title="Order Worker", lifespan=lifespan)
+app = FastAPI(title="Order Worker", lifespan=lifespan, default_response_class=FastJSONResponse)
 setup_telemetry(app)
 
 
@@ -35,9 +64,54 @@ class EnrichRequest(BaseModel):
 
 @app.post("/enrich")
 def enrich(request: EnrichRequest):
-    return enrich_product(request.product, request.quantity)
+    # Returning a response directly skips FastAPI's jsonable_encoder pass
+    return FastJSONResponse(enrich_product(request.product, request.quantity))
+
+
+@app.post("/enrich/batch")
+def enrich_batch(items: list[EnrichRequest]):
+    return FastJSONResponse(enrich_products([(item.product, item.quantity) for item in items]))
 
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    supervisor = getattr(app.state, "supervisor", None)
+    if supervisor is None:
+        return {"status": "ok"}
+    status = "ok" if supervisor.alive_count() == len(supervisor.slots) else "degraded"
+    return {"status": status, "consumers": supervisor.status()}
+
+
+@app.get("/debug/profile")
+async def debug_profile(
+    seconds: float = Query(10, gt=0),
+    format: Literal["collapsed", "speedscope"] = "collapsed",
+    span_events: bool = False,
+    all_threads: bool = False,
+    x_profile_token: str | None = Header(None),
+):
+    # Disabled unless WORKER_PROFILE_TOKEN is set, and then only for callers presenting it
+    token = os.getenv("WORKER_PROFILE_TOKEN", "")
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest((x_profile_token or "").encode(), token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+    span = trace.get_current_span()
+    try:
+        if span_events:
+            span.add_event("profile.start", {"profile.requested_seconds": seconds})
+        profile = await profiler.profile(seconds, all_threads=all_threads)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    summary = profile.summary()
+    logger.info("Profiled %.1fs: %d samples, %.2f%% overhead", profile.duration, profile.ticks, profile.overhead * 100)
+    if span_events:
+        span.add_event("profile.end", {**summary, "profile.top_frames": profile.top_frames()})
+
+    headers = {f"X-Profile-{key.split('.', 1)[1].replace('_', '-').title()}": str(value) for key, value in summary.items()}
+    if format == "speedscope":
+        headers["Content-Disposition"] = 'attachment; filename="worker-profile.speedscope.json"'
+        return FastJSONResponse(profile.speedscope(), headers=headers)
+    return PlainTextResponse(profile.collapsed(), headers=headers)
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import os
+import time
+
+import aio_pika
+from opentelemetry import metrics
+
+from app import codec
+
+logger = logging.getLogger(__name__)
+meter = metrics.get_meter(__name__)
+
+PROCESSED_EXCHANGE = "orders.processed"
+
+dropped_counter = meter.create_counter(
+    name="worker.processed_events.dropped",
+    description="order.processed events not published, by reason (queue_full, publish_failed)",
+    unit="{event}",
+)
+
+
+class ProcessedNotifier:
+    """
+    Publishes an `order.processed` event to the `orders.processed` fan-out
+    exchange when an order finishes (successfully or not), echoing the
+    CorrelationId / SentAtMs the client stamped on the order so completion
+    listeners such as the load generator can measure end-to-end latency.
+
+    `notify()` only queues the event; a background task publishes it, so the
+    consumer never waits on the broker for a notification and a failed
+    publish cannot change the order's outcome. When the bounded queue is
+    full, events are dropped and counted.
+    """
+
+    def __init__(self, exchange: aio_pika.abc.AbstractExchange, max_pending: int = 10000):
+        self.exchange = exchange
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._task = None
+
+    @classmethod
+    async def create(cls, connection: aio_pika.abc.AbstractConnection):
+        """A started notifier on its own channel, or None unless WORKER_PROCESSED_EVENTS=true."""
+        if os.getenv("WORKER_PROCESSED_EVENTS", "false").lower() != "true":
+            return None
+        # Fire-and-forget: confirms would add a broker round trip per order
+        channel = await connection.channel(publisher_confirms=False)
+        exchange = await channel.declare_exchange(PROCESSED_EXCHANGE, aio_pika.ExchangeType.FANOUT, durable=True)
+        notifier = cls(exchange, max_pending=int(os.getenv("WORKER_PROCESSED_EVENTS_MAX_PENDING", "10000")))
+        notifier.start()
+        return notifier
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    def notify(self, order: dict, status: str, duration: float):
+        """Queue an event for the order; never blocks and never raises."""
+        event = {
+            "Id": order.get("Id"),
+            "CorrelationId": order.get("CorrelationId"),
+            "SentAtMs": order.get("SentAtMs"),
+            "Status": status,
+            "ProcessedAtMs": int(time.time() * 1000),
+            "DurationMs": round(duration * 1000, 3),
+        }
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            dropped_counter.add(1, attributes={"reason": "queue_full"})
+
+    async def run(self):
+        while True:
+            event = await self._queue.get()
+            await self.publish(event)
+
+    async def publish(self, event: dict):
+        try:
+            await self.exchange.publish(
+                aio_pika.Message(codec.dumps(event), content_type="application/json"),
+                routing_key="order.processed",
+            )
+        except Exception:
+            dropped_counter.add(1, attributes={"reason": "publish_failed"})
+            logger.warning("Could not publish order.processed for order %s", event["Id"], exc_info=True)
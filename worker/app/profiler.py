@@ -0,0 +1,258 @@
+"""
+On-demand sampling profiler behind `/debug/profile`.
+
+A dedicated thread reads every thread's current frame with
+`sys._current_frames()` at a fixed interval and aggregates identical stacks,
+so memory grows with the number of distinct stacks rather than the profile
+length. The sampling thread measures its own cost and stretches the
+interval so it never spends more than `max_overhead` of wall time (and of
+the GIL) sampling, which keeps the profiler safe to run under live load.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Threads that run request and message handling: the event loop, FastAPI's
+# threadpool for sync endpoints, and asyncio.to_thread workers
+APP_THREAD_PREFIXES = ("AnyIO worker thread", "asyncio_")
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class Profile:
+    def __init__(self, seconds: float, interval: float):
+        self.requested_seconds = seconds
+        self.base_interval = interval
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.ticks = 0
+        self.sampling_time = 0.0
+        self.max_interval = interval
+        # thread name -> Counter(stack -> seconds); a stack is a root-first tuple of (code, line)
+        self.stacks = {}
+
+    @property
+    def overhead(self) -> float:
+        return self.sampling_time / self.duration if self.duration else 0.0
+
+    def add(self, thread: str, stack: tuple, weight: float):
+        counter = self.stacks.get(thread)
+        if counter is None:
+            counter = self.stacks[thread] = Counter()
+        counter[stack] += weight
+
+    @staticmethod
+    def frame_name(frame: tuple) -> str:
+        code, line = frame
+        if code is None:
+            return "<truncated>"
+        name = getattr(code, "co_qualname", code.co_name)
+        return f"{name} ({os.path.basename(code.co_filename)}:{line})"
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed format: `thread;root;...;leaf <milliseconds>` per line."""
+        lines = []
+        for thread, counter in sorted(self.stacks.items()):
+            for stack, seconds in counter.most_common():
+                names = ";".join([thread.replace(";", ":")] + [self.frame_name(f) for f in stack])
+                lines.append(f"{names} {max(1, round(seconds * 1000))}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> dict:
+        """A speedscope (https://www.speedscope.app) file with one sampled profile per thread."""
+        frames = []
+        index = {}
+        profiles = []
+        for thread, counter in sorted(self.stacks.items()):
+            samples = []
+            weights = []
+            for stack, seconds in counter.most_common():
+                sample = []
+                for frame in stack:
+                    if frame not in index:
+                        index[frame] = len(frames)
+                        code, line = frame
+                        entry = {"name": self.frame_name(frame)}
+                        if code is not None:
+                            entry.update(name=getattr(code, "co_qualname", code.co_name), file=code.co_filename, line=line)
+                        frames.append(entry)
+                    sample.append(index[frame])
+                samples.append(sample)
+                weights.append(seconds)
+            profiles.append({
+                "type": "sampled",
+                "name": thread,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"order-worker profile ({self.duration:.1f}s)",
+            "exporter": "order-worker",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+    def top_frames(self, count: int = 10) -> list:
+        """The frames with the most self time across all threads, as `name=seconds`."""
+        self_time = Counter()
+        for counter in self.stacks.values():
+            for stack, seconds in counter.items():
+                if stack:
+                    self_time[stack[-1]] += seconds
+        return [f"{self.frame_name(frame)}={seconds:.3f}s" for frame, seconds in self_time.most_common(count)]
+
+    def summary(self) -> dict:
+        return {
+            "profile.seconds": round(self.duration, 3),
+            "profile.samples": self.ticks,
+            "profile.threads": len(self.stacks),
+            "profile.interval_ms": round(self.base_interval * 1000, 3),
+            "profile.max_interval_ms": round(self.max_interval * 1000, 3),
+            "profile.overhead": round(self.overhead, 4),
+        }
+
+
+class SamplingProfiler:
+    """
+    Samples stacks every `interval` seconds for at most `max_seconds`, one
+    profile at a time. Stacks deeper than `max_depth` keep their leaf-most
+    frames under a `<truncated>` root.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.01,
+        max_seconds: float = 60.0,
+        max_overhead: float = 0.05,
+        max_depth: int = 128,
+    ):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.max_overhead = max_overhead
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "SamplingProfiler":
+        return cls(
+            interval=float(os.getenv("WORKER_PROFILE_INTERVAL_MS", "10")) / 1000,
+            max_seconds=float(os.getenv("WORKER_PROFILE_MAX_SECONDS", "60")),
+            max_overhead=float(os.getenv("WORKER_PROFILE_MAX_OVERHEAD", "0.05")),
+        )
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    async def profile(self, seconds: float, all_threads: bool = False) -> Profile:
+        """
+        Profile for `seconds` (capped at `max_seconds`) from a dedicated
+        thread. Unless `all_threads`, only the calling event loop's thread
+        and the application's worker threads are sampled. Raises
+        ProfilerBusy if a profile is already running.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        seconds = min(max(seconds, self.interval), self.max_seconds)
+        profile = Profile(seconds, self.interval)
+        include = None if all_threads else threading.get_ident()
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        def run():
+            # The lock is released here rather than by the caller, so a
+            # cancelled request cannot let a second profile start alongside.
+            # It is released before the caller resumes, so the caller can
+            # start the next profile straight away
+            error = None
+            try:
+                self._sample(profile, include)
+            except BaseException as e:
+                error = e
+            finally:
+                self._lock.release()
+            loop.call_soon_threadsafe(_resolve, done, error)
+
+        try:
+            threading.Thread(target=run, name="profiler", daemon=True).start()
+        except BaseException:
+            self._lock.release()
+            raise
+        await done
+        return profile
+
+    def _sample(self, profile: Profile, loop_thread: int):
+        own = threading.get_ident()
+        names = {}
+        names_refreshed = 0.0
+        start = last = time.perf_counter()
+        deadline = start + profile.requested_seconds
+        interval = self.interval
+
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            frames = sys._current_frames()
+            # Thread names are needed to filter, but enumerating threads every
+            # tick is wasteful: refresh once a second or when a thread appears
+            if now - names_refreshed >= 1.0 or not names.keys() >= frames.keys():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                names_refreshed = now
+            # Each sample stands for the time since the previous one
+            weight = now - last if profile.ticks else interval
+            last = now
+
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                name = names.get(ident) or f"thread-{ident}"
+                if loop_thread is not None and ident != loop_thread and not name.startswith(APP_THREAD_PREFIXES):
+                    continue
+                if ident == loop_thread:
+                    name = f"{name} (event loop)"
+                profile.add(name, self._stack(frame), weight)
+            frames = frame = None
+
+            profile.ticks += 1
+            cost = time.perf_counter() - now
+            profile.sampling_time += cost
+            # Stretch the interval when sampling gets expensive (many threads,
+            # deep stacks) so its share of wall time stays under max_overhead
+            interval = max(self.interval, cost / self.max_overhead)
+            profile.max_interval = max(profile.max_interval, interval)
+            time.sleep(max(0.0, min(interval - cost, deadline - time.perf_counter())))
+
+        profile.duration = time.perf_counter() - start
+
+    def _stack(self, frame) -> tuple:
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            stack.append((frame.f_code, frame.f_lineno))
+            frame = frame.f_back
+        if frame is not None:
+            stack.append((None, 0))
+        stack.reverse()
+        return tuple(stack)
+
+
+def _resolve(future: asyncio.Future, error):
+    if future.done():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+
+
+profiler = SamplingProfiler.from_env()
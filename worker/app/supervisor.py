@@ -0,0 +1,249 @@
+import os
+import sys
+import asyncio
+import logging
+import multiprocessing
+import signal
+import time
+
+from opentelemetry import metrics
+from opentelemetry.metrics import CallbackOptions, Observation
+
+logger = logging.getLogger(__name__)
+meter = metrics.get_meter(__name__)
+
+restart_counter = meter.create_counter(
+    name="worker.supervisor.restarts",
+    description="Number of consumer processes restarted by the supervisor",
+    unit="{process}",
+)
+
+SETTLE_OUTCOMES = ("ack", "nack")
+
+# Spawn instead of fork: the parent already runs an event loop and gRPC
+# exporter threads, neither of which survives a fork.
+_mp = multiprocessing.get_context("spawn")
+
+
+def run_consumer_process(index: int, heartbeat, settled: dict):
+    """Entry point of a consumer child process: own telemetry, loop and AMQP connection."""
+    os.environ["WORKER_PROCESS_INDEX"] = str(index)
+
+    from app.instruments import settled_totals
+    from app.telemetry import setup_telemetry
+    setup_telemetry()
+    settled_totals.update(settled)
+
+    try:
+        asyncio.run(_consume(heartbeat))
+    except KeyboardInterrupt:
+        pass
+    # Let the exit-time telemetry flush finish; the supervisor kills the
+    # process if it takes longer than its stop timeout
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+async def _consume(heartbeat):
+    from app.catalog import catalog
+    from app.consumer import start_consumer
+    from otel_common.loop_monitor import LoopMonitor
+
+    # terminate() sends SIGTERM. Handling it on the loop, rather than raising
+    # from whatever frame the signal lands in, lets the current settle finish;
+    # returning then makes asyncio.run cancel the remaining tasks at their
+    # next await, and buffered work (status write-back) is flushed on the way out
+    stopping = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+
+    monitor = LoopMonitor.from_env()
+    if monitor is not None:
+        monitor.start()
+
+    async def beat():
+        # Runs on the consumer's loop, so a blocked loop also stops the heartbeat
+        while True:
+            heartbeat.value = time.time()
+            await asyncio.sleep(1)
+
+    beat_task = asyncio.create_task(beat())
+    # Async enrichment prices orders here: load the catalog before the first
+    # one arrives, and keep reloads off the consume loop
+    await asyncio.to_thread(catalog.refresh)
+    catalog.start()
+    transport = await start_consumer()
+    if transport is None:
+        beat_task.cancel()
+        sys.exit(1)
+    await stopping.wait()
+    logger.info("Consumer process stopping")
+
+
+class ConsumerSlot:
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.heartbeat = _mp.Value("d", 0.0)
+        # Messages settled by this slot's processes, by outcome. Only the
+        # current child writes and the parent only reads, so no lock is needed
+        self.settled = {outcome: _mp.Value("q", 0, lock=False) for outcome in SETTLE_OUTCOMES}
+        self.started_at = 0.0
+        self.restarts = 0
+        self.next_start = 0.0
+
+    def start(self):
+        self.heartbeat.value = time.time()
+        self.process = _mp.Process(
+            target=run_consumer_process,
+            args=(self.index, self.heartbeat, self.settled),
+            name=f"order-consumer-{self.index}",
+            daemon=True,
+        )
+        self.process.start()
+        self.started_at = time.time()
+        logger.info("Started consumer process %d (pid %d)", self.index, self.process.pid)
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def stop(self, timeout: float, terminate: bool = True):
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            if terminate:
+                self.process.terminate()
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+        self.process = None
+
+
+class ConsumerSupervisor:
+    """
+    Runs N consumer processes, each with its own AMQP connection, and keeps
+    them running: processes that exit or stop heartbeating are restarted
+    with exponential backoff.
+
+    The FastAPI app stays in the parent process. Each child exports its own
+    telemetry with a `worker.process.index` resource attribute; the parent
+    exports the alive-process gauge, the restart counter and the settled
+    message count summed over all children, restarted ones included.
+    """
+
+    def __init__(
+        self,
+        processes: int,
+        heartbeat_timeout: float = 30.0,
+        check_interval: float = 1.0,
+        max_backoff: float = 30.0,
+    ):
+        self.slots = [ConsumerSlot(i) for i in range(max(1, processes))]
+        self.heartbeat_timeout = heartbeat_timeout
+        self.check_interval = check_interval
+        self.max_backoff = max_backoff
+
+    @classmethod
+    def from_env(cls) -> "ConsumerSupervisor":
+        return cls(
+            processes=int(os.getenv("WORKER_PROCESSES", "0")) or os.cpu_count() or 1,
+            heartbeat_timeout=float(os.getenv("WORKER_HEARTBEAT_TIMEOUT", "30")),
+        )
+
+    def alive_count(self) -> int:
+        return sum(1 for slot in self.slots if slot.alive())
+
+    def settled_total(self, outcome: str) -> int:
+        return sum(slot.settled[outcome].value for slot in self.slots)
+
+    def observe_processes(self, options: CallbackOptions):
+        yield Observation(self.alive_count())
+
+    def observe_settled(self, options: CallbackOptions):
+        for outcome in SETTLE_OUTCOMES:
+            yield Observation(self.settled_total(outcome), attributes={"outcome": outcome})
+
+    def status(self) -> dict:
+        now = time.time()
+        return {
+            "processes": len(self.slots),
+            "alive": self.alive_count(),
+            "settled": {outcome: self.settled_total(outcome) for outcome in SETTLE_OUTCOMES},
+            "workers": [
+                {
+                    "index": slot.index,
+                    "pid": slot.process.pid if slot.process else None,
+                    "alive": slot.alive(),
+                    "restarts": slot.restarts,
+                    "heartbeat_age_seconds": round(now - slot.heartbeat.value, 1),
+                    "settled": {outcome: value.value for outcome, value in slot.settled.items()},
+                }
+                for slot in self.slots
+            ],
+        }
+
+    async def run(self):
+        meter.create_observable_gauge(
+            name="worker.supervisor.processes",
+            callbacks=[self.observe_processes],
+            description="Number of consumer processes currently alive",
+            unit="{process}",
+        )
+        meter.create_observable_counter(
+            name="worker.supervisor.messages.settled",
+            callbacks=[self.observe_settled],
+            description="Order messages settled by all consumer processes, by outcome (ack or nack)",
+            unit="{message}",
+        )
+        for slot in self.slots:
+            slot.start()
+        logger.info("Supervisor started %d consumer processes", len(self.slots))
+
+        try:
+            while True:
+                await asyncio.sleep(self.check_interval)
+                await self._check()
+        finally:
+            await asyncio.to_thread(self.stop)
+
+    async def _check(self):
+        now = time.time()
+        for slot in self.slots:
+            if slot.alive():
+                # Give a fresh process time to connect before judging its heartbeat
+                if now - slot.started_at < self.heartbeat_timeout:
+                    continue
+                if now - slot.heartbeat.value <= self.heartbeat_timeout:
+                    # Healthy for a full timeout period: reset the backoff
+                    slot.restarts = 0
+                    continue
+                logger.warning(
+                    "Consumer process %d missed heartbeats for %.0fs, restarting",
+                    slot.index, now - slot.heartbeat.value,
+                )
+                # Joining a hung child can take seconds; keep the API's loop free
+                await asyncio.to_thread(slot.stop, 5)
+                now = time.time()
+
+            if slot.next_start == 0.0:
+                exitcode = slot.process.exitcode if slot.process else None
+                backoff = min(self.max_backoff, 2 ** slot.restarts)
+                logger.warning(
+                    "Consumer process %d exited (code %s), restarting in %ds",
+                    slot.index, exitcode, backoff,
+                )
+                slot.next_start = now + backoff
+                continue
+
+            if now >= slot.next_start:
+                slot.next_start = 0.0
+                slot.restarts += 1
+                restart_counter.add(1, attributes={"worker.process.index": slot.index})
+                slot.start()
+
+    def stop(self, timeout: float = 10.0):
+        for slot in self.slots:
+            if slot.alive():
+                slot.process.terminate()
+        for slot in self.slots:
+            slot.stop(timeout, terminate=False)
+        logger.info("Supervisor stopped all consumer processes")
@@ -0,0 +1,287 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import time
+
+import aio_pika
+
+from app import codec
+from app.notifications import ProcessedNotifier
+
+logger = logging.getLogger(__name__)
+
+
+class AmqpTransport:
+    """
+    Consumes `order.created` messages from the `order.processing` queue on
+    RabbitMQ. Deliveries are aio_pika IncomingMessages.
+    """
+
+    name = "amqp"
+
+    def __init__(self, url: str, attempts: int = 20, retry_delay: float = 2.0):
+        self.url = url
+        self.attempts = attempts
+        self.retry_delay = retry_delay
+        self.connection = None
+        self.channel = None
+        self.queue = None
+
+    @classmethod
+    def from_env(cls) -> "AmqpTransport":
+        host = os.getenv("RABBITMQ_HOST", "localhost")
+        username = os.getenv("RABBITMQ_USERNAME", "demo")
+        password = os.getenv("RABBITMQ_PASSWORD", "demo")
+        return cls(f"amqp://{username}:{password}@{host}/")
+
+    async def connect(self) -> bool:
+        for attempt in range(1, self.attempts + 1):
+            try:
+                self.connection = await aio_pika.connect_robust(self.url)
+                logger.info("Connected to RabbitMQ")
+                break
+            except Exception:
+                logger.warning("RabbitMQ connection attempt %d failed, retrying...", attempt)
+                await asyncio.sleep(self.retry_delay)
+
+        if self.connection is None:
+            logger.error("Could not connect to RabbitMQ after retries")
+            return False
+
+        self.channel = await self.connection.channel()
+        exchange = await self.channel.declare_exchange("orders", aio_pika.ExchangeType.TOPIC, durable=True)
+        self.queue = await self.channel.declare_queue("order.processing", durable=True)
+        await self.queue.bind(exchange, routing_key="order.created")
+        return True
+
+    async def set_prefetch(self, limit: int, global_: bool = False):
+        await self.channel.set_qos(prefetch_count=limit, global_=global_)
+
+    async def create_notifier(self):
+        return await ProcessedNotifier.create(self.connection)
+
+    async def consume(self, callback):
+        await self.queue.consume(callback)
+
+
+class LocalMessage:
+    """
+    An in-process delivery with the parts of aio_pika.IncomingMessage the
+    consumer uses: body, headers, timestamp, ack/reject and process().
+    """
+
+    __slots__ = ("body", "headers", "timestamp", "delivery_tag", "processed", "_transport")
+
+    def __init__(self, transport: "MemoryTransport", body: bytes, headers: dict):
+        self.body = body
+        self.headers = headers
+        self.timestamp = None
+        self.delivery_tag = 0
+        self.processed = False
+        self._transport = transport
+
+    async def ack(self, multiple: bool = False):
+        await self._transport._settle(self, "ack", multiple)
+
+    async def reject(self, requeue: bool = False):
+        await self._transport._settle(self, "reject", False, requeue=requeue)
+
+    @contextlib.asynccontextmanager
+    async def process(self, requeue: bool = False):
+        # Same contract as aio_pika: ack on success, reject on exception,
+        # unless the handler settled the message itself
+        try:
+            yield self
+        except BaseException:
+            if not self.processed:
+                await self.reject(requeue=requeue)
+            raise
+        else:
+            if not self.processed:
+                await self.ack()
+
+
+class MemoryTransport:
+    """
+    An in-process asyncio queue standing in for RabbitMQ. Messages put in
+    with `publish()` are delivered to the consumer callback in order, with
+    the prefetch limit bounding unsettled deliveries as the broker's QoS
+    does, and multi-acks settling every earlier delivery.
+
+    Nothing outside the process can publish to it: it is meant for code that
+    drives the consumer directly (benchmarks, ReplayTransport).
+    """
+
+    name = "memory"
+
+    def __init__(self, maxsize: int = 0):
+        self.prefetch = 0
+        self.acked = 0
+        self.rejected = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._unsettled = {}
+        self._next_tag = 1
+        self._capacity = asyncio.Condition()
+        self._dispatcher = None
+        self._tasks = set()
+
+    async def connect(self) -> bool:
+        return True
+
+    async def set_prefetch(self, limit: int, global_: bool = False):
+        async with self._capacity:
+            self.prefetch = limit
+            self._capacity.notify_all()
+
+    async def create_notifier(self):
+        # There is no broker to publish order.processed events to
+        return None
+
+    async def consume(self, callback):
+        self._dispatcher = asyncio.create_task(self._dispatch(callback))
+
+    async def publish(self, body: bytes, headers: dict = None):
+        headers = dict(headers or {})
+        headers.setdefault("x-published-at-ms", int(time.time() * 1000))
+        await self._queue.put(LocalMessage(self, body, headers))
+
+    async def join(self):
+        """Wait until every published message has been settled."""
+        await self._queue.join()
+
+    def _has_capacity(self) -> bool:
+        return self.prefetch <= 0 or len(self._unsettled) < self.prefetch
+
+    async def _dispatch(self, callback):
+        while True:
+            message = await self._queue.get()
+            async with self._capacity:
+                await self._capacity.wait_for(self._has_capacity)
+                message.delivery_tag = self._next_tag
+                message.processed = False
+                self._next_tag += 1
+                self._unsettled[message.delivery_tag] = message
+            task = asyncio.create_task(callback(message))
+            self._tasks.add(task)
+            task.add_done_callback(self._callback_done)
+
+    def _callback_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # The handler has already settled and recorded the failure
+            logger.debug("Consumer callback failed", exc_info=task.exception())
+
+    async def _settle(self, message: LocalMessage, outcome: str, multiple: bool, requeue: bool = False):
+        if message.delivery_tag not in self._unsettled:
+            raise RuntimeError(f"Delivery {message.delivery_tag} is not unsettled")
+        if multiple:
+            settled = [m for tag, m in self._unsettled.items() if tag <= message.delivery_tag]
+        else:
+            settled = [message]
+
+        async with self._capacity:
+            for m in settled:
+                del self._unsettled[m.delivery_tag]
+                m.processed = True
+            self._capacity.notify_all()
+
+        if outcome == "ack":
+            self.acked += len(settled)
+        elif requeue:
+            for m in settled:
+                await self._queue.put(m)
+        else:
+            self.rejected += len(settled)
+        for _ in settled:
+            self._queue.task_done()
+
+
+class ReplayTransport(MemoryTransport):
+    """
+    Streams recorded order messages from a JSONL file through a
+    MemoryTransport, at `rate` messages/second or as fast as the consumer
+    settles them (`rate` 0), `loops` times over. Each line is an order body
+    as the API publishes it, or an envelope with the body under "body".
+
+    When the file is exhausted and every message has been settled, the
+    achieved throughput is logged.
+    """
+
+    name = "replay"
+
+    def __init__(self, path: str, rate: float = 0.0, loops: int = 1, maxsize: int = 1000):
+        super().__init__(maxsize)
+        self.path = path
+        self.rate = rate
+        self.loops = max(1, loops)
+        self.sent = 0
+        self._replayer = None
+
+    @classmethod
+    def from_env(cls) -> "ReplayTransport":
+        return cls(
+            path=os.getenv("WORKER_REPLAY_FILE") or "orders.jsonl",
+            rate=float(os.getenv("WORKER_REPLAY_RATE", "0")),
+            loops=int(os.getenv("WORKER_REPLAY_LOOPS", "1")),
+        )
+
+    async def connect(self) -> bool:
+        if not os.path.isfile(self.path):
+            logger.error("Replay file %s does not exist", self.path)
+            return False
+        return True
+
+    async def consume(self, callback):
+        await super().consume(callback)
+        self._replayer = asyncio.create_task(self._replay())
+
+    def _read(self):
+        with open(self.path, "rb") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if isinstance(record, dict) and "body" in record:
+                    record = record["body"]
+                yield record.encode() if isinstance(record, str) else codec.dumps(record)
+
+    async def _replay(self):
+        logger.info(
+            "Replaying %s %d time(s) at %s",
+            self.path, self.loops, f"{self.rate:g} msg/s" if self.rate > 0 else "maximum rate",
+        )
+        start = time.monotonic()
+        for _ in range(self.loops):
+            for body in self._read():
+                if self.rate > 0:
+                    delay = start + self.sent / self.rate - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                # Publish time is now, so queue wait measures this process only
+                await self.publish(body)
+                self.sent += 1
+
+        await self.join()
+        elapsed = time.monotonic() - start
+        logger.info(
+            "Replayed %d messages in %.2fs (%.1f msg/s): %d acked, %d rejected",
+            self.sent, elapsed, self.sent / elapsed if elapsed > 0 else 0.0, self.acked, self.rejected,
+        )
+
+
+TRANSPORTS = {
+    "amqp": AmqpTransport.from_env,
+    "memory": MemoryTransport,
+    "replay": ReplayTransport.from_env,
+}
+
+
+def transport_from_env():
+    """The transport named by WORKER_TRANSPORT: amqp (default), memory or replay."""
+    name = os.getenv("WORKER_TRANSPORT", "amqp").lower()
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown WORKER_TRANSPORT {name!r}, expected one of {', '.join(TRANSPORTS)}")
+    return TRANSPORTS[name]()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Tests run from a checkout, where `app` is under worker/ and the shared
+# otel_common package under common/ (the image copies both into /app)
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for path in (os.path.join(ROOT, "worker"), os.path.join(ROOT, "common")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,130 @@
+import asyncio
+
+from app import codec
+from app.batching import MessageBatcher
+from app.concurrency import ConcurrencyController
+from app.consumer import failed_messages, start_consumer
+from app.transport import MemoryTransport
+
+
+class FakeMessage:
+    def __init__(self, tag: int, log: list):
+        self.delivery_tag = tag
+        self.log = log
+
+    async def ack(self, multiple: bool = False):
+        self.log.append(("ack", self.delivery_tag, multiple))
+
+    async def reject(self, requeue: bool = False):
+        self.log.append(("reject", self.delivery_tag, requeue))
+
+
+def flush(handler, count: int) -> list:
+    log = []
+    batch = [FakeMessage(tag, log) for tag in range(1, count + 1)]
+    asyncio.run(MessageBatcher(handler, count, 0.01)._flush(batch))
+    return log
+
+
+def test_failures_rejected_before_multi_ack():
+    async def handler(messages):
+        return [messages[1], messages[3]]
+
+    assert flush(handler, 5) == [
+        ("reject", 2, False),
+        ("reject", 4, False),
+        ("ack", 5, True),
+    ]
+
+
+def test_multi_ack_uses_last_success():
+    async def handler(messages):
+        return [messages[-1]]
+
+    assert flush(handler, 3) == [("reject", 3, False), ("ack", 2, True)]
+
+
+def test_all_failed_sends_no_ack():
+    async def handler(messages):
+        return list(messages)
+
+    assert flush(handler, 2) == [("reject", 1, False), ("reject", 2, False)]
+
+
+def test_handler_error_rejects_whole_batch():
+    async def handler(messages):
+        raise RuntimeError("boom")
+
+    assert flush(handler, 2) == [("reject", 1, False), ("reject", 2, False)]
+
+
+def test_collect_stops_at_max_size():
+    async def run():
+        batcher = MessageBatcher(None, 3, 1.0)
+        for tag in range(5):
+            await batcher.add(tag)
+        return await batcher._collect(), await batcher._collect()
+
+    assert asyncio.run(run()) == ([0, 1, 2], [3, 4])
+
+
+def test_cancelled_results_count_as_failed():
+    messages = ["a", "b", "c", "d"]
+    results = [None, asyncio.CancelledError(), ValueError(), None]
+    assert failed_messages(messages, results) == ["b", "c"]
+
+
+def test_batch_mode_returns_transport_and_settles(monkeypatch):
+    monkeypatch.setenv("WORKER_MIN_WAIT", "0")
+    monkeypatch.setenv("WORKER_MAX_WAIT", "0")
+    monkeypatch.setenv("WORKER_STATUS_WRITEBACK", "false")
+
+    async def run():
+        transport = MemoryTransport()
+        assert await start_consumer(batch_size=4, batch_timeout_ms=5, transport=transport) is transport
+        for i in range(10):
+            product = "worker error" if i % 5 == 0 else "widget"
+            await transport.publish(codec.dumps({"Id": str(i), "Product": product, "Quantity": 1}))
+        await asyncio.wait_for(transport.join(), timeout=5)
+        return transport
+
+    transport = asyncio.run(run())
+    assert (transport.acked, transport.rejected) == (8, 2)
+
+
+def test_adaptive_batch_prefetch_never_below_batch_size(monkeypatch):
+    monkeypatch.setenv("WORKER_ADAPTIVE_CONCURRENCY", "true")
+    monkeypatch.setenv("WORKER_PREFETCH_COUNT", "2")
+    monkeypatch.setenv("WORKER_STATUS_WRITEBACK", "false")
+    controllers = []
+    from_env = ConcurrencyController.from_env
+
+    def capture():
+        controllers.append(from_env())
+        return controllers[-1]
+
+    monkeypatch.setattr(ConcurrencyController, "from_env", staticmethod(capture))
+
+    async def run():
+        transport = MemoryTransport()
+        await start_consumer(batch_size=8, batch_timeout_ms=5, transport=transport)
+        initial = transport.prefetch
+        # AIMD shrinking the limit must not shrink prefetch below a batch
+        await controllers[0]._on_limit_change(1)
+        shrunk = transport.prefetch
+        await controllers[0]._on_limit_change(20)
+        return initial, shrunk, transport.prefetch
+
+    assert asyncio.run(run()) == (8, 8, 20)
+
+
+def test_static_batch_prefetch_covers_batch_size(monkeypatch):
+    monkeypatch.setenv("WORKER_PREFETCH_COUNT", "2")
+    monkeypatch.setenv("WORKER_STATUS_WRITEBACK", "false")
+
+    async def run():
+        transport = MemoryTransport()
+        await start_consumer(batch_size=8, batch_timeout_ms=5, transport=transport)
+        return transport.prefetch
+
+    assert asyncio.run(run()) == 8
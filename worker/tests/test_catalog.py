@@ -0,0 +1,140 @@
+import time
+
+import pytest
+
+from app import catalog as catalog_module
+from app.catalog import CatalogIndex, PriceCache, ProductCatalog, load_catalog_file, normalize
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(catalog_module, "time", clock)
+    return clock
+
+
+def test_normalize():
+    assert normalize("  Big   Widget ") == "big widget"
+
+
+def test_index_lookup():
+    index = CatalogIndex({"widget": 9.99, "gadget": 24.99, "gizmo pro": 14.5})
+    assert len(index) == 3
+    assert index.get("gadget") == 24.99
+    assert index.get("gizmo pro") == 14.5
+    assert index.get("gizmo") is None
+    assert index.get("doohickey") is None
+
+
+def test_index_rejects_keys_longer_than_width():
+    # "widgets" would be truncated to "widget" by the 6-byte array width
+    assert CatalogIndex({"widget": 1.0}).get("widgets") is None
+
+
+def test_empty_index():
+    assert CatalogIndex({}).get("widget") is None
+
+
+def test_price_cache_hit_keeps_price(clock):
+    cache = PriceCache(max_size=10, ttl=60)
+    prices = iter([1.0, 2.0])
+    assert cache.get_or_create("a", lambda: next(prices)) == 1.0
+    assert cache.get_or_create("a", lambda: next(prices)) == 1.0
+
+
+def test_price_cache_ttl_expiry(clock):
+    cache = PriceCache(max_size=10, ttl=60)
+    cache.get_or_create("a", lambda: 1.0)
+    clock.now += 61
+    assert cache.get_or_create("a", lambda: 2.0) == 2.0
+
+
+def test_price_cache_evicts_least_recently_used(clock):
+    cache = PriceCache(max_size=2, ttl=60)
+    cache.get_or_create("a", lambda: 1.0)
+    cache.get_or_create("b", lambda: 2.0)
+    cache.get_or_create("a", lambda: 0.0)
+    cache.get_or_create("c", lambda: 3.0)
+    assert len(cache) == 2
+    assert cache.get_or_create("a", lambda: 0.0) == 1.0
+    assert cache.get_or_create("b", lambda: 0.0) == 0.0
+
+
+def test_load_catalog_file(tmp_path):
+    path = tmp_path / "catalog.csv"
+    path.write_text("product,price\n Big Widget ,12.5\nbroken,abc\n,3\nonly-name\n")
+    assert load_catalog_file(str(path)) == {"big widget": 12.5}
+
+
+def test_catalog_reloads_changed_file(tmp_path, clock):
+    path = tmp_path / "catalog.csv"
+    path.write_text("widget,1.5\n")
+    catalog = ProductCatalog(str(path))
+    catalog.refresh()
+    assert catalog.lookup("Widget") == (1.5, True)
+
+    path.write_text("widget,2.5\nsprocket,3\n")
+    catalog._mtime = None
+    # Lookups only read the current index; reloading is refresh()'s job
+    assert catalog.lookup("widget") == (1.5, True)
+    catalog.refresh()
+    assert catalog.lookup("widget") == (2.5, True)
+    assert len(catalog) == 2
+
+
+def test_unchanged_file_not_reparsed(tmp_path, monkeypatch):
+    path = tmp_path / "catalog.csv"
+    path.write_text("widget,1.5\n")
+    catalog = ProductCatalog(str(path))
+    catalog.refresh()
+    monkeypatch.setattr(catalog_module, "load_catalog_file", lambda path: pytest.fail("reparsed"))
+    catalog.refresh()
+
+
+def test_watcher_reloads_in_background(tmp_path):
+    path = tmp_path / "catalog.csv"
+    path.write_text("widget,1.5\n")
+    catalog = ProductCatalog(str(path), reload_interval=0.01)
+    catalog.start()
+    try:
+        deadline = time.monotonic() + 5
+        while catalog.lookup("widget") != (1.5, True):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        catalog.stop()
+    assert catalog._watcher is None
+
+
+def test_watcher_not_started_without_file():
+    catalog = ProductCatalog()
+    catalog.start()
+    assert catalog._watcher is None
+
+
+# Not UTF-8, and a field over the csv module's size limit
+@pytest.mark.parametrize(
+    "content",
+    [b"widget,1.5\n\xff\xfe,2\n", b"widget," + b"1" * 200_000 + b"\n"],
+    ids=["not-utf8", "oversized-field"],
+)
+def test_unreadable_file_keeps_current_index(tmp_path, clock, content):
+    path = tmp_path / "catalog.csv"
+    path.write_bytes(content)
+    catalog = ProductCatalog(str(path))
+    catalog.refresh()
+    assert catalog.lookup("gadget") == (24.99, True)
+
+
+def test_missing_file_keeps_current_index(tmp_path, clock):
+    catalog = ProductCatalog(str(tmp_path / "missing.csv"))
+    catalog.refresh()
+    assert catalog.lookup("widget") == (9.99, True)
@@ -0,0 +1,111 @@
+import asyncio
+import types
+
+import pytest
+
+from app import concurrency
+from app.concurrency import ADAPTIVE_HEADROOM, ConcurrencyController
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    # Every reading advances one second, so each window closes with the
+    # same elapsed time and throughput comparisons are deterministic
+    ticks = iter(range(1_000_000))
+    monkeypatch.setattr(concurrency, "time", types.SimpleNamespace(monotonic=lambda: float(next(ticks))))
+
+
+def controller(**kwargs) -> ConcurrencyController:
+    options = dict(prefetch_count=8, max_in_flight=32, adaptive=True, adjust_interval=0.0)
+    options.update(kwargs)
+    return ConcurrencyController(**options)
+
+
+async def finish(controller: ConcurrencyController, latency: float):
+    # Feed one completed order into the current window and close it
+    await controller._record(latency)
+
+
+def test_static_mode_runs_at_max():
+    assert controller(adaptive=False).limit == 32
+
+
+def test_adaptive_mode_starts_at_prefetch():
+    assert controller().limit == 8
+
+
+def test_additive_increase_while_latency_holds():
+    c = controller()
+
+    async def run():
+        for _ in range(3):
+            await finish(c, 0.1)
+
+    asyncio.run(run())
+    assert c.limit == 11
+
+
+def test_multiplicative_decrease_above_target():
+    c = controller(target_latency=0.5)
+
+    async def run():
+        await finish(c, 1.0)
+
+    asyncio.run(run())
+    assert c.limit == int(8 * 0.7)
+
+
+def test_limit_stays_within_bounds():
+    c = controller(prefetch_count=31, max_in_flight=32, min_limit=4, target_latency=0.5)
+    changes = []
+
+    async def on_change(limit):
+        changes.append(limit)
+
+    c.on_limit_change(on_change)
+
+    async def run():
+        for _ in range(5):
+            await finish(c, 0.1)
+        for _ in range(10):
+            await finish(c, 1.0)
+
+    asyncio.run(run())
+    assert max(changes) == 32
+    assert c.limit == 4
+    assert changes[-1] == 4
+
+
+def test_slot_waits_for_capacity():
+    c = controller(adaptive=False, max_in_flight=2)
+    peak = 0
+
+    async def work():
+        nonlocal peak
+        async with c.slot():
+            peak = max(peak, c.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(work() for _ in range(6)))
+
+    asyncio.run(run())
+    assert peak == 2
+    assert c.in_flight == 0
+
+
+@pytest.mark.parametrize("adaptive, expected", [("false", 16), ("true", 16 * ADAPTIVE_HEADROOM)])
+def test_from_env_default_max(monkeypatch, adaptive, expected):
+    monkeypatch.setenv("WORKER_PREFETCH_COUNT", "16")
+    monkeypatch.setenv("WORKER_ADAPTIVE_CONCURRENCY", adaptive)
+    monkeypatch.delenv("WORKER_MAX_IN_FLIGHT", raising=False)
+    c = ConcurrencyController.from_env()
+    assert c.max_limit == expected
+    assert c.limit == (16 if adaptive == "true" else expected)
+
+
+def test_from_env_explicit_max(monkeypatch):
+    monkeypatch.setenv("WORKER_PREFETCH_COUNT", "16")
+    monkeypatch.setenv("WORKER_ADAPTIVE_CONCURRENCY", "true")
+    monkeypatch.setenv("WORKER_MAX_IN_FLIGHT", "20")
+    assert ConcurrencyController.from_env().max_limit == 20
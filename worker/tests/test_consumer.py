@@ -0,0 +1,106 @@
+import asyncio
+import logging
+
+import pytest
+
+from app import codec, consumer
+from app.consumer import process_order
+
+
+class Recorder:
+    def __init__(self):
+        self.rows = []
+
+    def record(self, order_id, status, duration, enrichment=None):
+        self.rows.append((order_id, status, enrichment))
+
+
+@pytest.fixture(autouse=True)
+def reset_warning(monkeypatch):
+    monkeypatch.setattr(consumer, "_unpersisted_enrichment_warned", False)
+
+
+def order(**fields) -> bytes:
+    body = {"Id": "1", "Product": "widget", "Quantity": 2}
+    body.update(fields)
+    return codec.dumps(body)
+
+
+def test_async_enrichment_is_recorded_with_status():
+    writer = Recorder()
+    asyncio.run(process_order(order(Enrich=True), 0, 0, status_writer=writer))
+    ((order_id, status, enrichment),) = writer.rows
+    assert (order_id, status) == ("1", "processed")
+    assert enrichment["price"] > 0
+
+
+def test_sync_orders_carry_no_enrichment():
+    writer = Recorder()
+    asyncio.run(process_order(order(), 0, 0, status_writer=writer))
+    assert writer.rows == [("1", "processed", None)]
+
+
+def test_failed_order_recorded_as_failed():
+    writer = Recorder()
+    with pytest.raises(Exception, match="Simulated processing error"):
+        asyncio.run(process_order(order(Product="worker error"), 0, 0, status_writer=writer))
+    assert writer.rows == [("1", "failed", None)]
+
+
+def test_enrichment_without_writer_warns_once(caplog):
+    async def run():
+        for _ in range(3):
+            await process_order(order(Enrich=True), 0, 0)
+
+    with caplog.at_level(logging.WARNING, logger="app.consumer"):
+        asyncio.run(run())
+    warnings = [r for r in caplog.records if "WORKER_STATUS_WRITEBACK" in r.getMessage()]
+    assert len(warnings) == 1
+
+
+def test_no_warning_for_sync_orders(caplog):
+    with caplog.at_level(logging.WARNING, logger="app.consumer"):
+        asyncio.run(process_order(order(), 0, 0))
+    assert not caplog.records
+
+
+def test_cancelled_order_is_not_recorded():
+    writer = Recorder()
+
+    async def run():
+        task = asyncio.create_task(process_order(order(), 1.0, 1.0, status_writer=writer))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert writer.rows == []
+
+
+class Notifier:
+    def __init__(self):
+        self.events = []
+
+    def notify(self, order, status, duration):
+        self.events.append((order["Id"], status))
+
+
+def test_completed_orders_notified():
+    notifier = Notifier()
+    asyncio.run(process_order(order(), 0, 0, notifier=notifier))
+    assert notifier.events == [("1", "success")]
+
+
+def test_cancelled_order_is_not_notified():
+    notifier = Notifier()
+
+    async def run():
+        task = asyncio.create_task(process_order(order(), 1.0, 1.0, notifier=notifier))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert notifier.events == []
@@ -0,0 +1,40 @@
+import pytest
+
+from app import enrich
+from app.catalog import ProductCatalog
+from app.enrich import enrich_product, enrich_products
+
+
+@pytest.fixture(autouse=True)
+def fresh_catalog(monkeypatch):
+    # Dynamic prices are random but cached, so both paths must share one catalog
+    monkeypatch.setattr(enrich, "catalog", ProductCatalog())
+
+
+@pytest.mark.parametrize(
+    "items",
+    [
+        [("widget", 2), ("gadget", 1)],
+        [("Widget", 3), ("  widget ", 1), ("WIDGET", 0)],
+        [("mystery box", 4), ("Mystery  Box", 2), ("gizmo", 5)],
+        [],
+    ],
+    ids=["known", "normalized-duplicates", "dynamic", "empty"],
+)
+def test_batch_matches_single_item_enrichment(items):
+    batch = enrich_products(items)
+    assert batch == [enrich_product(product, quantity) for product, quantity in items]
+
+
+def test_batch_result_types_match():
+    (batch,) = enrich_products([("widget", 3)])
+    single = enrich_product("widget", 3)
+    assert {key: type(value) for key, value in batch.items()} == {key: type(value) for key, value in single.items()}
+    assert batch["price"] == 29.97
+
+
+def test_duplicate_dynamic_products_share_a_price():
+    first, second = enrich_products([("Mystery Box", 1), ("mystery box", 2)])
+    assert first["category"] == second["category"] == "dynamic"
+    assert first["unit_price"] == second["unit_price"]
+    assert second["price"] == round(second["unit_price"] * 2, 2)
@@ -0,0 +1,74 @@
+import logging
+import types
+
+import pytest
+
+from app import logs
+from app.logs import SamplingFilter, TokenBucket, parse_logger_config
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1000.0)
+    clock.monotonic = lambda: clock.now
+    monkeypatch.setattr(logs, "time", clock)
+    return clock
+
+
+def record(name: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, "message", None, None)
+
+
+def test_parse_logger_config():
+    assert parse_logger_config("app.consumer=0.01, app.enrich = 5,bogus") == {
+        "app.consumer": 0.01,
+        "app.enrich": 5.0,
+    }
+
+
+def test_bucket_allows_burst_then_refills(clock):
+    bucket = TokenBucket(3)
+    assert [bucket.take() for _ in range(4)] == [True, True, True, False]
+    clock.now += 1 / 3
+    assert bucket.take()
+    assert not bucket.take()
+
+
+def test_bucket_below_one_per_second(clock):
+    bucket = TokenBucket(0.5)
+    assert bucket.take()
+    assert not bucket.take()
+    clock.now += 1.0
+    assert not bucket.take()
+    clock.now += 1.0
+    assert bucket.take()
+
+
+def test_bucket_does_not_accumulate_past_capacity(clock):
+    bucket = TokenBucket(0.5)
+    clock.now += 3600
+    assert bucket.take()
+    assert not bucket.take()
+
+
+def test_filter_rate_limits_below_warning(clock):
+    f = SamplingFilter({}, {"app": 2})
+    assert [f.filter(record("app.consumer")) for _ in range(3)] == [True, True, False]
+    # The limit is shared by the configured logger's children
+    assert not f.filter(record("app.enrich"))
+    assert f.filter(record("app.consumer", logging.WARNING))
+    assert f.filter(record("uvicorn"))
+
+
+def test_filter_most_specific_rule_wins():
+    f = SamplingFilter({"app": 1.0, "app.consumer": 0.0}, {})
+    assert not f.filter(record("app.consumer.batch"))
+    assert f.filter(record("app.enrich"))
+    assert f.filter(record("app.consumer", logging.ERROR))
+
+
+def test_filter_samples_fraction(monkeypatch):
+    draws = iter([0.05, 0.2, 0.09])
+    monkeypatch.setattr(logs.random, "random", lambda: next(draws))
+    f = SamplingFilter({"app": 0.1}, {})
+    assert [f.filter(record("app")) for _ in range(3)] == [True, False, True]
@@ -0,0 +1,90 @@
+import asyncio
+
+from app import codec, notifications
+from app.consumer import process_order
+from app.notifications import ProcessedNotifier
+
+
+class FakeExchange:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.published = []
+
+    async def publish(self, message, routing_key: str):
+        if self.fail:
+            raise ConnectionError("channel closed")
+        self.published.append((routing_key, codec.loads(message.body)))
+
+
+class Counter:
+    def __init__(self):
+        self.counts = {}
+
+    def add(self, amount, attributes):
+        self.counts[attributes["reason"]] = self.counts.get(attributes["reason"], 0) + amount
+
+
+ORDER = {"Id": "1", "CorrelationId": "c-1", "SentAtMs": 1000, "Product": "widget", "Quantity": 1}
+
+
+def test_notify_queues_and_publishes_in_background():
+    async def run():
+        exchange = FakeExchange()
+        notifier = ProcessedNotifier(exchange)
+        notifier.notify(ORDER, "success", 0.25)
+        # Nothing is published on the caller's path
+        assert exchange.published == []
+        notifier.start()
+        await asyncio.sleep(0)
+        return exchange.published
+
+    ((routing_key, event),) = asyncio.run(run())
+    assert routing_key == "order.processed"
+    assert event["CorrelationId"] == "c-1"
+    assert event["SentAtMs"] == 1000
+    assert event["Status"] == "success"
+    assert event["DurationMs"] == 250.0
+
+
+def test_full_queue_drops_and_counts(monkeypatch):
+    counter = Counter()
+    monkeypatch.setattr(notifications, "dropped_counter", counter)
+    notifier = ProcessedNotifier(FakeExchange(), max_pending=2)
+    for _ in range(5):
+        notifier.notify(ORDER, "success", 0.1)
+    assert counter.counts == {"queue_full": 3}
+
+
+def test_publish_failure_is_counted_and_publisher_keeps_running(monkeypatch):
+    counter = Counter()
+    monkeypatch.setattr(notifications, "dropped_counter", counter)
+
+    async def run():
+        exchange = FakeExchange(fail=True)
+        notifier = ProcessedNotifier(exchange)
+        notifier.start()
+        notifier.notify(ORDER, "success", 0.1)
+        await asyncio.sleep(0)
+        exchange.fail = False
+        notifier.notify(ORDER, "error", 0.1)
+        await asyncio.sleep(0)
+        return exchange.published
+
+    published = asyncio.run(run())
+    assert counter.counts == {"publish_failed": 1}
+    assert [event["Status"] for _, event in published] == ["error"]
+
+
+def test_failing_notifier_never_fails_the_order():
+    async def run():
+        notifier = ProcessedNotifier(FakeExchange(fail=True))
+        notifier.start()
+        await process_order(codec.dumps(ORDER), 0, 0, notifier=notifier)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("WORKER_PROCESSED_EVENTS", raising=False)
+    assert asyncio.run(ProcessedNotifier.create(connection=None)) is None
@@ -0,0 +1,162 @@
+import asyncio
+import sys
+import threading
+import time
+
+import pytest
+
+from app.profiler import Profile, ProfilerBusy, SamplingProfiler
+
+
+def outer():
+    pass
+
+
+def inner():
+    pass
+
+
+OUTER = (outer.__code__, 10)
+INNER = (inner.__code__, 20)
+
+
+def spin(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def frame_names(profile: Profile) -> set:
+    return {code.co_name for counter in profile.stacks.values() for stack in counter for code, _ in stack if code}
+
+
+def test_samples_worker_threads_of_the_loop():
+    async def run():
+        profiler = SamplingProfiler(interval=0.002)
+        task = asyncio.create_task(asyncio.to_thread(spin, 0.3))
+        profile = await profiler.profile(0.2)
+        await task
+        return profile
+
+    profile = asyncio.run(run())
+    assert "spin" in frame_names(profile)
+    assert any(name.endswith("(event loop)") for name in profile.stacks)
+    assert profile.ticks > 10
+    assert profile.duration == pytest.approx(0.2, abs=0.1)
+
+
+def test_other_threads_only_with_all_threads():
+    stop = threading.Event()
+    thread = threading.Thread(target=lambda: stop.wait(5), name="unrelated")
+    thread.start()
+    try:
+        profiler = SamplingProfiler(interval=0.002)
+        default = asyncio.run(profiler.profile(0.05))
+        everything = asyncio.run(profiler.profile(0.05, all_threads=True))
+    finally:
+        stop.set()
+        thread.join()
+    assert "unrelated" not in default.stacks
+    assert "unrelated" in everything.stacks
+
+
+def test_one_profile_at_a_time():
+    async def run():
+        profiler = SamplingProfiler(interval=0.005)
+        first = asyncio.create_task(profiler.profile(0.1))
+        await asyncio.sleep(0)
+        assert profiler.busy
+        with pytest.raises(ProfilerBusy):
+            await profiler.profile(0.1)
+        await first
+        assert not profiler.busy
+        return await profiler.profile(0.01)
+
+    assert asyncio.run(run()).ticks > 0
+
+
+def test_cancelled_request_keeps_lock_until_sampling_ends():
+    async def run():
+        profiler = SamplingProfiler(interval=0.005)
+        task = asyncio.create_task(profiler.profile(0.2))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The sampling thread is still running and still owns the profiler
+        assert profiler.busy
+        with pytest.raises(ProfilerBusy):
+            await profiler.profile(0.01)
+        await asyncio.sleep(0.3)
+        assert not profiler.busy
+
+    asyncio.run(run())
+
+
+def test_interval_stretched_to_stay_under_overhead_budget():
+    profiler = SamplingProfiler(interval=0.001, max_overhead=0.0005)
+    profile = asyncio.run(profiler.profile(0.2, all_threads=True))
+    assert profile.max_interval > profiler.interval
+    # At the base interval this would be about 200 samples
+    assert profile.ticks < 100
+
+
+def test_duration_capped_at_max_seconds():
+    profiler = SamplingProfiler(interval=0.005, max_seconds=0.05)
+    profile = asyncio.run(profiler.profile(10))
+    assert profile.requested_seconds == 0.05
+    assert profile.duration < 1
+
+
+def test_deep_stacks_keep_leaf_frames():
+    def recurse(depth: int):
+        if depth == 0:
+            return SamplingProfiler(max_depth=3)._stack(sys._getframe())
+        return recurse(depth - 1)
+
+    stack = recurse(10)
+    assert len(stack) == 4
+    assert stack[0] == (None, 0)
+    assert [code.co_name for code, _ in stack[1:]] == ["recurse"] * 3
+
+
+def sample_profile() -> Profile:
+    profile = Profile(1.0, 0.01)
+    profile.duration = 1.0
+    profile.add("MainThread (event loop)", (OUTER, INNER), 0.25)
+    profile.add("MainThread (event loop)", (OUTER,), 0.0001)
+    profile.add("worker;1", ((None, 0), INNER), 0.5)
+    return profile
+
+
+def test_collapsed_output():
+    lines = sample_profile().collapsed().splitlines()
+    assert lines == [
+        "MainThread (event loop);outer (test_profiler.py:10);inner (test_profiler.py:20) 250",
+        # Rounded up so no stack disappears from a flame graph
+        "MainThread (event loop);outer (test_profiler.py:10) 1",
+        "worker:1;<truncated>;inner (test_profiler.py:20) 500",
+    ]
+
+
+def test_speedscope_output():
+    document = sample_profile().speedscope()
+    frames = document["shared"]["frames"]
+    # Frames are shared between threads
+    assert [frame["name"] for frame in frames] == ["outer", "inner", "<truncated>"]
+    assert frames[0]["line"] == 10 and frames[0]["file"].endswith("test_profiler.py")
+    assert "file" not in frames[2]
+
+    loop, worker = document["profiles"]
+    assert loop["name"] == "MainThread (event loop)"
+    assert loop["samples"] == [[0, 1], [0]]
+    assert loop["weights"] == [0.25, 0.0001]
+    assert loop["endValue"] == pytest.approx(0.2501)
+    assert worker["samples"] == [[2, 1]]
+
+
+def test_top_frames_by_self_time():
+    assert sample_profile().top_frames(2) == [
+        "inner (test_profiler.py:20)=0.750s",
+        "outer (test_profiler.py:10)=0.000s",
+    ]
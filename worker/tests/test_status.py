@@ -0,0 +1,159 @@
+import asyncio
+import contextlib
+import json
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from app import status
+from app.status import MAX_BATCH_SIZE, StatusWriter, _update_sql
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def execute(self, sql: str, *args):
+        if self.pool.fail:
+            raise ConnectionError("connection reset")
+        rows = len(args) // 6
+        self.pool.batches.append([args[i * 6:(i + 1) * 6] for i in range(rows)])
+        return f"UPDATE {rows}"
+
+
+class FakePool:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.batches = []
+        self.closed = False
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        yield FakeConnection(self)
+
+    async def close(self):
+        self.closed = True
+
+
+def ids(count: int) -> list:
+    return [str(uuid.uuid4()) for _ in range(count)]
+
+
+def written_ids(pool: FakePool) -> list:
+    return [str(row[0]) for batch in pool.batches for row in batch]
+
+
+@pytest.fixture
+def written(monkeypatch):
+    counts = {}
+
+    class Counter:
+        def add(self, amount, attributes):
+            counts[attributes["outcome"]] = counts.get(attributes["outcome"], 0) + amount
+
+    monkeypatch.setattr(status, "written_counter", Counter())
+    return counts
+
+
+def test_update_sql_numbers_parameters():
+    sql = _update_sql(2)
+    assert "$1::uuid" in sql and "$12::jsonb" in sql and "$13" not in sql
+
+
+def test_flush_splits_into_batches():
+    pool = FakePool()
+    writer = StatusWriter(pool, batch_size=2)
+    orders = ids(5)
+    for order_id in orders:
+        writer.record(order_id, "processed", 0.5)
+    asyncio.run(writer.flush())
+    assert [len(batch) for batch in pool.batches] == [2, 2, 1]
+    assert written_ids(pool) == orders
+
+
+def test_repeated_updates_coalesce():
+    pool = FakePool()
+    writer = StatusWriter(pool)
+    order_id, other = ids(2)
+    writer.record(order_id, "failed", 0.1)
+    writer.record(other, "processed", 0.2)
+    writer.record(order_id, "processed", 0.3)
+    asyncio.run(writer.flush())
+    ((first, second),) = pool.batches
+    # The newer update moves to the end
+    assert (str(first[0]), str(second[0])) == (other, order_id)
+    assert second[1] == "processed"
+    assert second[3] == pytest.approx(300.0)
+
+
+def test_enrichment_is_written_with_status():
+    pool = FakePool()
+    writer = StatusWriter(pool)
+    writer.record(ids(1)[0], "processed", 0.1, {"price": 12.34, "known": True})
+    writer.record(ids(1)[0], "processed", 0.1)
+    asyncio.run(writer.flush())
+    priced, unpriced = pool.batches[0]
+    assert priced[4] == Decimal("12.34")
+    assert json.loads(priced[5]) == {"price": 12.34, "known": True}
+    assert unpriced[4:] == (None, None)
+
+
+def test_invalid_ids_are_skipped():
+    writer = StatusWriter(FakePool())
+    writer.record(None, "processed", 0.1)
+    writer.record("not-a-uuid", "processed", 0.1)
+    assert list(writer.observe_pending(None))[0].value == 0
+
+
+def test_failed_flush_keeps_rows_behind_newer_updates(written):
+    pool = FakePool(fail=True)
+    writer = StatusWriter(pool, batch_size=10)
+    order_id, other = ids(2)
+    writer.record(order_id, "processed", 0.1)
+    asyncio.run(writer.flush())
+    assert written == {"failed": 1}
+
+    # A newer outcome for the same order wins over the one put back
+    writer.record(order_id, "failed", 0.2)
+    writer.record(other, "processed", 0.2)
+    pool.fail = False
+    asyncio.run(writer.flush())
+    assert [row[1] for row in pool.batches[0]] == ["failed", "processed"]
+    assert written == {"failed": 1, "written": 2}
+
+
+def test_oldest_updates_dropped_beyond_max_pending(written):
+    pool = FakePool()
+    writer = StatusWriter(pool, batch_size=2, max_pending=3)
+    orders = ids(5)
+    for order_id in orders:
+        writer.record(order_id, "processed", 0.1)
+    asyncio.run(writer.flush())
+    assert written_ids(pool) == orders[2:]
+    assert written["dropped"] == 2
+
+
+def test_batch_size_capped_by_parameter_limit():
+    assert StatusWriter(FakePool(), batch_size=100_000).batch_size == MAX_BATCH_SIZE
+
+
+def test_full_batch_wakes_writer_and_cancel_flushes():
+    async def run():
+        pool = FakePool()
+        writer = StatusWriter(pool, batch_size=2, flush_interval=60)
+        writer.start()
+        for order_id in ids(3):
+            writer.record(order_id, "processed", 0.1)
+        await asyncio.sleep(0.01)
+        flushed = [len(batch) for batch in pool.batches]
+        writer._task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await writer._task
+        return flushed, [len(batch) for batch in pool.batches], pool.closed
+
+    flushed, after_cancel, closed = asyncio.run(run())
+    # The full batch is written without waiting for the interval
+    assert flushed[0] == 2
+    assert sum(after_cancel) == 3
+    assert closed
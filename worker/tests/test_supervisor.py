@@ -0,0 +1,116 @@
+import asyncio
+import os
+import signal
+import time
+
+from app import catalog as catalog_module, instruments
+from app.catalog import ProductCatalog
+from app.supervisor import ConsumerSupervisor, _consume, _mp
+
+
+def test_count_settled_adds_to_shared_totals(monkeypatch):
+    totals = {"ack": _mp.Value("q", 0, lock=False), "nack": _mp.Value("q", 0, lock=False)}
+    monkeypatch.setattr(instruments, "settled_totals", totals)
+    instruments.count_settled(3, "ack")
+    instruments.count_settled(1, "nack")
+    instruments.count_settled(2, "ack")
+    assert (totals["ack"].value, totals["nack"].value) == (5, 1)
+
+
+def test_supervisor_sums_settled_over_processes():
+    supervisor = ConsumerSupervisor(processes=3)
+    for i, slot in enumerate(supervisor.slots):
+        slot.settled["ack"].value = 10 * (i + 1)
+        slot.settled["nack"].value = i
+
+    assert supervisor.settled_total("ack") == 60
+    observations = {o.attributes["outcome"]: o.value for o in supervisor.observe_settled(None)}
+    assert observations == {"ack": 60, "nack": 3}
+    status = supervisor.status()
+    assert status["settled"] == {"ack": 60, "nack": 3}
+    assert [w["settled"]["ack"] for w in status["workers"]] == [10, 20, 30]
+
+
+def test_consumer_process_preloads_catalog(monkeypatch, tmp_path):
+    path = tmp_path / "catalog.csv"
+    path.write_text("widget,1.5\n")
+    preloaded = ProductCatalog(str(path))
+    monkeypatch.setattr(catalog_module, "catalog", preloaded)
+    monkeypatch.setenv("WORKER_TRANSPORT", "memory")
+    monkeypatch.setenv("LOOP_MONITOR", "false")
+    monkeypatch.setenv("WORKER_STATUS_WRITEBACK", "false")
+
+    async def run():
+        asyncio.get_running_loop().call_later(0.2, os.kill, os.getpid(), signal.SIGTERM)
+        await asyncio.wait_for(_consume(_mp.Value("d", 0.0)), timeout=5)
+
+    try:
+        asyncio.run(run())
+        assert preloaded.lookup("widget") == (1.5, True)
+        assert preloaded._watcher is not None
+    finally:
+        preloaded.stop()
+
+
+def test_sigterm_stops_consumer_cleanly(monkeypatch):
+    monkeypatch.setenv("WORKER_TRANSPORT", "memory")
+    monkeypatch.setenv("LOOP_MONITOR", "false")
+    monkeypatch.setenv("WORKER_STATUS_WRITEBACK", "false")
+    heartbeat = _mp.Value("d", 0.0)
+
+    async def run():
+        asyncio.get_running_loop().call_later(0.2, os.kill, os.getpid(), signal.SIGTERM)
+        await asyncio.wait_for(_consume(heartbeat), timeout=5)
+
+    asyncio.run(run())
+    assert time.time() - heartbeat.value < 5
+
+
+class HungProcess:
+    """A child that ignores SIGTERM for a while and blocks whoever joins it."""
+
+    pid = 1234
+    exitcode = None
+
+    def __init__(self):
+        self.running = True
+
+    def is_alive(self):
+        return self.running
+
+    def terminate(self):
+        pass
+
+    def join(self, timeout=None):
+        time.sleep(0.3)
+        self.running = False
+
+    def kill(self):
+        self.running = False
+
+
+def test_heartbeat_restart_does_not_block_loop():
+    supervisor = ConsumerSupervisor(processes=1, heartbeat_timeout=1.0)
+    slot = supervisor.slots[0]
+    slot.process = HungProcess()
+    slot.started_at = time.time() - 10
+    slot.heartbeat.value = time.time() - 10
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        await asyncio.sleep(0)
+        await supervisor._check()
+        ticker.cancel()
+        return ticks
+
+    assert asyncio.run(run()) > 5
+    assert slot.process is None
+    assert slot.next_start > time.time()
@@ -0,0 +1,181 @@
+import asyncio
+import json
+
+import pytest
+
+from app import codec
+from app.transport import (
+    AmqpTransport,
+    LocalMessage,
+    MemoryTransport,
+    ReplayTransport,
+    transport_from_env,
+)
+
+
+def consume(transport: MemoryTransport, handler=None):
+    """Start consuming and return the list deliveries are appended to."""
+    delivered = []
+
+    async def callback(message: LocalMessage):
+        delivered.append(message)
+        if handler is not None:
+            await handler(message)
+
+    return delivered, callback
+
+
+def test_prefetch_bounds_unsettled_deliveries():
+    async def run():
+        transport = MemoryTransport()
+        await transport.set_prefetch(2)
+        delivered, callback = consume(transport)
+        await transport.consume(callback)
+        for i in range(5):
+            await transport.publish(str(i).encode())
+        await asyncio.sleep(0.01)
+        first = len(delivered)
+
+        await delivered[0].ack()
+        await asyncio.sleep(0.01)
+        second = len(delivered)
+
+        # Raising the prefetch releases more deliveries straight away
+        await transport.set_prefetch(10)
+        await asyncio.sleep(0.01)
+        return first, second, len(delivered)
+
+    assert asyncio.run(run()) == (2, 3, 5)
+
+
+def test_multi_ack_settles_earlier_deliveries():
+    async def run():
+        transport = MemoryTransport()
+        delivered, callback = consume(transport)
+        await transport.consume(callback)
+        for i in range(4):
+            await transport.publish(str(i).encode())
+        await asyncio.sleep(0.01)
+        await delivered[1].reject()
+        await delivered[3].ack(multiple=True)
+        await asyncio.wait_for(transport.join(), timeout=1)
+        return transport, delivered
+
+    transport, delivered = asyncio.run(run())
+    assert (transport.acked, transport.rejected) == (3, 1)
+    assert all(message.processed for message in delivered)
+
+
+def test_settling_twice_raises():
+    async def run():
+        transport = MemoryTransport()
+        delivered, callback = consume(transport)
+        await transport.consume(callback)
+        await transport.publish(b"x")
+        await asyncio.sleep(0.01)
+        await delivered[0].ack()
+        with pytest.raises(RuntimeError):
+            await delivered[0].ack()
+
+    asyncio.run(run())
+
+
+def test_requeue_redelivers():
+    async def run():
+        transport = MemoryTransport()
+        attempts = []
+
+        async def handler(message):
+            attempts.append(message.delivery_tag)
+            if len(attempts) == 1:
+                await message.reject(requeue=True)
+            else:
+                await message.ack()
+
+        _, callback = consume(transport, handler)
+        await transport.consume(callback)
+        await transport.publish(b"x")
+        await asyncio.wait_for(transport.join(), timeout=1)
+        return transport, attempts
+
+    transport, attempts = asyncio.run(run())
+    assert attempts == [1, 2]
+    assert (transport.acked, transport.rejected) == (1, 0)
+
+
+def test_process_acks_on_success_and_rejects_on_error():
+    async def run():
+        transport = MemoryTransport()
+
+        async def handler(message):
+            async with message.process():
+                if message.body == b"bad":
+                    raise ValueError("bad order")
+
+        _, callback = consume(transport, handler)
+        await transport.consume(callback)
+        for body in (b"good", b"bad", b"good"):
+            await transport.publish(body)
+        await asyncio.wait_for(transport.join(), timeout=1)
+        return transport
+
+    transport = asyncio.run(run())
+    assert (transport.acked, transport.rejected) == (2, 1)
+
+
+def test_publish_stamps_publish_time():
+    async def run():
+        transport = MemoryTransport()
+        delivered, callback = consume(transport)
+        await transport.consume(callback)
+        await transport.publish(b"x", {"x-published-at-ms": 5})
+        await transport.publish(b"y")
+        await asyncio.sleep(0.01)
+        return delivered
+
+    first, second = asyncio.run(run())
+    assert first.headers["x-published-at-ms"] == 5
+    assert second.headers["x-published-at-ms"] > 5
+
+
+def test_replay_reads_bodies_and_envelopes(tmp_path):
+    path = tmp_path / "orders.jsonl"
+    path.write_text("\n".join([
+        json.dumps({"Id": "1", "Product": "widget"}),
+        "",
+        json.dumps({"body": {"Id": "2", "Product": "gadget"}}),
+        json.dumps({"body": '{"Id": "3"}'}),
+    ]) + "\n")
+
+    async def run():
+        transport = ReplayTransport(str(path), loops=2)
+        assert await transport.connect()
+
+        async def handler(message):
+            await message.ack()
+
+        delivered, callback = consume(transport, handler)
+        await transport.consume(callback)
+        await asyncio.wait_for(transport._replayer, timeout=1)
+        return transport, delivered
+
+    transport, delivered = asyncio.run(run())
+    assert transport.sent == 6
+    assert transport.acked == 6
+    assert [codec.loads(m.body)["Id"] for m in delivered[:3]] == ["1", "2", "3"]
+
+
+def test_replay_missing_file(tmp_path):
+    assert not asyncio.run(ReplayTransport(str(tmp_path / "missing.jsonl")).connect())
+
+
+@pytest.mark.parametrize("name, cls", [("amqp", AmqpTransport), ("memory", MemoryTransport), ("REPLAY", ReplayTransport)])
+def test_transport_from_env(monkeypatch, name, cls):
+    monkeypatch.setenv("WORKER_TRANSPORT", name)
+    assert isinstance(transport_from_env(), cls)
+
+
+def test_unknown_transport(monkeypatch):
+    monkeypatch.setenv("WORKER_TRANSPORT", "kafka")
+    with pytest.raises(ValueError):
+        transport_from_env()